@@ -0,0 +1,10 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import sys
+
+from .bench import main
+
+sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+from . import fakes
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'results.jsonl')
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a benchmark.
+
+    The decorated function prepares the benchmark and returns a tuple with
+    the function to be timed and how many hot path calls it makes.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def make_lifedrain():
+    """Creates the add-on's main class on a fake main window.
+
+    Returns:
+        A tuple with the Lifedrain instance and the fake main window.
+    """
+    package = fakes.load_addon()
+    lifedrain_module = fakes.import_module(package, 'lifedrain')
+    main_window = fakes.FakeMainWindow()
+    lifedrain = lifedrain_module.Lifedrain(fakes.make_timer, main_window,
+                                           fakes.FakeQt)
+    return lifedrain, main_window
+
+
+@benchmark('addon.startup')
+def bench_startup():
+    """Importing the add-on and running main.main(), as Anki does."""
+    return fakes.import_addon, 1
+
+
+@benchmark('deck_manager.recover_life')
+def bench_recover_life():
+    """The 100 ms drain tick, which drains and recovers 0.1 seconds."""
+    lifedrain, _ = make_lifedrain()
+    lifedrain.screen_change('review')
+    deck_manager = lifedrain.deck_manager
+
+    def run():
+        deck_manager.recover_life(False, 0.1)
+        deck_manager.recover_life(True, 0.1)
+    return run, 2
+
+
+@benchmark('lifedrain.recover_batch')
+def bench_recover_batch():
+    """Twenty adjustments from another add-on, applied on the next turn."""
+    lifedrain, _ = make_lifedrain()
+    lifedrain.screen_change('review')
+    deltas = [0.5, -0.5] * 10
+
+    def run():
+        lifedrain.recover_batch(deltas)
+        lifedrain._recover_timer.fire()  # pylint: disable=protected-access
+    return run, 1
+
+
+@benchmark('deck_manager.drain_tick')
+def bench_drain_tick():
+    """The timer callback of the elapsed time drain."""
+    lifedrain, _ = make_lifedrain()
+    lifedrain.screen_change('review')
+    lifedrain.show_question()
+    return lifedrain.deck_manager.drain_tick, 1
+
+
+@benchmark('lifedrain.show_answer+show_question')
+def bench_answer_cycle():
+    """Showing the answer of a card and then the next question."""
+    lifedrain, _ = make_lifedrain()
+    lifedrain.screen_change('review')
+
+    def run():
+        lifedrain.show_answer()
+        lifedrain.show_question()
+    return run, 2
+
+
+@benchmark('event_bus.review_cycle')
+def bench_review_cycle():
+    """The events of reviewing a card, as emitted by the hooks."""
+    lifedrain, _ = make_lifedrain()
+    event_bus = fakes.import_module(fakes.load_addon(), 'event_bus')
+    emitter = lifedrain.bus.emitter
+    emitter(event_bus.SCREEN_CHANGE)('review')
+    show_question = emitter(event_bus.SHOW_QUESTION)
+    show_answer = emitter(event_bus.SHOW_ANSWER)
+    answer_card = emitter(event_bus.ANSWER_CARD)
+
+    def run():
+        show_answer()
+        answer_card(3)
+        show_question()
+    return run, 3
+
+
+@benchmark('lifedrain.screen_change')
+def bench_screen_change():
+    """Going from the overview to the review screen and back."""
+    lifedrain, _ = make_lifedrain()
+
+    def run():
+        lifedrain.screen_change('review')
+        lifedrain.screen_change('overview')
+    return run, 2
+
+
+@benchmark('deck_manager.update')
+def bench_update():
+    """Updating the life bar of the current deck."""
+    lifedrain, _ = make_lifedrain()
+    return lifedrain.deck_manager.update, 1
+
+
+def _style_options(**changes):
+    options = {
+        'height': 15,
+        'fgColor': '#489ef6',
+        'borderRadius': 0,
+        'text': 1,
+        'textColor': '#000',
+        'customStyle': 0,
+    }
+    options.update(changes)
+    return options
+
+
+@benchmark('progress_bar.set_style')
+def bench_set_style():
+    """Setting the same style again, as done on every update."""
+    package = fakes.load_addon()
+    progress_bar = fakes.import_module(package, 'progress_bar') \
+        .ProgressBar(fakes.FakeMainWindow(), fakes.FakeQt)
+    options = _style_options()
+    return lambda: progress_bar.set_style(options), 1
+
+
+@benchmark('progress_bar.set_style.changed')
+def bench_set_style_changed():
+    """Switching between two styles."""
+    package = fakes.load_addon()
+    progress_bar = fakes.import_module(package, 'progress_bar') \
+        .ProgressBar(fakes.FakeMainWindow(), fakes.FakeQt)
+    options = [_style_options(), _style_options(customStyle=3, height=20)]
+
+    def run():
+        progress_bar.set_style(options[0])
+        progress_bar.set_style(options[1])
+    return run, 2
+
+
+@benchmark('progress_bar.dock_at')
+def bench_dock_at():
+    """Moving the life bar between the top and the bottom."""
+    package = fakes.load_addon()
+    progress_bar = fakes.import_module(package, 'progress_bar') \
+        .ProgressBar(fakes.FakeMainWindow(), fakes.FakeQt)
+
+    def run():
+        progress_bar.dock_at(0)
+        progress_bar.dock_at(1)
+    return run, 2
+
+
+def run_benchmarks(names=None, repeat=5):
+    """Runs the benchmarks.
+
+    Args:
+        names: Optional. The names of the benchmarks to run. Runs all of them
+            by default.
+        repeat: Optional. How many times each benchmark is repeated. The best
+            time is kept.
+
+    Returns:
+        A dictionary with the time of each benchmark, in nanoseconds per call.
+    """
+    fakes.install()
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        func, calls = setup()
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat, number))
+        results[name] = best / number / calls * 1e9
+    return results
+
+
+def git_commit():
+    """Gets the current commit, marked with + if the tree has changes."""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.check_output(
+            ['git', 'status', '--porcelain', '--', 'src'],
+            stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + '+' if dirty else commit
+
+
+def load_records(path):
+    """Reads the records of previous runs."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+def compare(previous, current, threshold):
+    """Prints the change of each benchmark between two runs.
+
+    Returns:
+        The names of the benchmarks that got slower than the threshold.
+    """
+    regressions = []
+    print('\nCompared to {} ({}):'.format(previous['commit'],
+                                          previous['date']))
+    for name, now in current['results'].items():
+        before = previous['results'].get(name)
+        if before is None:
+            print('  {:<40} {:>12}'.format(name, 'new'))
+            continue
+        change = (now - before) / before
+        mark = ''
+        if change > threshold:
+            mark = '  REGRESSION'
+            regressions.append(name)
+        print('  {:<40} {:>+11.1f}%{}'.format(name, change * 100, mark))
+    return regressions
+
+
+def main(argv=None):
+    """Runs the benchmarks and stores the results as JSON lines."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Times the hot paths of Life Drain without Anki.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help='JSON lines file where results are appended')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', nargs='?', const='', metavar='COMMIT',
+                        help='compare with a previous commit (default: the '
+                             'latest run of another commit)')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--list', action='store_true',
+                        help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, setup in BENCHMARKS.items():
+            print('{:<40} {}'.format(name, setup.__doc__))
+        return 0
+
+    record = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': run_benchmarks(args.names, args.repeat),
+    }
+    for name, nanoseconds in record['results'].items():
+        print('{:<40} {:>12.1f} ns/call'.format(name, nanoseconds))
+
+    previous_records = load_records(args.output)
+    with open(args.output, 'a') as results_file:
+        results_file.write(json.dumps(record, sort_keys=True) + '\n')
+
+    if args.compare is None:
+        return 0
+    candidates = [
+        previous for previous in reversed(previous_records)
+        if (previous['commit'] == args.compare if args.compare
+            else previous['commit'] != record['commit'])
+    ]
+    if not candidates:
+        print('\nNo previous results to compare with.')
+        return 0
+    regressions = compare(candidates[0], record, args.threshold)
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
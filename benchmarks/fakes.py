@@ -0,0 +1,470 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+
+
+def _noop(*args, **kwargs):
+    """Accepts anything and does nothing."""
+
+
+class _HookList(list):
+    """A gui_hooks hook, which is a list of callbacks."""
+
+
+class FakeSignal:
+    """A Qt signal that calls its slots synchronously."""
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        """Connects a slot to the signal."""
+        self._slots.append(slot)
+
+    def emit(self, *args):
+        """Calls all connected slots."""
+        for slot in self._slots:
+            slot(*args)
+
+
+class FakeObject:
+    """A QObject that accepts event filters."""
+
+    def __init__(self, *args):
+        self.destroyed = FakeSignal()
+
+    def installEventFilter(self, event_filter):  # pylint: disable=invalid-name
+        """Ignores the event filter."""
+
+    def deleteLater(self):  # pylint: disable=invalid-name
+        """Emits the destroyed signal right away."""
+        self.destroyed.emit(self)
+
+
+class FakeWidget(FakeObject):
+    """A QWidget that only keeps the state read back by the add-on."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._visible = True
+        self.style_sheet = ''
+
+    def setVisible(self, visible):  # pylint: disable=invalid-name
+        """Sets the visibility flag."""
+        self._visible = visible
+
+    def isVisible(self):  # pylint: disable=invalid-name
+        """Gets the visibility flag."""
+        return self._visible
+
+    def show(self):
+        """Sets the widget visible."""
+        self._visible = True
+
+    def setStyleSheet(self, style_sheet):  # pylint: disable=invalid-name
+        """Keeps the stylesheet."""
+        self.style_sheet = style_sheet
+
+    @staticmethod
+    def width():
+        """A typical width of the life bar, in pixels."""
+        return 800
+
+    def __getattr__(self, name):
+        """Any other Qt method does nothing."""
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _noop
+
+
+class FakeProgressBar(FakeWidget):
+    """A QProgressBar that keeps its range, value and format."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.range = (0, 100)
+        self.value = 0
+        self.format = ''
+
+    def setRange(self, minimum, maximum):  # pylint: disable=invalid-name
+        """Keeps the range."""
+        self.range = (minimum, maximum)
+
+    def setValue(self, value):  # pylint: disable=invalid-name
+        """Keeps the value, which must be an integer as in Qt."""
+        if not isinstance(value, int):
+            raise TypeError('setValue expects an int')
+        self.value = value
+
+    def setFormat(self, text_format):  # pylint: disable=invalid-name
+        """Keeps the format."""
+        self.format = text_format
+
+
+class FakeDockWidget(FakeWidget):
+    """A QDockWidget with the dockLocationChanged signal."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.dockLocationChanged = FakeSignal()  # pylint: disable=invalid-name
+
+
+class FakeTimer:
+    """A QTimer that only fires when fire() is called."""
+
+    def __init__(self, interval, callback, repeat=True):
+        self.interval = interval
+        self.callback = callback
+        self.repeat = repeat
+        self._active = True
+
+    def start(self, interval=None):
+        """Starts or restarts the timer."""
+        if interval is not None:
+            self.interval = interval
+        self._active = True
+
+    def stop(self):
+        """Stops the timer."""
+        self._active = False
+
+    def isActive(self):  # pylint: disable=invalid-name
+        """Checks if the timer is running."""
+        return self._active
+
+    def fire(self):
+        """Calls the callback as if the interval elapsed."""
+        if not self.repeat:
+            self._active = False
+        self.callback()
+
+
+def make_timer(interval, callback, repeat, requires_collection=True):
+    """Replaces ProgressManager.timer."""
+    return FakeTimer(interval, callback, repeat)
+
+
+class FakeDecks:
+    """The deck manager of a collection with a few configured decks."""
+
+    def __init__(self, count=100):
+        self.decks = {}
+        for deck_id in range(1, count + 1):
+            self.decks[deck_id] = {
+                'id': deck_id,
+                'name': 'Deck {}'.format(deck_id),
+                'lifedrain': {'maxLife': 120, 'recover': 5, 'damage': 10},
+            }
+        self.selected = 1
+
+    def current(self):
+        """Gets the selected deck."""
+        return self.decks[self.selected]
+
+    def select(self, deck_id):
+        """Selects a deck."""
+        self.selected = deck_id
+
+    def get(self, deck_id, default=True):  # pylint: disable=unused-argument
+        """Gets a deck by ID."""
+        return self.decks.get(deck_id)
+
+    def all(self):
+        """Gets all decks."""
+        return list(self.decks.values())
+
+    def save(self, deck=None):
+        """Does nothing, as there is no database."""
+
+
+class FakeCollection:
+    """A collection with the default global settings."""
+
+    def __init__(self, deck_count=100):
+        self.conf = {}
+        self.decks = FakeDecks(deck_count)
+
+    def setMod(self):  # pylint: disable=invalid-name
+        """Does nothing, as there is no database."""
+
+
+class FakeMenu(FakeWidget):
+    """A QMenu whose actions have a triggered signal."""
+
+    def addAction(self, text):  # pylint: disable=invalid-name
+        """Creates an action."""
+        action = FakeObject(text)
+        action.triggered = FakeSignal()
+        return action
+
+
+class FakeMainWindow(FakeWidget):
+    """Anki's main window, with a collection and a few dock widgets."""
+
+    def __init__(self, dock_count=10):
+        super().__init__()
+        self.col = FakeCollection()
+        self.web = FakeWidget()
+        self.form = types.SimpleNamespace(menuTools=FakeMenu())
+        self.progress = types.SimpleNamespace(timer=make_timer)
+        self.docks = {}
+        for i in range(dock_count):
+            dock = FakeDockWidget()
+            self.docks[dock] = FakeQt.Qt.LeftDockWidgetArea if i % 2 else \
+                FakeQt.Qt.RightDockWidgetArea
+        self.pm = types.SimpleNamespace(name='User 1')
+        # pylint: disable-next=invalid-name
+        self.addonManager = types.SimpleNamespace(
+            setConfigAction=_noop,
+            addonFromModule=lambda module: module.split('.')[0],
+            addonsFolder=lambda addon: tempfile.gettempdir())
+
+    def findChildren(self, cls):  # pylint: disable=invalid-name
+        """Gets the dock widgets."""
+        return [dock for dock in self.docks if isinstance(dock, cls)]
+
+    def dockWidgetArea(self, dock):  # pylint: disable=invalid-name
+        """Gets the area of a dock widget."""
+        return self.docks.get(dock, FakeQt.Qt.NoDockWidgetArea)
+
+    def addDockWidget(self, area, dock):  # pylint: disable=invalid-name
+        """Places a dock widget at an area."""
+        self.docks[dock] = area
+        dock.dockLocationChanged.emit(area)
+
+    # pylint: disable-next=invalid-name,unused-argument
+    def splitDockWidget(self, first, second, orientation):
+        """Places a dock widget next to another one."""
+        self.addDockWidget(self.docks[first], second)
+
+    def removeDockWidget(self, dock):  # pylint: disable=invalid-name
+        """Removes a dock widget from the window."""
+        self.docks.pop(dock, None)
+
+    @staticmethod
+    def applyShortcuts(shortcuts):  # pylint: disable=invalid-name
+        """Creates no shortcut objects."""
+        return []
+
+
+class FakeQt:
+    """The subset of PyQt used by the add-on."""
+
+    QObject = FakeObject
+    QWidget = FakeWidget
+    QProgressBar = FakeProgressBar
+    QDockWidget = FakeDockWidget
+
+    class Qt:  # pylint: disable=too-few-public-methods
+        """Qt enums."""
+        NoDockWidgetArea = 0
+        LeftDockWidgetArea = 1
+        RightDockWidgetArea = 2
+        TopDockWidgetArea = 4
+        BottomDockWidgetArea = 8
+        Vertical = 2
+        ApplicationSuspended = 0
+        ApplicationHidden = 1
+        ApplicationActive = 4
+
+    class QEvent:  # pylint: disable=too-few-public-methods
+        """QEvent types."""
+        Resize = 14
+        Show = 17
+        Hide = 18
+        ChildPolished = 69
+        WindowStateChange = 105
+
+    class QStyleFactory:  # pylint: disable=too-few-public-methods
+        """Creates styles."""
+
+        @staticmethod
+        def create(name):  # pylint: disable=unused-argument
+            """Creates a style."""
+            return FakeObject()
+
+    class QApplication:
+        """The application."""
+
+        @staticmethod
+        def style():
+            """Gets the application style."""
+            return FakeObject()
+
+        @staticmethod
+        def instance():
+            """Gets the application."""
+            return FAKE_APP
+
+    class QPalette(FakeObject):
+        """A palette."""
+        Highlight = 12
+        Base = 9
+        Window = 10
+
+        def setColor(self, role, color):  # pylint: disable=invalid-name
+            """Does nothing."""
+
+    QColor = FakeObject
+    sip = types.SimpleNamespace(delete=_noop)
+
+    @staticmethod
+    def qconnect(signal, slot):
+        """Connects a signal to a slot."""
+        signal.connect(slot)
+
+
+class FakeApplication(FakeObject):
+    """The running QApplication, always active and without modals."""
+
+    def __init__(self):
+        super().__init__()
+        # pylint: disable=invalid-name
+        self.applicationStateChanged = FakeSignal()
+        self.focusWindowChanged = FakeSignal()
+
+    @staticmethod
+    def applicationState():  # pylint: disable=invalid-name
+        """Gets the state of the application."""
+        return FakeQt.Qt.ApplicationActive
+
+    @staticmethod
+    def activeModalWidget():  # pylint: disable=invalid-name
+        """Gets the modal dialog shown, if any."""
+        return None
+
+
+FAKE_APP = FakeApplication()
+
+
+class FakeBottomBar:  # pylint: disable=too-few-public-methods
+    """aqt.toolbar.BottomBar."""
+
+    def draw(self, *args, **kwargs):
+        """Does nothing."""
+
+
+class FakeScheduler:
+    """anki.sched.Scheduler."""
+
+    def buryCards(self, *args):  # pylint: disable=invalid-name
+        """Does nothing."""
+
+    def suspendCards(self, *args):  # pylint: disable=invalid-name
+        """Does nothing."""
+
+
+class FakeDeckManager:
+    """anki.decks.DeckManager."""
+
+    def id(self, name, create=True):  # pylint: disable=invalid-name
+        """Does nothing."""
+
+    def select(self, deck_id):
+        """Does nothing."""
+
+    def rename(self, deck, name):
+        """Does nothing."""
+
+    def rem(self, deck_id, cards_too=False, children_too=True):
+        """Does nothing."""
+
+
+def install():
+    """Installs the fake aqt and anki modules in sys.modules.
+
+    Returns:
+        The fake anki.hooks module, which keeps the hooks that were run.
+    """
+    anki = types.ModuleType('anki')
+    hooks = types.ModuleType('anki.hooks')
+    hooks.runs = []
+    hooks.runHook = lambda name, *args: hooks.runs.append(name)
+    listeners = hooks._hooks = {}  # pylint: disable=protected-access
+    hooks.addHook = lambda name, func: listeners.setdefault(
+        name, []).append(func)
+    hooks.wrap = lambda old, new, pos='after': old
+    hooks.card_did_leech = _HookList()
+    hooks.notes_will_be_deleted = _HookList()
+    anki.hooks = hooks
+
+    aqt = types.ModuleType('aqt')
+    aqt.qt = FakeQt
+    aqt.mw = None
+    aqt.gui_hooks = types.ModuleType('aqt.gui_hooks')
+    aqt.gui_hooks.__getattr__ = lambda name: _HookList()
+
+    modules = {
+        'anki': anki,
+        'anki.hooks': hooks,
+        'aqt': aqt,
+        'aqt.qt': FakeQt,
+        'aqt.gui_hooks': aqt.gui_hooks,
+    }
+    for name in ['anki.decks', 'anki.lang', 'anki.sched', 'aqt.overview',
+                 'aqt.progress', 'aqt.toolbar', 'aqt.utils']:
+        module = types.ModuleType(name)
+        module.__getattr__ = lambda attr: type(attr, (), {})
+        modules[name] = module
+    modules['anki.lang']._ = lambda text: text
+    modules['anki.decks'].DeckManager = FakeDeckManager
+    modules['anki.sched'].Scheduler = FakeScheduler
+    modules['aqt.toolbar'].BottomBar = FakeBottomBar
+    sys.modules.update(modules)
+    return hooks
+
+
+def import_addon(name='lifedrain_startup'):
+    """Imports the add-on package as Anki does, running its initialization.
+
+    The package is imported again under the given name every time, on a new
+    fake main window.
+
+    Args:
+        name: Optional. The name the package is imported as.
+
+    Returns:
+        The add-on package.
+    """
+    for module in list(sys.modules):
+        if module == name or module.startswith(name + '.'):
+            del sys.modules[module]
+    sys.modules['aqt'].mw = FakeMainWindow()
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(SRC_DIR, '__init__.py'),
+        submodule_search_locations=[SRC_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[name] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def load_addon(name='lifedrain'):
+    """Imports the add-on package without running its initialization.
+
+    Args:
+        name: Optional. The name the package is imported as.
+
+    Returns:
+        The add-on package. Its submodules are imported on demand.
+    """
+    package = types.ModuleType(name)
+    package.__path__ = [SRC_DIR]
+    sys.modules[name] = package
+    return package
+
+
+def import_module(package, module):
+    """Imports a submodule of the package returned by load_addon."""
+    return importlib.import_module('{}.{}'.format(package.__name__, module))
@@ -3,6 +3,19 @@ Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
 See the LICENCE file in the repository root for full licence text.
 """
 
-from . import main
+import time
 
-main.main()
+try:
+    from aqt import mw as _MAIN_WINDOW
+except ImportError:
+    _MAIN_WINDOW = None
+
+# The add-on only starts inside Anki. Without its main window, the package is
+# being used by the command line tools, such as "python -m src.replay".
+if _MAIN_WINDOW is not None:
+    _IMPORT_START = time.perf_counter()
+
+    from . import main
+
+    main.STARTUP_TIMES['import'] = time.perf_counter() - _IMPORT_START
+    main.main()
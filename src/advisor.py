@@ -0,0 +1,159 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import itertools
+
+from .life_engine import seconds_to_ms
+from .replay import ANSWER_AGAIN, numpy, walk, walk_loop
+
+MAX_LIVES = (30, 60, 90, 120, 180, 300, 600, 900, 1200)
+RECOVERS = (1, 2, 3, 5, 8, 10, 15, 20, 30)
+DAMAGES = (None, 5, 10, 20, 30, 60)
+
+# One game over every 100 answers.
+TARGET_RATE = 0.01
+
+# How many of the latest answers are replayed the first time a deck is
+# evaluated, and at most at once afterwards. It keeps the replay of the
+# whole grid under a second even without NumPy.
+HISTORY_SIZE = 1000
+
+ANSWERS_QUERY = '''
+    SELECT revlog.id, revlog.ease, revlog.time
+    FROM revlog JOIN cards ON cards.id = revlog.cid
+    WHERE cards.did = ? AND revlog.id > ? AND revlog.ease > 0
+    ORDER BY revlog.id {} LIMIT ?
+'''
+
+
+class _DeckGrid:  # pylint: disable=too-few-public-methods
+    """The replay of every setting of the grid for a deck, so far."""
+
+    __slots__ = ('last_id', 'lives', 'game_overs', 'answers', 'suggestion')
+
+    def __init__(self, lives):
+        self.last_id = 0
+        self.lives = lives
+        self.game_overs = [0] * len(lives)
+        self.answers = 0
+        self.suggestion = None
+
+
+class SettingsAdvisor:
+    """Suggests the maxLife, recover and damage of a deck.
+
+    Every combination of MAX_LIVES, RECOVERS and DAMAGES is replayed against
+    the review history of the deck at once, and the one whose rate of game
+    overs is closest to the target is suggested. Ties are broken in favor of
+    the smallest maximum life and recover.
+
+    The replay of each deck is kept, so when asked again only the answers
+    made since then are replayed, starting from the life each setting had
+    left. With NumPy, the whole grid is replayed in a few vectorized steps;
+    without it, each setting is replayed in a loop.
+    """
+
+    _again_deltas = None
+    _decks = None
+    _main_window = None
+    _max_lives = None
+    _recovers = None
+    _settings = None
+
+    def __init__(self, mw):
+        self._main_window = mw
+        self._decks = {}
+        self._settings = list(itertools.product(MAX_LIVES, RECOVERS, DAMAGES))
+        self._max_lives = [seconds_to_ms(max_life)
+                           for max_life, _, _ in self._settings]
+        self._recovers = [seconds_to_ms(recover)
+                          for _, recover, _ in self._settings]
+        # Without damage, answering 'Again' recovers life as any answer.
+        self._again_deltas = [
+            seconds_to_ms(recover) if damage is None
+            else -seconds_to_ms(damage)
+            for _, recover, damage in self._settings
+        ]
+
+    def suggest(self, deck_id, target_rate=TARGET_RATE):
+        """Suggests settings for a deck from its review history.
+
+        Args:
+            deck_id: The ID of the deck.
+            target_rate: Optional. The desired game overs per answer.
+
+        Returns:
+            A dictionary with the suggested maxLife, recover and damage, in
+            seconds, and the rate of game overs they would have had. None if
+            the deck has no reviews.
+        """
+        deck = self._decks.get(deck_id)
+        if deck is None:
+            deck = self._decks[deck_id] = _DeckGrid(list(self._max_lives))
+            answers = self._fetch(deck_id, 0, 'DESC')[::-1]
+        else:
+            answers = self._fetch(deck_id, deck.last_id, 'ASC')
+
+        while answers:
+            self._replay(deck, answers)
+            if len(answers) < HISTORY_SIZE:
+                break
+            answers = self._fetch(deck_id, deck.last_id, 'ASC')
+
+        if deck.answers == 0:
+            return None
+        if deck.suggestion is None or deck.suggestion[0] != target_rate:
+            deck.suggestion = (target_rate,
+                               self._best_setting(deck, target_rate))
+        return deck.suggestion[1]
+
+    def _fetch(self, deck_id, after_id, order):
+        """Reads up to HISTORY_SIZE answers of a deck from the revlog."""
+        return self._main_window.col.db.all(
+            ANSWERS_QUERY.format(order), deck_id, after_id, HISTORY_SIZE)
+
+    def _replay(self, deck, answers):
+        """Replays new answers of a deck through every setting."""
+        eases = [ease for _, ease, _ in answers]
+        drains = [time for _, _, time in answers]
+        if numpy is None:
+            for index, max_life in enumerate(self._max_lives):
+                recover = self._recovers[index]
+                again_delta = self._again_deltas[index]
+                deltas = [again_delta if ease == ANSWER_AGAIN else recover
+                          for ease in eases]
+                game_overs, deck.lives[index] = walk_loop(
+                    max_life, deck.lives[index], drains, deltas)
+                deck.game_overs[index] += len(game_overs)
+        else:
+            def column(values):
+                return numpy.array(values, numpy.int64)[:, None]
+
+            again = numpy.array(eases) == ANSWER_AGAIN
+            deltas = numpy.where(again, column(self._again_deltas),
+                                 column(self._recovers))
+            reached_zero, lives = walk(
+                column(self._max_lives), column(deck.lives),
+                numpy.array(drains, numpy.int64), deltas)
+            deck.lives = lives[:, -1].tolist()
+            deck.game_overs = (numpy.array(deck.game_overs) +
+                               reached_zero.sum(axis=1)).tolist()
+
+        deck.answers += len(answers)
+        deck.last_id = answers[-1][0]
+        deck.suggestion = None
+
+    def _best_setting(self, deck, target_rate):
+        """Finds the setting whose rate of game overs is the closest."""
+        rates = [game_overs / deck.answers for game_overs in deck.game_overs]
+        index = min(range(len(rates)),
+                    key=lambda i: abs(rates[i] - target_rate))
+        max_life, recover, damage = self._settings[index]
+        return {
+            'maxLife': max_life,
+            'recover': recover,
+            'damage': damage,
+            'rate': rates[index],
+        }
@@ -3,17 +3,23 @@ Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
 See the LICENCE file in the repository root for full licence text.
 """
 
+from .deck_tree import DeckTree
 from .defaults import DEFAULTS
 
 
 class GlobalConf:
-    """Manages lifedrain's global configuration."""
+    """Manages lifedrain's global configuration.
+
+    The configuration is read from Anki's database once and kept in memory
+    until it is changed or invalidated.
+    """
     fields = {'enable', 'stopOnAnswer', 'barPosition', 'barHeight',
               'barBorderRadius', 'barText', 'barStyle', 'barFgColor',
-              'barTextColor', 'enableBgColor', 'barBgColor',
+              'barTextColor', 'enableBgColor', 'barBgColor', 'barMaxFps',
               'globalSettingsShortcut', 'deckSettingsShortcut',
               'pauseShortcut', 'recoverShortcut', 'behavUndo', 'behavBury',
-              'behavSuspend'}
+              'behavSuspend', 'profileHooks'}
+    _cache = None
     _main_window = None
 
     def __init__(self, mw):
@@ -21,11 +27,14 @@ class GlobalConf:
 
     def get(self):
         """Get global configuration from Anki's database."""
+        if self._cache is not None:
+            return self._cache
         conf = self._main_window.col.conf
         global_conf = conf.get('lifedrain', {})
         for field in self.fields:
             if field not in global_conf:
                 global_conf[field] = DEFAULTS[field]
+        self._cache = global_conf
         return global_conf
 
     def set(self, new_conf):
@@ -38,27 +47,50 @@ class GlobalConf:
         for field in self.fields:
             conf['lifedrain'][field] = new_conf[field]
         col.setMod()
+        self.invalidate()
+
+    def invalidate(self):
+        """Discards the cached configuration, so it is read again."""
+        self._cache = None
 
 
 class DeckConf:
-    """Manages each lifedrain's deck configuration."""
-    fields = {'maxLife', 'recover', 'damage'}
+    """Manages each lifedrain's deck configuration.
+
+    Decks without their own configuration inherit it from their nearest
+    configured parent deck. The configuration of the current deck is cached
+    until it is changed, the current deck changes or it is invalidated.
+    """
+    fields = {'maxLife', 'recover', 'damage', 'awayPolicy'}
+    _cache = None
+    _deck_tree = None
     _main_window = None
 
     def __init__(self, mw):
         self._main_window = mw
+        self._deck_tree = DeckTree(mw)
 
     def get(self):
         """Get current deck configuration from Anki's database."""
-        deck = self._main_window.col.decks.current()
-        conf = deck.get('lifedrain', {})
-        conf_dict = {
-            'id': deck['id'],
-            'name': deck['name'],
-        }
-        for field in self.fields:
-            conf_dict[field] = conf.get(field, DEFAULTS[field])
-        return conf_dict
+        if self._cache is not None:
+            return self._cache
+        self._cache = self._deck_conf(self._main_window.col.decks.current())
+        return self._cache
+
+    def get_deck(self, deck_id):
+        """Gets the configuration of any deck, without caching it.
+
+        Args:
+            deck_id: The ID of the deck.
+
+        Returns:
+            The configuration, as returned by get, or None if there is no
+            such deck.
+        """
+        deck = self._main_window.col.decks.get(deck_id, default=False)
+        if not deck:
+            return None
+        return self._deck_conf(deck)
 
     def set(self, new_conf):
         """Saves deck configuration into Anki's database."""
@@ -68,5 +100,54 @@ class DeckConf:
         if 'lifedrain' not in deck:
             deck['lifedrain'] = {}
         for field in self.fields:
-            deck['lifedrain'][field] = new_conf[field]
+            if field in new_conf:
+                deck['lifedrain'][field] = new_conf[field]
         col.decks.save(deck)
+        self._deck_tree.update_deck(deck)
+        self.invalidate()
+
+    def invalidate(self):
+        """Discards the cached configuration, so it is read again."""
+        self._cache = None
+
+    def invalidate_tree(self):
+        """Discards the deck hierarchy, when the whole collection changed."""
+        self._deck_tree.invalidate()
+        self.invalidate()
+
+    def deck_looked_up(self, name, deck_id):
+        """Adds a deck looked up by name to the hierarchy, if it is new.
+
+        Args:
+            name: The name that was looked up.
+            deck_id: The ID of the deck with that name.
+        """
+        if self._deck_tree.knows(name):
+            return
+        deck = self._main_window.col.decks.get(deck_id, default=False)
+        if deck:
+            self._deck_tree.add(deck['name'])
+        self.invalidate()
+
+    def deck_renamed(self, old_name, deck_id):
+        """Moves a renamed or deleted deck, and its subdecks, in the hierarchy.
+
+        Args:
+            old_name: The name of the deck before it was renamed or deleted.
+            deck_id: The ID of the deck.
+        """
+        deck = self._main_window.col.decks.get(deck_id, default=False)
+        if deck:
+            self._deck_tree.rename(old_name, deck['name'])
+        else:
+            self._deck_tree.remove(old_name)
+        self.invalidate()
+
+    def _deck_conf(self, deck):
+        """Resolves the configuration of a deck through the deck hierarchy."""
+        conf_dict = {
+            'id': deck['id'],
+            'name': deck['name'],
+        }
+        conf_dict.update(self._deck_tree.get_conf(deck))
+        return conf_dict
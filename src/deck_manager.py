@@ -3,132 +3,340 @@ Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
 See the LICENCE file in the repository root for full licence text.
 """
 
-from anki.hooks import runHook
+from collections import OrderedDict
 
+from .event_journal import EVENT_RECOVER
+from .hook_dispatcher import HookDispatcher
+from .life_engine import LifeEngine, ms_to_seconds, seconds_to_ms
+from .life_history import LifeHistory
 from .progress_bar import ProgressBar
 
+# How many evicted decks have their life kept when there is no StateStore.
+SAVED_LIVES_CAPACITY = 4096
+
 
 class DeckManager:
     """Manages Life Drain status and configuration for each deck.
 
     Users may configure each deck with different settings, and the current
     status of the life bar (e.g. current life) will likely differ for each deck.
+    The life itself is kept by a LifeEngine, which never evicts the current
+    deck, and the Progress Bar only shows the changes of the current deck.
+    The saved life of the decks is read in a single query when a profile
+    loads, and applied as each deck is shown.
+    Decks evicted from the engine have their life kept with it, and saved in
+    the StateStore if there is one. Without a store, at most
+    SAVED_LIVES_CAPACITY evicted decks are kept, and the oldest start again
+    with full life.
+
+    The settings and the dialogs use seconds, while the engine, the store and
+    the Progress Bar use integer milliseconds. The conversion is done here.
+    The Progress Bar is only built when a deck is shown for the first time.
+
+    Other add-ons are told about the decks through the hooks
+    LifeDrain.gameOver, LifeDrain.lifeChanged(deck_id, life), with the life
+    in seconds, and LifeDrain.deckSwitched(deck_id). They are run by a
+    HookDispatcher, which usually defers them to after the current tick.
 
     Attributes:
-        bar_visible: Function that toggles the Progress Bar visibility.
+        engine: An instance of LifeEngine.
+        history: An instance of LifeHistory, with the life of the decks
+            during this session.
     """
 
-    bar_visible = None
+    engine = None
+    history = None
 
-    _bar_info = {}
-    _conf = None
     _global_conf = None
     _deck_conf = None
-    _game_over = False
+    _hook_dispatcher = None
     _progress_bar = None
     _cur_deck_id = None
+    _cur_deck_conf = None
+    _journal = None
+    _mw = None
+    _profile = None
+    _qt = None
+    _saved_lives = None
+    _state_store = None
+    _window_events = None
 
-    def __init__(self, mw, qt, global_conf, deck_conf):
+    def __init__(self, mw, qt, global_conf, deck_conf, state_store=None,
+                 journal=None, hook_dispatcher=None, window_events=None):
         """Initializes a Progress Bar, and keeps Anki's main window reference.
 
         Args:
             mw: Anki's main window.
             qt: The PyQt library.
+            global_conf: An instance of GlobalConf.
+            deck_conf: An instance of DeckConf.
+            state_store: Optional. A StateStore to persist the life of decks.
+            journal: Optional. An EventJournal to record the life changes.
+            hook_dispatcher: Optional. The HookDispatcher that runs the hooks
+                of Life Drain. Without it, they are run right away.
+            window_events: Optional. The WindowEvents of the main window,
+                shared with the Progress Bar.
         """
-        self._progress_bar = ProgressBar(mw, qt)
+        self._mw = mw
+        self._qt = qt
         self._global_conf = global_conf
         self._deck_conf = deck_conf
-        self.bar_visible = self._progress_bar.set_visible
+        self._state_store = state_store
+        self._window_events = window_events
+        self._saved_lives = OrderedDict()
+        if hook_dispatcher is None:
+            hook_dispatcher = HookDispatcher()
+        self._hook_dispatcher = hook_dispatcher
+
+        self._journal = journal
+        self.engine = LifeEngine(journal=journal)
+        self.history = LifeHistory()
+        self.engine.subscribe('change', self._on_life_change)
+        self.engine.subscribe('gameOver', lambda deck_id: hook_dispatcher.emit(
+            'LifeDrain.gameOver', key=deck_id))
+        self.engine.subscribe('evict', self._on_deck_evict)
+
+    def bar_visible(self, visible):
+        """Toggles the Progress Bar visibility.
+
+        Args:
+            visible: A flag indicating if the Progress Bar should be visible.
+        """
+        if self._progress_bar is not None:
+            self._progress_bar.set_visible(visible)
+
+    def load_state(self, profile):
+        """Switches to a profile, and reads the saved life of its decks.
+
+        Args:
+            profile: The name of Anki's profile.
+        """
+        self.engine.clear()
+        self.history.clear()
+        self._set_cur_deck(None)
+        self._profile = profile
+        self._saved_lives = OrderedDict()
+        if self._state_store is not None:
+            self._saved_lives.update(self._state_store.load(profile))
+
+    def save_state(self):
+        """Writes the life of the decks and the journal right away."""
+        if self.engine.has_deck(self._cur_deck_id):
+            self.engine.apply_drain(self._cur_deck_id)
+        if self._state_store is not None:
+            self._state_store.flush()
+        if self._journal is not None:
+            self._journal.flush()
 
     def update(self):
         """Updates the current deck's life bar."""
         conf = self._deck_conf.get()
-        self._cur_deck_id = conf['id']
+        if self._cur_deck_id != conf['id']:
+            self.stop_drain()
+            self._hook_dispatcher.emit('LifeDrain.deckSwitched', conf['id'])
+        self._set_cur_deck(conf['id'])
 
-        if conf['id'] not in self._bar_info:
-            self._add_deck(conf['id'])
+        if not self.engine.has_deck(conf['id']):
+            self._add_deck(conf)
+        elif conf is not self._cur_deck_conf:
+            self.engine.set_deck_conf(conf['id'], *_engine_conf(conf),
+                                      self.engine.get_life(conf['id']))
+        self._cur_deck_conf = conf
 
+        if self._progress_bar is None:
+            self._progress_bar = ProgressBar(self._mw, self._qt,
+                                             self._window_events)
         self._update_progress_bar_style()
 
-        bar_info = self._bar_info[conf['id']]
-        self._progress_bar.set_max_value(bar_info['maxValue'])
-        self._progress_bar.set_current_value(bar_info['currentValue'])
+        self._progress_bar.set_max_value(self.engine.get_max_life(conf['id']))
+        self._progress_bar.set_current_value(self.engine.get_life(conf['id']))
+
+    def life_sparkline(self):
+        """Draws the life of the current deck during this session, as SVG.
+
+        Returns:
+            The SVG markup, or an empty string if there is no history yet.
+        """
+        if not self.engine.has_deck(self._cur_deck_id):
+            return ''
+        return self.history.sparkline(
+            self._cur_deck_id, self.engine.get_max_life(self._cur_deck_id),
+            color=self._global_conf.get()['barFgColor'])
 
     def get_current_life(self):
-        """Get the current deck's current life."""
+        """Get the current deck's current life, in whole seconds."""
         conf = self._deck_conf.get()
-        self._cur_deck_id = conf['id']
-        if conf['id'] not in self._bar_info:
-            self._add_deck(conf['id'])
-        return self._bar_info[conf['id']]['currentValue']
+        self._set_cur_deck(conf['id'])
+        if not self.engine.has_deck(conf['id']):
+            self._add_deck(conf)
+        return ms_to_seconds(self.engine.get_life(conf['id']))
 
     def set_deck_conf(self, conf):
         """Updates a deck's current settings and state.
 
         Args:
-            deck_id: The ID of the deck.
             conf: A dictionary with the deck's configuration and state.
         """
-        current_value = conf['currentValue']
-        if current_value > conf['maxLife']:
-            current_value = conf['maxLife']
-        if conf['id'] not in self._bar_info:
-            self._add_deck(conf['id'])
-
-        deck_id = conf['id']
-        self._bar_info[deck_id]['maxValue'] = conf['maxLife']
-        self._bar_info[deck_id]['recoverValue'] = conf['recover']
-        self._bar_info[deck_id]['damageValue'] = conf['damage']
-        self._bar_info[deck_id]['currentValue'] = current_value
+        life = seconds_to_ms(conf['currentValue'])
+        if self.engine.has_deck(conf['id']):
+            current_life = self.engine.get_life(conf['id'])
+            if ms_to_seconds(current_life) == conf['currentValue']:
+                life = current_life
+        self.engine.set_deck_conf(conf['id'], *_engine_conf(conf), life)
 
     def recover_life(self, increment=True, value=None, damage=False):
         """Recover life of the currently active deck.
 
         Args:
             increment: Optional. A flag that indicates increment or decrement.
-            value: Optional. The value used to increment or decrement.
+            value: Optional. The value used to increment or decrement, in
+                seconds.
             damage: Optional. If this flag is ON, uses the default damage value.
         """
-        deck_id = self._cur_deck_id
-
-        multiplier = 1
-        if not increment:
-            multiplier = -1
-        if value is None:
-            if damage and self._bar_info[deck_id]['damageValue'] is not None:
-                multiplier = -1
-                value = self._bar_info[deck_id]['damageValue']
+        if not self.engine.has_deck(self._cur_deck_id):
+            return
+        if value is not None:
+            value = seconds_to_ms(value)
+        self.engine.recover(self._cur_deck_id, increment, value, damage)
+
+    def recover_change(self, increment=True, value=None, damage=False):
+        """Calculates a change of life of the currently active deck.
+
+        Accepts the same arguments as recover_life, but the life is only
+        changed when the result is passed to change_lives.
+
+        Returns:
+            A (deck_id, event, delta) tuple, or None if there is no deck.
+        """
+        if not self.engine.has_deck(self._cur_deck_id):
+            return None
+        if value is not None:
+            value = seconds_to_ms(value)
+        event, delta = self.engine.recover_delta(self._cur_deck_id,
+                                                 increment, value, damage)
+        return self._cur_deck_id, event, delta
+
+    def batch_changes(self, deltas):
+        """Converts deltas given by other add-ons into changes of life.
+
+        Args:
+            deltas: A list whose items are either an amount of life for the
+                current deck, or a (deck_id, amount) tuple. The amounts are
+                in seconds.
+
+        Returns:
+            A list of (deck_id, event, delta) tuples.
+        """
+        changes = []
+        for delta in deltas:
+            if isinstance(delta, (tuple, list)):
+                changes.append((delta[0], EVENT_RECOVER,
+                                seconds_to_ms(delta[1])))
+            else:
+                changes.append((self._cur_deck_id, EVENT_RECOVER,
+                                seconds_to_ms(delta)))
+        return changes
+
+    def change_lives(self, changes):
+        """Applies many changes of life at once, with one repaint per deck.
+
+        Decks that are not in the engine, because they were evicted or were
+        not shown yet, are added with their saved life, one at a time, right
+        before their changes are applied. So adding them never evicts a deck
+        whose changes are still pending. Changes of decks that don't exist
+        are ignored.
+
+        Args:
+            changes: A list of (deck_id, event, delta) tuples.
+        """
+        held = []
+        missing = {}
+        for change in changes:
+            if self.engine.has_deck(change[0]):
+                held.append(change)
             else:
-                value = self._bar_info[deck_id]['recoverValue']
+                missing.setdefault(change[0], []).append(change)
+        self.engine.change_lives(held)
+        for deck_id, deck_changes in missing.items():
+            conf = self._deck_conf.get_deck(deck_id)
+            if conf is not None:
+                self._add_deck(conf)
+                self.engine.change_lives(deck_changes)
+
+    def record_event(self, event):
+        """Records an event of the current deck in the journal.
+
+        Args:
+            event: One of the EVENT_* constants of the event_journal module.
+        """
+        if self._journal is not None:
+            self._journal.record(event, self._cur_deck_id)
+
+    def start_drain(self):
+        """Starts draining the current deck's life from now on."""
+        if self.engine.has_deck(self._cur_deck_id):
+            self.engine.start_drain(self._cur_deck_id)
 
-        self._progress_bar.inc_current_value(multiplier * value)
+    def stop_drain(self):
+        """Applies the pending drain and stops draining the current deck."""
+        if self.engine.has_deck(self._cur_deck_id):
+            self.engine.stop_drain(self._cur_deck_id)
 
-        life = self._progress_bar.get_current_value()
-        self._bar_info[deck_id]['currentValue'] = life
-        if life > 0:
-            self._game_over = False
-        elif not self._game_over:
-            self._game_over = True
-            runHook('LifeDrain.gameOver')
+    def drain_tick(self):
+        """Brings the life bar up to date with the time elapsed.
 
-    def _add_deck(self, deck_id):
+        Returns:
+            The time in milliseconds until the bar visibly changes again.
+        """
+        if self.engine.has_deck(self._cur_deck_id):
+            self.engine.apply_drain(self._cur_deck_id)
+        return self.next_change_in()
+
+    def next_change_in(self):
+        """Time in milliseconds until the bar visibly changes by draining."""
+        if self._progress_bar is None:
+            return 1000
+        return self._progress_bar.next_change_in()
+
+    def _on_life_change(self, deck_id, life):
+        """Shows the new life on the Progress Bar if it is the current deck."""
+        if deck_id == self._cur_deck_id and self._progress_bar is not None:
+            self._progress_bar.set_current_value(life)
+        self.history.record(deck_id, life)
+        self._hook_dispatcher.emit('LifeDrain.lifeChanged', deck_id,
+                                   ms_to_seconds(life), key=deck_id)
+        if self._state_store is not None:
+            self._state_store.save(self._profile, deck_id, life)
+
+    def _on_deck_evict(self, deck_id, life):
+        """Keeps the life of a deck evicted from the engine."""
+        self.history.forget(deck_id)
+        self._saved_lives[deck_id] = life
+        if self._state_store is not None:
+            self._state_store.save(self._profile, deck_id, life)
+        elif len(self._saved_lives) > SAVED_LIVES_CAPACITY:
+            self._saved_lives.popitem(last=False)
+
+    def _set_cur_deck(self, deck_id):
+        """Switches the current deck, which the engine never evicts."""
+        self._cur_deck_id = deck_id
+        self.engine.pin(deck_id)
+
+    def _add_deck(self, conf):
         """Adds a deck to the list of decks that are being managed.
 
         Args:
-            deck_id: The ID of the deck.
+            conf: A dictionary with the deck's configuration.
         """
-        conf = self._deck_conf.get()
-        self._bar_info[deck_id] = {
-            'maxValue': conf['maxLife'],
-            'currentValue': conf['maxLife'],
-            'recoverValue': conf['recover'],
-            'damageValue': conf['damage']
-        }
+        saved_life = self._saved_lives.pop(conf['id'], None)
+        self.engine.add_deck(conf['id'], *_engine_conf(conf), saved_life)
+        self.history.record(conf['id'], self.engine.get_life(conf['id']))
 
     def _update_progress_bar_style(self):
         """Synchronizes the Progress Bar styling with the Global Settings."""
         conf = self._global_conf.get()
         self._progress_bar.dock_at(conf['barPosition'])
+        self._progress_bar.set_max_fps(conf['barMaxFps'])
         progress_bar_style = {
             'height': conf['barHeight'],
             'fgColor': conf['barFgColor'],
@@ -139,3 +347,17 @@ class DeckManager:
         if conf['enableBgColor']:
             progress_bar_style['bgColor'] = conf['barBgColor']
         self._progress_bar.set_style(progress_bar_style)
+
+
+def _engine_conf(conf):
+    """Converts the maximum life, recover and damage of a deck to milliseconds.
+
+    Args:
+        conf: A dictionary with the deck's configuration, in seconds.
+
+    Returns:
+        A tuple with the maximum life, recover and damage, in milliseconds.
+    """
+    damage = conf['damage']
+    return (seconds_to_ms(conf['maxLife']), seconds_to_ms(conf['recover']),
+            None if damage is None else seconds_to_ms(damage))
@@ -0,0 +1,172 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import unicodedata
+
+from .defaults import DEFAULTS
+
+SEPARATOR = '::'
+
+
+class DeckTree:
+    """Resolves the Life Drain settings of decks through the deck hierarchy.
+
+    A deck without its own settings inherits them from its nearest configured
+    ancestor, and falls back to the defaults. The hierarchy is indexed by deck
+    name once, from all decks of the collection, so resolving the settings of
+    a deck only walks up its ancestors. Names are compared ignoring case, as
+    Anki does. Resolved settings are cached until the settings of the deck or
+    of one of its ancestors change.
+
+    When decks are added, renamed or deleted, only the affected decks and
+    their subdecks are updated in the index.
+    """
+
+    fields = ('maxLife', 'recover', 'damage', 'awayPolicy')
+
+    _confs = None
+    _main_window = None
+    _resolved = None
+
+    def __init__(self, mw):
+        self._main_window = mw
+        self._resolved = {}
+
+    def get_conf(self, deck):
+        """Gets the effective Life Drain settings of a deck.
+
+        Args:
+            deck: The deck, as returned by Anki's deck manager.
+
+        Returns:
+            A dictionary with the maxLife, recover and damage of the deck.
+        """
+        if self._confs is None:
+            self._build()
+        key = _key(deck['name'])
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            if key not in self._confs:
+                self._confs[key] = deck.get('lifedrain', {})
+            resolved = self._resolve(key)
+        return resolved
+
+    def update_deck(self, deck):
+        """Updates the index after the settings of a deck were saved.
+
+        Args:
+            deck: The deck, as returned by Anki's deck manager.
+        """
+        key = _key(deck['name'])
+        if self._confs is not None:
+            self._confs[key] = deck.get('lifedrain', {})
+        self._forget_resolved(key)
+
+    def knows(self, name):
+        """Checks if a deck name is indexed, or if there is no index yet.
+
+        Args:
+            name: The full name of the deck.
+        """
+        return self._confs is None or _key(name) in self._confs
+
+    def add(self, name):
+        """Indexes a deck that was just created, and its missing ancestors.
+
+        Decks created by Anki have no Life Drain settings yet.
+
+        Args:
+            name: The full name of the deck.
+        """
+        if self._confs is None:
+            return
+        key = _key(name)
+        while key and key not in self._confs:
+            self._confs[key] = {}
+            key = key.rpartition(SEPARATOR)[0]
+
+    def rename(self, old_name, new_name):
+        """Moves a renamed deck and its subdecks in the index.
+
+        Args:
+            old_name: The full name of the deck before it was renamed.
+            new_name: The full name of the deck now.
+        """
+        old_key = _key(old_name)
+        new_key = _key(new_name)
+        if old_key == new_key:
+            return
+        self._forget_resolved(old_key)
+        self._forget_resolved(new_key)
+        if self._confs is None:
+            return
+        for key in self._subtree(old_key):
+            self._confs[new_key + key[len(old_key):]] = self._confs.pop(key)
+        self.add(new_name)
+
+    def remove(self, name):
+        """Removes a deleted deck and its subdecks from the index.
+
+        Args:
+            name: The full name of the deck.
+        """
+        key = _key(name)
+        self._forget_resolved(key)
+        if self._confs is not None:
+            for subdeck_key in self._subtree(key):
+                del self._confs[subdeck_key]
+
+    def invalidate(self):
+        """Discards the index, so it is built again on the next lookup.
+
+        Must be called when the whole collection may have changed, e.g. after
+        a sync.
+        """
+        self._confs = None
+        self._resolved = {}
+
+    def _build(self):
+        """Indexes the settings of all decks by their name."""
+        self._confs = {
+            _key(deck['name']): deck.get('lifedrain', {})
+            for deck in self._main_window.col.decks.all()
+        }
+        self._resolved = {}
+
+    def _subtree(self, key):
+        """Lists the indexed keys of a deck and its subdecks."""
+        prefix = key + SEPARATOR
+        return [subdeck_key for subdeck_key in self._confs
+                if subdeck_key == key or subdeck_key.startswith(prefix)]
+
+    def _forget_resolved(self, key):
+        """Drops the resolved settings of a deck and its subdecks."""
+        prefix = key + SEPARATOR
+        for resolved_key in list(self._resolved):
+            if resolved_key == key or resolved_key.startswith(prefix):
+                del self._resolved[resolved_key]
+
+    def _resolve(self, key):
+        """Resolves the settings of a deck and its ancestors, with caching."""
+        parent_key, separator, _ = key.rpartition(SEPARATOR)
+        if separator and parent_key in self._confs:
+            parent = self._resolved.get(parent_key)
+            if parent is None:
+                parent = self._resolve(parent_key)
+        else:
+            parent = DEFAULTS
+
+        own_conf = self._confs[key]
+        resolved = {
+            field: own_conf[field] if field in own_conf else parent[field]
+            for field in self.fields
+        }
+        self._resolved[key] = resolved
+        return resolved
+
+
+def _key(name):
+    """Gets the key of a deck name in the index, ignoring case as Anki does."""
+    return unicodedata.normalize('NFC', name.lower())
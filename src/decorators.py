@@ -17,3 +17,22 @@ def must_be_enabled(func):
         return func(self, *args, **kwargs)
 
     return _wrapper
+
+
+def with_enabled_config(func):
+    """Runs the method only if the add-on is enabled.
+
+    The global configuration is read once and passed to the method as its
+    first argument, so it doesn't need to read it again.
+    """
+    def _wrapper(self, *args, **kwargs):
+        try:
+            config = self.config.get()
+        except AttributeError:
+            return None
+
+        if not config['enable']:
+            return None
+        return func(self, config, *args, **kwargs)
+
+    return _wrapper
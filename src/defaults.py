@@ -3,6 +3,7 @@ Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
 See the LICENCE file in the repository root for full licence text.
 """
 
+AWAY_POLICIES = ['Freeze life', 'Drain the time away']
 BEHAVIORS = ['Drain life', 'Do nothing', 'Recover life']
 POSITION_OPTIONS = ['Top', 'Bottom']
 STYLE_OPTIONS = [
@@ -32,6 +33,7 @@ DEFAULTS = {
     'maxLife': 120,
     'recover': 5,
     'damage': None,
+    'awayPolicy': AWAY_POLICIES.index('Freeze life'),
     'barPosition': POSITION_OPTIONS.index('Bottom'),
     'barHeight': 15,
     'barFgColor': '#489ef6',
@@ -39,6 +41,7 @@ DEFAULTS = {
     'barBorderRadius': 0,
     'barText': 0,
     'barTextColor': '#000',
+    'barMaxFps': 30,
     'barStyle': STYLE_OPTIONS.index('Default'),
     'stopOnAnswer': False,
     'enable': True,
@@ -50,4 +53,5 @@ DEFAULTS = {
     'behavUndo': BEHAVIORS.index('Drain life'),
     'behavBury': BEHAVIORS.index('Do nothing'),
     'behavSuspend': BEHAVIORS.index('Do nothing'),
+    'profileHooks': False,
 }
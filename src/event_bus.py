@@ -0,0 +1,69 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+SCREEN_CHANGE = 'screenChange'
+SHOW_QUESTION = 'showQuestion'
+SHOW_ANSWER = 'showAnswer'
+ANSWER_CARD = 'answerCard'
+RESET = 'reset'
+UNDO = 'undo'
+BURY = 'bury'
+SUSPEND = 'suspend'
+LEECH = 'leech'
+NOTES_DELETED = 'notesDeleted'
+
+
+class EventBus:
+    """Dispatches the events that Life Drain receives from Anki.
+
+    Each event has a dispatch table, a tuple of handlers that is only rebuilt
+    when a handler subscribes. The functions returned by emitter() are bound
+    to the table of their event, so emitting an event doesn't look anything
+    up before calling the handlers.
+    """
+
+    _tables = None
+
+    def __init__(self):
+        self._tables = {}
+
+    def subscribe(self, event, handler):
+        """Registers a function to be called when an event is emitted.
+
+        Args:
+            event: The name of the event, one of the constants of this module.
+            handler: The function to be called with the event's arguments.
+        """
+        table = self._table(event)
+        table[0] = table[0] + (handler,)
+
+    def emitter(self, event):
+        """Creates a function that emits an event.
+
+        Args:
+            event: The name of the event.
+
+        Returns:
+            A function that calls the handlers of the event with its
+            arguments.
+        """
+        table = self._table(event)
+
+        def emit(*args):
+            for handler in table[0]:
+                handler(*args)
+
+        return emit
+
+    def emit(self, event, *args):
+        """Calls the handlers of an event with the given arguments."""
+        for handler in self._table(event)[0]:
+            handler(*args)
+
+    def _table(self, event):
+        table = self._tables.get(event)
+        if table is None:
+            table = self._tables[event] = [()]
+        return table
@@ -0,0 +1,172 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import os
+import struct
+import time
+from array import array
+
+EVENT_DRAIN = 0
+EVENT_RECOVER = 1
+EVENT_DAMAGE = 2
+EVENT_GAME_OVER = 3
+EVENT_BURY = 4
+EVENT_SUSPEND = 5
+EVENT_UNDO = 6
+EVENT_NAMES = ['drain', 'recover', 'damage', 'gameOver', 'bury', 'suspend',
+               'undo']
+
+_BLOCK_MAGIC = b'LDJ2'
+# Typecodes of the timestamp, deck ID, event and delta (in milliseconds)
+# columns of a block.
+_BLOCK_COLUMNS = 'dqBq'
+_BLOCK_HEADER = struct.Struct('=4sI')
+
+
+class EventJournal:
+    """Records what happens to the life of the decks during a session.
+
+    Each event has a timestamp, a deck ID, an event type and a life delta.
+    The events are kept in a fixed-size ring buffer made of typed arrays, so
+    recording an event doesn't allocate, and memory stays bounded. If the
+    buffer wraps before being flushed, the oldest events are dropped.
+
+    The events are flushed in bulk to a binary file, in blocks of columns
+    that can be read back with read_journal. When the file grows past its
+    maximum size, it is rotated.
+
+    Attributes:
+        dropped: The number of events dropped since the journal was created.
+    """
+
+    dropped = 0
+
+    _capacity = None
+    _clock = None
+    _count = 0
+    _deck_ids = None
+    _deltas = None
+    _events = None
+    _flush_threshold = None
+    _max_bytes = None
+    _backups = None
+    _next = 0
+    _path = None
+    _schedule_flush = None
+    _times = None
+
+    def __init__(self, path, capacity=4096, max_bytes=1 << 20, backups=3,
+                 schedule_flush=None, clock=time.time):
+        """Allocates the ring buffer.
+
+        Args:
+            path: The path of the journal file.
+            capacity: Optional. The number of events kept in memory.
+            max_bytes: Optional. The size at which the file is rotated.
+            backups: Optional. The number of rotated files that are kept.
+            schedule_flush: Optional. A function called when the buffer is
+                getting full, so that a flush can be scheduled.
+            clock: Optional. A function that returns the current time.
+        """
+        self._path = path
+        self._capacity = capacity
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._schedule_flush = schedule_flush
+        self._clock = clock
+        self._flush_threshold = capacity * 3 // 4
+        self._times = array('d', bytes(8 * capacity))
+        self._deck_ids = array('q', bytes(8 * capacity))
+        self._events = array('B', bytes(capacity))
+        self._deltas = array('q', bytes(8 * capacity))
+
+    def record(self, event, deck_id, delta=0):
+        """Records an event.
+
+        Args:
+            event: One of the EVENT_* constants.
+            deck_id: The ID of the deck, or None.
+            delta: Optional. The amount of life added or removed, in integer
+                milliseconds.
+        """
+        i = self._next
+        self._times[i] = self._clock()
+        self._deck_ids[i] = deck_id or 0
+        self._events[i] = event
+        self._deltas[i] = delta
+        i += 1
+        self._next = i if i < self._capacity else 0
+
+        count = self._count + 1
+        if count > self._capacity:
+            self.dropped += 1
+            count = self._capacity
+        elif count == self._flush_threshold and self._schedule_flush:
+            self._schedule_flush()
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def flush(self):
+        """Appends the buffered events to the journal file."""
+        count = self._count
+        if not count:
+            return
+        start = (self._next - count) % self._capacity
+        columns = [self._slice(column, start, count) for column in (
+            self._times, self._deck_ids, self._events, self._deltas)]
+        self._count = 0
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(self._path, 'ab') as journal_file:
+            journal_file.write(_BLOCK_HEADER.pack(_BLOCK_MAGIC, count))
+            for column in columns:
+                column.tofile(journal_file)
+            size = journal_file.tell()
+        if size >= self._max_bytes:
+            self._rotate()
+
+    def _slice(self, column, start, count):
+        """Gets the buffered items of a column, from the oldest one."""
+        end = start + count
+        if end <= self._capacity:
+            return column[start:end]
+        return column[start:] + column[:end - self._capacity]
+
+    def _rotate(self):
+        """Renames the journal file to <path>.1, shifting older backups."""
+        for i in range(self._backups - 1, 0, -1):
+            older = '{}.{}'.format(self._path, i)
+            if os.path.exists(older):
+                os.replace(older, '{}.{}'.format(self._path, i + 1))
+        os.replace(self._path, '{}.1'.format(self._path))
+
+
+def read_journal(path):
+    """Reads the events of a journal file, for offline analysis.
+
+    Args:
+        path: The path of the journal file.
+
+    Yields:
+        Tuples of (timestamp, deck ID, event name, delta in seconds).
+    """
+    with open(path, 'rb') as journal_file:
+        while True:
+            header = journal_file.read(_BLOCK_HEADER.size)
+            if len(header) < _BLOCK_HEADER.size:
+                return
+            magic, count = _BLOCK_HEADER.unpack(header)
+            if magic != _BLOCK_MAGIC:
+                raise ValueError('Invalid journal block in {}'.format(path))
+
+            columns = []
+            for typecode in _BLOCK_COLUMNS:
+                column = array(typecode)
+                column.fromfile(journal_file, count)
+                columns.append(column)
+            for timestamp, deck_id, event, delta in zip(*columns):
+                yield timestamp, deck_id, EVENT_NAMES[event], delta / 1000
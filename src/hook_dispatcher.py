@@ -0,0 +1,137 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import time
+from collections import OrderedDict
+
+from anki import hooks
+
+# The time the listeners may take in a turn of the event loop, in seconds.
+# Events left when it is used up are delivered on the next turn.
+TURN_BUDGET = 0.008
+
+# A listener that takes longer than this in a call, in seconds, is slow.
+LISTENER_BUDGET = 0.002
+
+
+class HookDispatcher:
+    """Delivers the hooks run by Life Drain to other add-ons.
+
+    The hooks are queued and run by a timer right after the current turn of
+    the event loop, so the drain and the reviewer never wait for listeners.
+    While queued, events of the same hook and key are coalesced, and only
+    the latest arguments are delivered.
+
+    Each call of a listener is measured. Listeners that take longer than
+    LISTENER_BUDGET are reported, and once the listeners took TURN_BUDGET in
+    a turn, the remaining events wait for the next turn.
+    """
+
+    _clock = None
+    _make_timer = None
+    _queue = None
+    _slow_listeners = None
+    _timer = None
+
+    def __init__(self, make_timer=None, clock=time.perf_counter):
+        """Initializes the dispatcher.
+
+        Args:
+            make_timer: Optional. A function that creates a timer. Without
+                it, the hooks are run right away.
+            clock: Optional. A function that returns the current time in
+                seconds.
+        """
+        self._make_timer = make_timer
+        self._clock = clock
+        self._queue = OrderedDict()
+        self._slow_listeners = {}
+
+    def emit(self, hook, *args, key=None):
+        """Queues a hook to be run after the current turn of the event loop.
+
+        Nothing is queued if the hook has no listeners.
+
+        Args:
+            hook: The name of the hook, as used by anki.hooks.addHook.
+            *args: The arguments passed to the listeners.
+            key: Optional. Queued events of the same hook and key are
+                coalesced into the last one.
+        """
+        if not _listeners(hook):
+            return
+        if self._make_timer is None:
+            self._run(hook, args)
+            return
+        if not self._queue:
+            if self._timer is None:
+                self._timer = self._make_timer(0, self.dispatch, False)
+            else:
+                self._timer.start(0)
+        self._queue[(hook, key)] = args
+
+    def dispatch(self):
+        """Runs the queued hooks, until the budget of the turn is used.
+
+        The events left are run on the next turn, also when a listener
+        raises, so a failing listener doesn't stop the later hooks.
+        """
+        deadline = self._clock() + TURN_BUDGET
+        try:
+            while self._queue:
+                (hook, _), args = self._queue.popitem(last=False)
+                self._run(hook, args)
+                if self._clock() > deadline:
+                    break
+        finally:
+            if self._queue:
+                self._timer.start(0)
+
+    def report(self):
+        """Generates a text report of the slow listeners.
+
+        Returns:
+            A text with the hook, name, slow calls and the longest call of
+            each slow listener.
+        """
+        lines = ['{:<48} {:>8} {:>10}'.format('Slow listener', 'Calls',
+                                              'Max')]
+        for (hook, name), (count, maximum) in sorted(
+                self._slow_listeners.items(), key=lambda item: -item[1][1]):
+            lines.append('{:<48} {:>8} {:>7.1f} ms'.format(
+                '{} {}'.format(hook, name), count, maximum * 1e3))
+        if len(lines) == 1:
+            lines.append('No listener exceeded {:.0f} ms.'.format(
+                LISTENER_BUDGET * 1e3))
+        return '\n'.join(lines)
+
+    def _run(self, hook, args):
+        """Calls the listeners of a hook, as anki.hooks.runHook does."""
+        listeners = _listeners(hook)
+        for listener in list(listeners):
+            start = self._clock()
+            try:
+                listener(*args)
+            except Exception:
+                # A listener that fails is removed, as runHook does.
+                if listener in listeners:
+                    listeners.remove(listener)
+                raise
+            finally:
+                duration = self._clock() - start
+                if duration > LISTENER_BUDGET:
+                    self._add_slow(hook, listener, duration)
+
+    def _add_slow(self, hook, listener, duration):
+        name = '{}.{}'.format(getattr(listener, '__module__', '?'),
+                              getattr(listener, '__qualname__', listener))
+        count, maximum = self._slow_listeners.get((hook, name), (0, 0))
+        self._slow_listeners[(hook, name)] = (count + 1,
+                                              max(maximum, duration))
+
+
+def _listeners(hook):
+    """Gets the list of listeners registered with anki.hooks.addHook."""
+    return hooks._hooks.get(hook) or []  # pylint: disable=protected-access
@@ -0,0 +1,168 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import heapq
+import time
+
+HISTOGRAM_SIZE = 32
+
+
+class HookProfiler:
+    """Measures how long the callbacks registered by Life Drain take.
+
+    Every callback registered into Anki is wrapped. While the profiler is
+    disabled, the wrapper only checks a flag before calling the callback.
+
+    Attributes:
+        enabled: A flag that turns the measurements on.
+    """
+
+    enabled = False
+
+    _clock = None
+    _slowest = None
+    _slowest_size = None
+    _stats = None
+
+    def __init__(self, clock=time.perf_counter, slowest_size=10):
+        """Initializes the profiler, disabled.
+
+        Args:
+            clock: Optional. A function that returns the current time in
+                seconds.
+            slowest_size: Optional. How many of the slowest calls are kept.
+        """
+        self._clock = clock
+        self._slowest_size = slowest_size
+        self._slowest = []
+        self._stats = {}
+
+    def wrap(self, name, func):
+        """Wraps a callback so that its calls are measured.
+
+        Args:
+            name: The name shown in the report, usually the hook's name.
+            func: The callback.
+
+        Returns:
+            A function that accepts the same arguments as the callback.
+        """
+        stats = self._stats.setdefault(name, HookStats(name))
+
+        def _wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = self._clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._add(stats, self._clock() - start)
+
+        return _wrapper
+
+    def reset(self):
+        """Discards all measurements."""
+        self._slowest = []
+        for stats in self._stats.values():
+            stats.reset()
+
+    def report(self):
+        """Generates a text report of the measurements.
+
+        Returns:
+            A text with the calls, p50, p99 and maximum latency of each hook,
+            followed by the slowest calls.
+        """
+        lines = ['{:<32} {:>8} {:>10} {:>10} {:>10}'.format(
+            'Hook', 'Calls', 'p50', 'p99', 'Max')]
+        for stats in sorted(self._stats.values(), key=lambda s: -s.total):
+            if not stats.count:
+                continue
+            lines.append('{:<32} {:>8} {:>10} {:>10} {:>10}'.format(
+                stats.name, stats.count,
+                _format_duration(stats.percentile(0.5)),
+                _format_duration(stats.percentile(0.99)),
+                _format_duration(stats.maximum)))
+        if len(lines) == 1:
+            lines.append('No calls were measured yet.')
+
+        lines.extend(['', 'Slowest calls'])
+        for duration, timestamp, name in sorted(self._slowest, reverse=True):
+            lines.append('{:<32} {:>10}  {}'.format(
+                name, _format_duration(duration),
+                time.strftime('%H:%M:%S', time.localtime(timestamp))))
+        return '\n'.join(lines)
+
+    def _add(self, stats, duration):
+        stats.add(duration)
+        if len(self._slowest) < self._slowest_size:
+            heapq.heappush(self._slowest, (duration, time.time(), stats.name))
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest,
+                              (duration, time.time(), stats.name))
+
+
+class HookStats:
+    """Keeps the latency histogram of a hook.
+
+    The histogram has power of two buckets of microseconds, so its size is
+    fixed regardless of how many calls are measured.
+
+    Attributes:
+        name: The name of the hook.
+        count: The number of calls.
+        total: The total time spent in the calls, in seconds.
+        maximum: The longest call, in seconds.
+    """
+
+    name = None
+    count = 0
+    total = 0
+    maximum = 0
+
+    _histogram = None
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        """Discards all measurements."""
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self._histogram = [0] * HISTOGRAM_SIZE
+
+    def add(self, duration):
+        """Adds a call that took some duration, in seconds."""
+        self.count += 1
+        self.total += duration
+        if duration > self.maximum:
+            self.maximum = duration
+        bucket = min(int(duration * 1e6).bit_length(), HISTOGRAM_SIZE - 1)
+        self._histogram[bucket] += 1
+
+    def percentile(self, fraction):
+        """Estimates a percentile from the histogram.
+
+        Args:
+            fraction: The percentile, between 0 and 1.
+
+        Returns:
+            The upper bound of the bucket of the percentile, in seconds.
+        """
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self._histogram):
+            seen += count
+            if seen >= target and count:
+                return min((1 << bucket) / 1e6, self.maximum)
+        return self.maximum
+
+
+def _format_duration(seconds):
+    if seconds >= 1e-3:
+        return '{:.1f} ms'.format(seconds * 1e3)
+    return '{:.0f} us'.format(seconds * 1e6)
@@ -0,0 +1,304 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import time
+from collections import OrderedDict
+
+from .event_journal import (EVENT_DAMAGE, EVENT_DRAIN, EVENT_GAME_OVER,
+                            EVENT_RECOVER)
+
+MS_PER_SECOND = 1000
+
+
+def monotonic_ms():
+    """Gets the time of a monotonic clock, in integer milliseconds."""
+    return time.monotonic_ns() // 1000000
+
+
+def seconds_to_ms(seconds):
+    """Converts seconds, as shown to the user, into integer milliseconds."""
+    return int(round(seconds * MS_PER_SECOND))
+
+
+def ms_to_seconds(milliseconds):
+    """Converts milliseconds into whole seconds, rounding up."""
+    return -(-milliseconds // MS_PER_SECOND)
+
+
+class DeckState:  # pylint: disable=too-few-public-methods
+    """The life and settings of a deck managed by the LifeEngine."""
+
+    __slots__ = ('max_life', 'life', 'recover', 'damage', 'drain_start',
+                 'game_over')
+
+    def __init__(self, max_life, life, recover, damage):
+        self.max_life = max_life
+        self.life = life
+        self.recover = recover
+        self.damage = damage
+        self.drain_start = None
+        self.game_over = False
+
+
+class LifeEngine:
+    """Keeps track of the life of each deck, without any user interface.
+
+    The engine owns the life state of the decks: it clamps the life between
+    zero and the maximum life, applies the recover, damage and drain rules and
+    detects game over. It doesn't depend on Anki or Qt, so views subscribe to
+    it to know when the life of a deck changes.
+
+    All amounts of life and times are integer milliseconds, so the life never
+    drifts because of floating point rounding.
+
+    At most capacity decks are kept. When a new deck is added beyond that,
+    the deck used least recently is evicted, so that its life can be saved
+    elsewhere and restored when the deck is added again. The pinned deck,
+    usually the one under review, is never evicted.
+
+    Events:
+        change: Called with (deck_id, life) when the life of a deck changes.
+        gameOver: Called with (deck_id) when the life of a deck reaches zero.
+        evict: Called with (deck_id, life) when a deck is evicted.
+    """
+
+    _capacity = None
+    _clock = None
+    _decks = None
+    _journal = None
+    _listeners = None
+    _pinned = None
+
+    def __init__(self, clock=monotonic_ms, journal=None, capacity=256):
+        """Initializes an engine without any decks.
+
+        Args:
+            clock: Optional. A function that returns the current time in
+                integer milliseconds, used to calculate the drain.
+            journal: Optional. An EventJournal to record the life changes.
+            capacity: Optional. The maximum number of decks kept.
+        """
+        self._clock = clock
+        self._journal = journal
+        self._capacity = capacity
+        self._decks = OrderedDict()
+        self._listeners = {'change': [], 'gameOver': [], 'evict': []}
+
+    def subscribe(self, event, callback):
+        """Registers a function to be called when an event happens.
+
+        Args:
+            event: The name of the event: 'change', 'gameOver' or 'evict'.
+            callback: The function to be called.
+        """
+        self._listeners[event].append(callback)
+
+    def has_deck(self, deck_id):
+        """Checks if a deck is being managed by the engine."""
+        return deck_id in self._decks
+
+    def add_deck(self, deck_id, max_life, recover, damage, current_life=None):
+        """Adds a deck, with full life by default.
+
+        If the engine is full, the deck used least recently is evicted.
+
+        Args:
+            deck_id: The ID of the deck.
+            max_life: The maximum life of the deck, in milliseconds.
+            recover: The life recovered after answering a card.
+            damage: The life lost after answering 'Again', or None.
+            current_life: Optional. The initial life of the deck.
+        """
+        if current_life is None or current_life > max_life:
+            current_life = max_life
+        self._decks[deck_id] = DeckState(max_life, max(current_life, 0),
+                                         recover, damage)
+        self._decks.move_to_end(deck_id)
+        while len(self._decks) > self._capacity:
+            self._evict()
+
+    def pin(self, deck_id):
+        """Keeps a deck from being evicted, in place of the one pinned before.
+
+        Args:
+            deck_id: The ID of the deck, or None to pin no deck.
+        """
+        self._pinned = deck_id
+
+    def clear(self):
+        """Removes all decks from the engine."""
+        self._decks = OrderedDict()
+
+    def set_deck_conf(self, deck_id, max_life, recover, damage,
+                      current_life):
+        """Updates a deck's settings and current life.
+
+        Args:
+            deck_id: The ID of the deck.
+            max_life: The maximum life of the deck, in milliseconds.
+            recover: The life recovered after answering a card.
+            damage: The life lost after answering 'Again', or None.
+            current_life: The new current life of the deck.
+        """
+        if deck_id not in self._decks:
+            self.add_deck(deck_id, max_life, recover, damage)
+        deck = self._deck(deck_id)
+        deck.max_life = max_life
+        deck.recover = recover
+        deck.damage = damage
+        self._set_life(deck_id, current_life)
+
+    def get_life(self, deck_id):
+        """Gets the current life of a deck, applying any pending drain."""
+        self.apply_drain(deck_id)
+        return self._decks[deck_id].life
+
+    def get_max_life(self, deck_id):
+        """Gets the maximum life of a deck."""
+        return self._decks[deck_id].max_life
+
+    def recover(self, deck_id, increment=True, value=None, damage=False):
+        """Recovers life of a deck.
+
+        Args:
+            deck_id: The ID of the deck.
+            increment: Optional. A flag that indicates increment or decrement.
+            value: Optional. The value used to increment or decrement.
+            damage: Optional. If this flag is ON, uses the default damage value.
+        """
+        event, delta = self.recover_delta(deck_id, increment, value, damage)
+        self.change_lives([(deck_id, event, delta)])
+
+    def recover_delta(self, deck_id, increment=True, value=None,
+                      damage=False):
+        """Calculates the life recovered by a deck, without changing it.
+
+        Args:
+            deck_id: The ID of the deck.
+            increment: Optional. A flag that indicates increment or decrement.
+            value: Optional. The value used to increment or decrement.
+            damage: Optional. If this flag is ON, uses the default damage value.
+
+        Returns:
+            A tuple with the event to be recorded and the amount of life.
+        """
+        deck = self._decks[deck_id]
+        event = EVENT_RECOVER
+        multiplier = 1
+        if not increment:
+            multiplier = -1
+        if value is None:
+            if damage and deck.damage is not None:
+                event = EVENT_DAMAGE
+                multiplier = -1
+                value = deck.damage
+            else:
+                value = deck.recover
+        return event, multiplier * value
+
+    def change_life(self, deck_id, delta):
+        """Adds a positive or negative amount of life to a deck."""
+        self._set_life(deck_id, self._deck(deck_id).life + delta)
+
+    def change_lives(self, changes):
+        """Applies many changes of life at once.
+
+        The changes of each deck are summed with its pending drain, so the
+        listeners are usually notified once per deck. The drain is applied
+        on its own only if it empties the life, so that game over isn't
+        missed. Changes of decks that are not managed by the engine are
+        ignored.
+
+        Args:
+            changes: A list of (deck_id, event, delta) tuples, where event is
+                the EVENT_* constant recorded in the journal.
+        """
+        totals = {}
+        for deck_id, event, delta in changes:
+            if deck_id not in self._decks:
+                continue
+            if self._journal is not None:
+                self._journal.record(event, deck_id, delta)
+            totals[deck_id] = totals.get(deck_id, 0) + delta
+        for deck_id, delta in totals.items():
+            drain = self._take_drain(deck_id)
+            if drain >= self._decks[deck_id].life:
+                self.change_life(deck_id, -drain)
+                drain = 0
+            self.change_life(deck_id, delta - drain)
+
+    def start_drain(self, deck_id):
+        """Starts draining the life of a deck from now on."""
+        deck = self._deck(deck_id)
+        if deck.drain_start is None:
+            deck.drain_start = self._clock()
+
+    def stop_drain(self, deck_id):
+        """Applies the pending drain and stops draining the life of a deck."""
+        self.apply_drain(deck_id)
+        self._decks[deck_id].drain_start = None
+
+    def is_draining(self, deck_id):
+        """Checks if the life of a deck is being drained."""
+        return self._decks[deck_id].drain_start is not None
+
+    def apply_drain(self, deck_id):
+        """Drains the life that elapsed since the drain was last applied."""
+        elapsed = self._take_drain(deck_id)
+        if elapsed:
+            self.change_life(deck_id, -elapsed)
+
+    def _take_drain(self, deck_id):
+        """Records the drain elapsed since it was last applied.
+
+        Returns:
+            The life to be drained, which is 0 if the deck isn't draining.
+        """
+        deck = self._deck(deck_id)
+        if deck.drain_start is None:
+            return 0
+        now = self._clock()
+        elapsed = now - deck.drain_start
+        deck.drain_start = now
+        if self._journal is not None:
+            self._journal.record(EVENT_DRAIN, deck_id, -elapsed)
+        return elapsed
+
+    def _set_life(self, deck_id, life):
+        """Sets the life of a deck, clamped between 0 and its maximum."""
+        deck = self._decks[deck_id]
+        if life > deck.max_life:
+            life = deck.max_life
+        elif life < 0:
+            life = 0
+
+        if life == deck.life:
+            return
+        deck.life = life
+        for callback in self._listeners['change']:
+            callback(deck_id, life)
+
+        if life > 0:
+            deck.game_over = False
+        elif not deck.game_over:
+            deck.game_over = True
+            if self._journal is not None:
+                self._journal.record(EVENT_GAME_OVER, deck_id)
+            for callback in self._listeners['gameOver']:
+                callback(deck_id)
+
+    def _deck(self, deck_id):
+        """Gets the state of a deck, marking it as recently used."""
+        self._decks.move_to_end(deck_id)
+        return self._decks[deck_id]
+
+    def _evict(self):
+        """Removes the deck used least recently, unless it is pinned."""
+        deck_id = next(deck_id for deck_id in self._decks
+                       if deck_id != self._pinned)
+        self.apply_drain(deck_id)
+        deck = self._decks.pop(deck_id)
+        for callback in self._listeners['evict']:
+            callback(deck_id, deck.life)
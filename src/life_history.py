@@ -0,0 +1,163 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from array import array
+
+from .life_engine import monotonic_ms
+
+BUCKETS = 128
+BUCKET_WIDTH = 1000
+
+SPARKLINE_SVG = (
+    '<svg class="lifedrain-sparkline" width="{width}" height="{height}" '
+    'viewBox="0 0 {width} {height}" style="vertical-align: middle">'
+    '<polygon points="{band}" fill="{color}" fill-opacity="0.35"/>'
+    '<polyline points="{line}" fill="none" stroke="{color}"/>'
+    '</svg>'
+)
+
+
+class _DeckHistory:  # pylint: disable=too-few-public-methods
+    """The downsampled life of a deck, as minimum and maximum per bucket."""
+
+    __slots__ = ('start', 'width', 'last', 'mins', 'maxs')
+
+    def __init__(self, start, life):
+        self.start = start
+        self.width = BUCKET_WIDTH
+        self.last = life
+        self.mins = array('i', [life])
+        self.maxs = array('i', [life])
+
+
+class LifeHistory:
+    """Records how the life of each deck evolved, in a bounded space.
+
+    The time since the first record of a deck is split into at most BUCKETS
+    buckets of equal width, each keeping the minimum and maximum life seen
+    in it. When the buckets are used up, each pair of buckets is merged and
+    the width is doubled, so the whole history always fits, at a lower
+    resolution. A deck takes about a kilobyte, however long the session is.
+
+    Buckets without records keep the last life recorded before them, since
+    the life only changes through records.
+    """
+
+    _clock = None
+    _decks = None
+
+    def __init__(self, clock=monotonic_ms):
+        """Initializes an empty history.
+
+        Args:
+            clock: Optional. A function that returns the current time, in
+                milliseconds.
+        """
+        self._clock = clock
+        self._decks = {}
+
+    def record(self, deck_id, life):
+        """Records the life of a deck at the current time.
+
+        Args:
+            deck_id: The ID of the deck.
+            life: The life of the deck, in milliseconds.
+        """
+        now = self._clock()
+        deck = self._decks.get(deck_id)
+        if deck is None:
+            self._decks[deck_id] = _DeckHistory(now, life)
+            return
+
+        index = (now - deck.start) // deck.width
+        while index >= BUCKETS:
+            _halve(deck)
+            index = (now - deck.start) // deck.width
+
+        mins = deck.mins
+        maxs = deck.maxs
+        if index >= len(mins):
+            gap = index - len(mins)
+            mins.extend(array('i', [deck.last]) * gap)
+            maxs.extend(array('i', [deck.last]) * gap)
+            # The life was still the last one when the bucket started.
+            mins.append(min(deck.last, life))
+            maxs.append(max(deck.last, life))
+        elif life < mins[index]:
+            mins[index] = life
+        elif life > maxs[index]:
+            maxs[index] = life
+        deck.last = life
+
+    def forget(self, deck_id):
+        """Discards the history of a deck."""
+        self._decks.pop(deck_id, None)
+
+    def clear(self):
+        """Discards the history of all decks."""
+        self._decks = {}
+
+    def buckets(self, deck_id):
+        """Gets the minimum and maximum life of each bucket of a deck.
+
+        Args:
+            deck_id: The ID of the deck.
+
+        Returns:
+            A tuple with the arrays of minimums and maximums, which are empty
+            if nothing was recorded for the deck.
+        """
+        deck = self._decks.get(deck_id)
+        if deck is None:
+            return array('i'), array('i')
+        return deck.mins, deck.maxs
+
+    def sparkline(self, deck_id, max_life, width=120, height=20,
+                  color='#489ef6'):
+        """Draws the history of a deck as an inline SVG sparkline.
+
+        The band between the minimum and maximum of each bucket is filled,
+        and the line follows the middle of the band.
+
+        Args:
+            deck_id: The ID of the deck.
+            max_life: The life at the top of the sparkline.
+            width: Optional. The width of the sparkline, in pixels.
+            height: Optional. The height of the sparkline, in pixels.
+            color: Optional. The color of the sparkline.
+
+        Returns:
+            The SVG markup, or an empty string if there are less than two
+            buckets to draw.
+        """
+        mins, maxs = self.buckets(deck_id)
+        count = len(mins)
+        if count < 2 or max_life <= 0:
+            return ''
+        step = width / (count - 1)
+        scale = (height - 1) / max_life
+
+        def point(index, life):
+            return '{:.1f},{:.1f}'.format(index * step,
+                                          height - 0.5 - life * scale)
+
+        top = [point(index, life) for index, life in enumerate(maxs)]
+        bottom = [point(index, life) for index, life in enumerate(mins)]
+        line = [point(index, (low + high) / 2)
+                for index, (low, high) in enumerate(zip(mins, maxs))]
+        return SPARKLINE_SVG.format(
+            width=width, height=height, color=color,
+            band=' '.join(top + bottom[::-1]), line=' '.join(line))
+
+
+def _halve(deck):
+    """Merges each pair of buckets of a deck, doubling their width."""
+    mins = deck.mins
+    maxs = deck.maxs
+    deck.mins = array('i', [min(mins[index:index + 2])
+                            for index in range(0, len(mins), 2)])
+    deck.maxs = array('i', [max(maxs[index:index + 2])
+                            for index in range(0, len(maxs), 2)])
+    deck.width *= 2
@@ -4,9 +4,17 @@ See the LICENCE file in the repository root for full licence text.
 """
 
 from .config import GlobalConf, DeckConf
+from .defaults import AWAY_POLICIES
 from .deck_manager import DeckManager
-from .decorators import must_be_enabled
-from . import settings
+from .decorators import must_be_enabled, with_enabled_config
+from .event_bus import (
+    EventBus, ANSWER_CARD, BURY, LEECH, NOTES_DELETED, RESET, SCREEN_CHANGE,
+    SHOW_ANSWER, SHOW_QUESTION, SUSPEND, UNDO)
+from .event_journal import EVENT_BURY, EVENT_SUSPEND, EVENT_UNDO
+from .hook_dispatcher import HookDispatcher
+from .hook_profiler import HookProfiler
+from .review_state import ReviewStateMachine, ANSWER_AGAIN
+from .window_events import WindowEvents
 
 
 class Lifedrain:
@@ -16,49 +24,85 @@ class Lifedrain:
     complex functionalities implemented in another classes.
 
     Attributes:
+        bus: An instance of EventBus, through which Anki's events arrive.
         config: An instance of GlobalConf.
         deck_manager: An instance of DeckManager.
-        status: A dictionary that keeps track the events on Anki.
+        hook_dispatcher: An instance of HookDispatcher, which runs the hooks
+            of Life Drain after the current tick.
+        profiler: An instance of HookProfiler.
+        review: An instance of ReviewStateMachine.
+        revlog_reader: An instance of RevlogReader, or None.
+        visibility: An instance of VisibilityWatcher, or None. While it
+            tells the main window is not visible, the drain starts suspended.
+        window_events: An instance of WindowEvents, the only event filter
+            that Life Drain installs on the main window.
     """
 
+    bus = None
     config = None
     deck_manager = None
-    status = {
-        'special_action': False,  # Flag for bury, suspend, remove, leech
-        'reviewed': False,
-        'review_response': 0,
-        'screen': None,
-        'shortcuts': [],
-    }
+    hook_dispatcher = None
+    profiler = None
+    review = None
+    revlog_reader = None
+    visibility = None
+    window_events = None
 
     _qt = None
     _mw = None
+    _advisor = None
     _dconfig = None
+    _make_timer = None
+    _recover_queue = None
+    _recover_timer = None
+    _shortcuts = None
+    _suspended = False
     _timer = None
 
-    def __init__(self, make_timer, mw, qt):
+    def __init__(self, make_timer, mw, qt, state_store=None, journal=None,
+                 revlog_reader=None):
         """Initializes DeckManager and Settings, and add-on initial setup.
 
+        The drain timer is only built when the drain starts for the first time.
+
         Args:
             make_timer: A function that creates a timer.
             mw: Anki's main window.
             qt: The PyQt library.
+            state_store: Optional. A StateStore to persist the life of decks.
+            journal: Optional. An EventJournal to record what happens.
+            revlog_reader: Optional. A RevlogReader with the aggregates of
+                the review log.
         """
         self._qt = qt
         self._mw = mw
+        self.profiler = HookProfiler()
         self.config = GlobalConf(mw)
         self._dconfig = DeckConf(mw)
+        self.hook_dispatcher = HookDispatcher(
+            lambda delay, func, repeat: make_timer(
+                delay, self.profiler.wrap('hook_dispatch', func), repeat))
 
-        self.deck_manager = DeckManager(mw, qt, self.config, self._dconfig)
-        self._timer = make_timer(
-            100, lambda: self.deck_manager.recover_life(False, 0.1), True)
-        self._timer.stop()
+        self.window_events = WindowEvents(mw, qt)
+        self.deck_manager = DeckManager(mw, qt, self.config, self._dconfig,
+                                        state_store, journal,
+                                        self.hook_dispatcher,
+                                        self.window_events)
+        self.revlog_reader = revlog_reader
+        self._make_timer = make_timer
+        self._recover_queue = []
+        self._shortcuts = []
+        self.review = ReviewStateMachine()
+        self.bus = EventBus()
+        self._subscribe_events()
 
     def global_settings(self):
         """Opens a dialog with the Global Settings."""
-        drain_enabled = self._timer.isActive()
+        from . import settings  # pylint: disable=import-outside-toplevel
+        drain_enabled = self._is_draining()
         self.toggle_drain(False)
         settings.global_settings(self._qt, self.config)
+        self.update_profiler()
         self.clear_global_shortcuts()
         self.set_global_shortcuts()
         self.toggle_drain(drain_enabled)
@@ -66,17 +110,87 @@ class Lifedrain:
 
     def deck_settings(self):
         """Opens a dialog with the Deck Settings."""
-        drain_enabled = self._timer.isActive()
+        from . import settings  # pylint: disable=import-outside-toplevel
+        drain_enabled = self._is_draining()
         self.toggle_drain(False)
-        settings.deck_settings(self._qt, self._dconfig, self.deck_manager)
+        stats = None
+        if self.revlog_reader is not None:
+            stats = self.revlog_reader.get(self._dconfig.get()['id'])
+        settings.deck_settings(self._qt, self._dconfig, self.deck_manager,
+                               self.suggest_deck_settings, stats)
         self.toggle_drain(drain_enabled)
         self.deck_manager.update()
 
+    def suggest_deck_settings(self, deck_id, on_done):
+        """Suggests settings for a deck from its review history.
+
+        The replay runs in the background, so the GUI is not blocked without
+        NumPy. The advisor, and NumPy with it, is only loaded the first time.
+
+        Args:
+            deck_id: The ID of the deck.
+            on_done: A function called in the main thread with the suggestion
+                of SettingsAdvisor.suggest, or None if the replay failed.
+        """
+        if self._advisor is None:
+            from .advisor import (  # pylint: disable=import-outside-toplevel
+                SettingsAdvisor)
+            self._advisor = SettingsAdvisor(self._mw)
+        advisor = self._advisor
+
+        def done(future):
+            suggestion = None
+            try:
+                suggestion = future.result()
+            finally:
+                # If the replay failed, on_done still gets None, and the
+                # error is reported by Anki afterwards.
+                on_done(suggestion)
+
+        self._mw.taskman.run_in_background(
+            lambda: advisor.suggest(deck_id), done)
+
+    def clear_suggestions(self):
+        """Discards the replays of the advisor, when the collection changes."""
+        self._advisor = None
+
+    def update_profiler(self):
+        """Turns the hook profiler on or off as set in the Global Settings."""
+        self.profiler.enabled = self.config.get()['profileHooks']
+
+    def invalidate_config(self):
+        """Discards the cached global and deck configurations."""
+        self.config.invalidate()
+        self._dconfig.invalidate_tree()
+
+    def invalidate_deck_config(self):
+        """Discards the cached configuration of the current deck."""
+        self._dconfig.invalidate()
+
+    def deck_renamed(self, old_name, deck_id):
+        """Updates the deck hierarchy after a deck was renamed or deleted.
+
+        Args:
+            old_name: The name of the deck before the change.
+            deck_id: The ID of the deck.
+        """
+        self._dconfig.deck_renamed(old_name, deck_id)
+
+    def deck_looked_up(self, name, deck_id):
+        """Adds a deck to the deck hierarchy if Anki just created it.
+
+        Args:
+            name: The name given to Anki's DeckManager.id.
+            deck_id: The ID it returned, or None if there is no such deck.
+        """
+        if deck_id is not None:
+            self._dconfig.deck_looked_up(name, deck_id)
+
     def clear_global_shortcuts(self):
         """Clear the global shortcuts."""
-        for shortcut in self.status['shortcuts']:
+        for shortcut in self._shortcuts:
             self._qt.sip.delete(shortcut)
-        self.status['shortcuts'] = []
+        self._shortcuts = []
 
     @must_be_enabled
     def set_global_shortcuts(self):
@@ -88,7 +202,7 @@ class Lifedrain:
         shortcuts = [
             tuple([config['globalSettingsShortcut'], self.global_settings])
         ]
-        self.status['shortcuts'] = self._mw.applyShortcuts(shortcuts)
+        self._shortcuts = self._mw.applyShortcuts(shortcuts)
 
     def review_shortcuts(self, shortcuts):
         """Generates the review screen shortcuts."""
@@ -124,10 +238,57 @@ class Lifedrain:
         Args:
             enable: Optional. Enables the drain if True.
         """
-        if self._timer.isActive() and enable is not True:
+        self._toggle_drain(enable)
+
+    def window_visibility_changed(self, visible):
+        """Suspends the drain while the main window is not visible.
+
+        While suspended, the drain timer doesn't run at all. Depending on the
+        deck's policy, the life is either frozen, or the time spent away is
+        drained in one step when the window is visible again.
+
+        Args:
+            visible: A flag indicating if the main window is visible.
+        """
+        if not visible and self._timer is not None and self._timer.isActive():
+            self._suspended = True
             self._timer.stop()
-        elif not self._timer.isActive() and enable is not False:
-            self._timer.start()
+            if self._freezes_while_away():
+                self.deck_manager.stop_drain()
+        elif visible and self._suspended:
+            self._suspended = False
+            self.deck_manager.start_drain()
+            self._timer.start(self.deck_manager.drain_tick())
+
+    def recover_life(self, *args, **kwargs):
+        """Recovers life and reschedules the next repaint of the drain.
+
+        Accepts the same arguments as DeckManager.recover_life.
+        """
+        self.deck_manager.recover_life(*args, **kwargs)
+        self._reschedule_drain()
+
+    def queue_recover(self, increment=True, value=None, damage=False):
+        """Recovers life of the current deck on the next event loop turn.
+
+        Used by the LifeDrain.recover hook. Accepts the same arguments as
+        DeckManager.recover_life.
+        """
+        change = self.deck_manager.recover_change(increment, value, damage)
+        if change is not None:
+            self._queue_changes([change])
+
+    def recover_batch(self, deltas):
+        """Recovers life of many decks on the next event loop turn.
+
+        Used by the LifeDrain.recoverBatch hook.
+
+        Args:
+            deltas: A list whose items are either an amount of life for the
+                current deck, or a (deck_id, amount) tuple. Negative amounts
+                drain life.
+        """
+        self._queue_changes(self.deck_manager.batch_changes(deltas))
 
     @must_be_enabled
     def screen_change(self, state):
@@ -137,14 +298,11 @@ class Lifedrain:
             state: The name of the current screen.
         """
         if state != 'review':
-            self.toggle_drain(False)
+            self._toggle_drain(False)
 
-        if self.status['reviewed'] and state in ['overview', 'review']:
+        if self.review.change_screen(state):
             self.deck_manager.recover_life()
 
-        self.status['reviewed'] = False
-        self.status['screen'] = state
-
         if state == 'deckBrowser':
             self.deck_manager.bar_visible(False)
         else:
@@ -154,48 +312,126 @@ class Lifedrain:
     @must_be_enabled
     def show_question(self):
         """Called when a question is shown."""
-        self.toggle_drain(True)
-        if self.status['reviewed']:
-            if self.status['review_response'] == 1:
-                self.deck_manager.recover_life(damage=True)
-            else:
-                self.deck_manager.recover_life()
-        self.status['reviewed'] = False
-        self.status['special_action'] = False
+        self._toggle_drain(True)
+        response = self.review.show_question()
+        if response is not None:
+            self.recover_life(damage=response == ANSWER_AGAIN)
 
-    @must_be_enabled
-    def show_answer(self):
+    @with_enabled_config
+    def show_answer(self, config):
         """Called when an answer is shown."""
-        conf = self.config.get()
-        self.toggle_drain(not conf['stopOnAnswer'])
-        self.status['reviewed'] = True
+        self._toggle_drain(not config['stopOnAnswer'])
+        self.review.show_answer()
 
-    @must_be_enabled
-    def undo(self):
-        """Called when an undo event happens on Anki. Not so accurate though."""
-        on_review = self.status['screen'] == 'review'
-        if on_review and not self.status['special_action']:
-            self.status['reviewed'] = False
-            conf = self.config.get()
-            self._special_action_behavior(conf['behavUndo'])
-        self.status['special_action'] = False
+    def answer_card(self, ease):
+        """Called when a card is answered, with the ease of the answer."""
+        self.review.answer_card(ease)
 
-    @must_be_enabled
-    def bury(self):
+    def review_reset(self):
+        """Called when the reviewer is reset."""
+        self.review.reset()
+
+    def special_action(self):
+        """Called when a card is marked as leech or a note is deleted."""
+        self.review.mark_special_action()
+
+    @with_enabled_config
+    def undo(self, config):
+        """Called when an undo event happens on Anki.
+
+        Only undoing an answer while reviewing applies the undo behavior. An
+        undo right after a special action reverts that action instead.
+        """
+        if self.review.undo():
+            self.deck_manager.record_event(EVENT_UNDO)
+            self._special_action_behavior(config['behavUndo'])
+
+    @with_enabled_config
+    def bury(self, config):
         """Called when a card or note is buried."""
-        self.status['special_action'] = True
-        conf = self.config.get()
-        self._special_action_behavior(conf['behavBury'])
+        self.review.mark_special_action()
+        self.deck_manager.record_event(EVENT_BURY)
+        self._special_action_behavior(config['behavBury'])
 
-    @must_be_enabled
-    def suspend(self):
+    @with_enabled_config
+    def suspend(self, config):
         """Called when a card or note is suspended."""
-        self.status['special_action'] = True
-        conf = self.config.get()
-        self._special_action_behavior(conf['behavSuspend'])
+        self.review.mark_special_action()
+        self.deck_manager.record_event(EVENT_SUSPEND)
+        self._special_action_behavior(config['behavSuspend'])
 
     def _special_action_behavior(self, behavior_index):
         if behavior_index == 0:
-            self.deck_manager.recover_life(False)
+            self.recover_life(False)
         elif behavior_index == 2:
-            self.deck_manager.recover_life(True)
+            self.recover_life(True)
+
+    def _subscribe_events(self):
+        """Subscribes the handlers of Anki's events to the event bus."""
+        subscribe = self.bus.subscribe
+        subscribe(SCREEN_CHANGE, self.screen_change)
+        subscribe(SHOW_QUESTION, self.show_question)
+        subscribe(SHOW_ANSWER, self.show_answer)
+        subscribe(ANSWER_CARD, self.answer_card)
+        subscribe(RESET, self.review_reset)
+        subscribe(UNDO, self.undo)
+        subscribe(BURY, self.bury)
+        subscribe(SUSPEND, self.suspend)
+        subscribe(LEECH, self.special_action)
+        subscribe(NOTES_DELETED, self.special_action)
+
+    def _queue_changes(self, changes):
+        """Queues changes of life, applied together on the next loop turn."""
+        if not self._recover_queue:
+            if self._recover_timer is None:
+                self._recover_timer = self._make_timer(0, self.profiler.wrap(
+                    'recover_batch', self._apply_recover_queue), False)
+            else:
+                self._recover_timer.start(0)
+        self._recover_queue.extend(changes)
+
+    def _apply_recover_queue(self):
+        """Applies the queued changes of life in a single update."""
+        changes = self._recover_queue
+        self._recover_queue = []
+        self.deck_manager.change_lives(changes)
+        self._reschedule_drain()
+
+    def _toggle_drain(self, enable=None):
+        """Toggles the life drain, without checking if it is enabled."""
+        if self._is_draining() and enable is not True:
+            self._timer.stop()
+            self._suspended = False
+            self.deck_manager.stop_drain()
+        elif not self._is_draining() and enable is not False:
+            if self._timer is None:
+                self._timer = self._make_timer(1000, self.profiler.wrap(
+                    'drain_timer', self._drain_tick), True)
+            if (self.visibility is not None
+                    and not self.visibility.is_visible()):
+                self._suspended = True
+                if not self._freezes_while_away():
+                    self.deck_manager.start_drain()
+                return
+            self.deck_manager.start_drain()
+            self._timer.start(self.deck_manager.next_change_in())
+
+    def _freezes_while_away(self):
+        """Checks if the current deck keeps its life while away."""
+        away_policy = AWAY_POLICIES[self._dconfig.get()['awayPolicy']]
+        return away_policy == 'Freeze life'
+
+    def _drain_tick(self):
+        """Repaints the drain and sleeps until the bar visibly changes."""
+        self._timer.start(self.deck_manager.drain_tick())
+
+    def _is_draining(self):
+        """Checks if the drain is running, or suspended while away."""
+        if self._suspended:
+            return True
+        return self._timer is not None and self._timer.isActive()
+
+    def _reschedule_drain(self):
+        """Wakes the drain timer earlier if the life changed meanwhile."""
+        if self._is_draining() and not self._suspended:
+            self._timer.start(self.deck_manager.next_change_in())
@@ -3,31 +3,226 @@ Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
 See the LICENCE file in the repository root for full licence text.
 """
 
+import os
+import time
+
 from aqt import mw, qt, gui_hooks
 from aqt.overview import OverviewBottomBar
-from aqt.progress import ProgressManager
 from aqt.toolbar import BottomBar
+from aqt.utils import showText
 
 from anki import hooks
+from anki.decks import DeckManager
 from anki.lang import _
 from anki.sched import Scheduler
 
+from .event_bus import (
+    ANSWER_CARD, BURY, LEECH, NOTES_DELETED, RESET, SCREEN_CHANGE,
+    SHOW_ANSWER, SHOW_QUESTION, SUSPEND, UNDO)
+from .event_journal import EventJournal
 from .lifedrain import Lifedrain
+from .revlog_reader import RevlogReader
+from .state_store import StateStore
+from .visibility import VisibilityWatcher
 
+STATE_FLUSH_DELAY = 5000
+JOURNAL_FLUSH_DELAY = 1000
+STARTUP_TIMES = {}
 
-def main():
-    """Initializes the Life Drain add-on."""
-    make_timer = ProgressManager(mw).timer
-    lifedrain = Lifedrain(make_timer, mw, qt)
 
+def main():
+    """Initializes the Life Drain add-on.
+
+    Only the hooks are registered here. The life bar, its dock and the timers
+    are built when they are needed for the first time.
+    """
+    start = time.perf_counter()
+    state_store = make_state_store()
+    journal = make_journal()
+    revlog_reader = make_revlog_reader(state_store)
+    lifedrain = Lifedrain(make_timer, mw, qt, state_store, journal,
+                          revlog_reader)
+
+    setup_profiler(lifedrain)
+    setup_state_store(lifedrain)
+    setup_revlog_reader(lifedrain)
+    setup_config_cache(lifedrain)
     setup_shortcuts(lifedrain)
     setup_state_change(lifedrain)
     setup_deck_browser(lifedrain)
     setup_overview(lifedrain)
     setup_review(lifedrain)
+    setup_visibility(lifedrain)
 
     mw.addonManager.setConfigAction(__name__, lifedrain.global_settings)
-    hooks.addHook('LifeDrain.recover', lifedrain.deck_manager.recover_life)
+    hooks.addHook('LifeDrain.recover', lifedrain.profiler.wrap(
+        'LifeDrain.recover', lifedrain.queue_recover))
+    hooks.addHook('LifeDrain.recoverBatch', lifedrain.profiler.wrap(
+        'LifeDrain.recoverBatch', lifedrain.recover_batch))
+    STARTUP_TIMES['init'] = time.perf_counter() - start
+
+
+def make_timer(*args):
+    """Creates a timer with Anki's progress manager."""
+    return mw.progress.timer(*args)
+
+
+def deferred_timer(delay, func):
+    """Creates a function that starts a single shot timer.
+
+    The timer is only built the first time the function is called.
+
+    Args:
+        delay: The delay of the timer, in milliseconds.
+        func: The function called when the timer fires.
+    """
+    timers = []
+
+    def start():
+        if timers:
+            timers[0].start()
+        else:
+            timers.append(make_timer(delay, func, False, False))
+
+    return start
+
+
+def make_state_store():
+    """Creates the store that keeps the life of the decks between sessions.
+
+    The store lives in the user_files folder, which is kept on updates. Its
+    writes are flushed a few seconds after the life changes.
+    """
+    state_store = StateStore(user_file_path('state.db'), deferred_timer(
+        STATE_FLUSH_DELAY, lambda: state_store.flush()))
+    return state_store
+
+
+def make_journal():
+    """Creates the journal of drain, recover, damage and game over events.
+
+    The journal is flushed when its buffer is getting full and when the
+    profile is closed.
+    """
+    journal = EventJournal(user_file_path('journal.bin'),
+                           schedule_flush=deferred_timer(
+                               JOURNAL_FLUSH_DELAY, lambda: journal.flush()))
+    return journal
+
+
+def make_revlog_reader(state_store):
+    """Creates the reader that keeps the aggregates of the review log.
+
+    The aggregates are kept in the state store. When there are many new
+    reviews, they are read in batches on the next turns of the event loop.
+    """
+    revlog_reader = RevlogReader(mw, state_store, deferred_timer(
+        0, lambda: revlog_reader.update()))
+    return revlog_reader
+
+
+def user_file_path(name):
+    """Gets the path of a file in the add-on's user_files folder."""
+    addon = mw.addonManager.addonFromModule(__name__)
+    return os.path.join(mw.addonManager.addonsFolder(addon), 'user_files',
+                        name)
+
+
+def setup_profiler(lifedrain):
+    """Adds the hook profile report to the Tools menu.
+
+    The profiler is turned on or off from the Global Settings.
+    """
+    def show_report():
+        startup = 'Add-on import: {:.1f} ms, initialization: {:.1f} ms'.format(
+            STARTUP_TIMES.get('import', 0) * 1e3,
+            STARTUP_TIMES.get('init', 0) * 1e3)
+        showText('{}\n\n{}\n\n{}'.format(
+            startup, lifedrain.profiler.report(),
+            lifedrain.hook_dispatcher.report()),
+            title='Life Drain Hook Profile')
+
+    action = mw.form.menuTools.addAction('Life Drain Hook Profile')
+    qt.qconnect(action.triggered, show_report)
+    gui_hooks.collection_did_load.append(
+        lambda col: lifedrain.update_profiler())
+
+
+def setup_state_store(lifedrain):
+    """Restores the life of the decks on profile load and saves on close.
+
+    The event journal is also flushed when the profile closes.
+    """
+    profile = lifedrain.profiler.wrap
+    gui_hooks.collection_did_load.append(profile(
+        'collection_did_load',
+        lambda col: lifedrain.deck_manager.load_state(mw.pm.name)))
+    gui_hooks.profile_will_close.append(profile(
+        'profile_will_close', lifedrain.deck_manager.save_state))
+
+
+def setup_revlog_reader(lifedrain):
+    """Reads the new reviews on profile load and after syncing."""
+    profile = lifedrain.profiler.wrap
+    revlog_reader = lifedrain.revlog_reader
+    gui_hooks.collection_did_load.append(profile(
+        'collection_did_load', lambda col: revlog_reader.load(mw.pm.name)))
+    gui_hooks.profile_will_close.append(profile(
+        'profile_will_close', revlog_reader.unload))
+    gui_hooks.sync_will_start.append(profile(
+        'sync_will_start', revlog_reader.sync_will_start))
+    gui_hooks.sync_did_finish.append(profile(
+        'sync_did_finish', revlog_reader.sync_finished))
+
+
+def setup_config_cache(lifedrain):
+    """Discards the cached configuration when it may have changed."""
+    profile = lifedrain.profiler.wrap
+    gui_hooks.collection_did_load.append(profile(
+        'collection_did_load', lambda col: lifedrain.invalidate_config()))
+    gui_hooks.collection_did_load.append(profile(
+        'collection_did_load', lambda col: lifedrain.clear_suggestions()))
+    gui_hooks.profile_will_close.append(profile(
+        'profile_will_close', lifedrain.invalidate_config))
+    gui_hooks.sync_did_finish.append(profile(
+        'sync_did_finish', lifedrain.invalidate_config))
+
+    DeckManager.select = hooks.wrap(
+        DeckManager.select,
+        profile('DeckManager.select',
+                lambda *args: lifedrain.invalidate_deck_config()))
+    deck_renamed = profile('DeckManager.rename', lifedrain.deck_renamed)
+    deck_removed = profile('DeckManager.rem', lifedrain.deck_renamed)
+
+    def rename(decks, deck, *args, _old, **kwargs):
+        old_name = deck['name']
+        result = _old(decks, deck, *args, **kwargs)
+        deck_renamed(old_name, deck['id'])
+        return result
+
+    def rem(decks, deck_id, *args, _old, **kwargs):
+        deck = decks.get(deck_id, default=False)
+        old_name = deck['name'] if deck else None
+        result = _old(decks, deck_id, *args, **kwargs)
+        # Anki never deletes the default deck, but may rename it, so it is
+        # handled as a rename when the deck is still there.
+        if old_name is not None:
+            deck_removed(old_name, deck_id)
+        return result
+
+    DeckManager.rename = hooks.wrap(DeckManager.rename, rename, 'around')
+    DeckManager.rem = hooks.wrap(DeckManager.rem, rem, 'around')
+
+    # DeckManager.id mostly looks up existing decks, and only creates one
+    # when the name is new.
+    deck_looked_up = profile('DeckManager.id', lifedrain.deck_looked_up)
+
+    def deck_id(decks, name, *args, _old, **kwargs):
+        deck_id = _old(decks, name, *args, **kwargs)
+        deck_looked_up(name, deck_id)
+        return deck_id
+
+    DeckManager.id = hooks.wrap(DeckManager.id, deck_id, 'around')
 
 
 def setup_shortcuts(lifedrain):
@@ -43,16 +238,22 @@ def setup_shortcuts(lifedrain):
         elif state == 'overview':
             lifedrain.overview_shortcuts(shortcuts)
 
-    gui_hooks.collection_did_load.append(lambda col: global_shortcuts())
-    gui_hooks.state_shortcuts_will_change.append(state_shortcuts)
+    profile = lifedrain.profiler.wrap
+    gui_hooks.collection_did_load.append(profile(
+        'collection_did_load', lambda col: global_shortcuts()))
+    gui_hooks.state_shortcuts_will_change.append(
+        profile('state_shortcuts_will_change', state_shortcuts))
 
 
 def setup_state_change(lifedrain):
     """Setup hooks triggered when changing state."""
-    gui_hooks.state_will_change.append(
-        lambda *args: lifedrain.screen_change(args[0]))
-    gui_hooks.state_did_reset.append(
-        lambda *args: lifedrain.status.update({'reviewed': False}))
+    profile = lifedrain.profiler.wrap
+    screen_change = lifedrain.bus.emitter(SCREEN_CHANGE)
+    reset = lifedrain.bus.emitter(RESET)
+    gui_hooks.state_will_change.append(profile(
+        'state_will_change', lambda *args: screen_change(args[0])))
+    gui_hooks.state_did_reset.append(profile(
+        'state_did_reset', lambda *args: reset()))
 
 
 def setup_deck_browser(lifedrain):
@@ -67,11 +268,13 @@ def setup_deck_browser(lifedrain):
         mw.col.decks.select(did)
         lifedrain.deck_settings()
 
-    gui_hooks.deck_browser_will_show_options_menu.append(options_menu)
+    gui_hooks.deck_browser_will_show_options_menu.append(
+        lifedrain.profiler.wrap('deck_browser_will_show_options_menu',
+                                options_menu))
 
 
 def setup_overview(lifedrain):
-    """Adds a Life Drain button into the overview screen."""
+    """Adds Life Drain buttons and the life sparkline to the overview."""
 
     def button(text, link, shortcut_key=None):
         attribute_list = [
@@ -85,7 +288,8 @@ def setup_overview(lifedrain):
 
             def update_buf(buf):
                 buttons = [button('Life Drain', 'lifedrain', 'L'),
-                           button('Recover', 'recover', 'None')]
+                           button('Recover', 'recover', 'None'),
+                           lifedrain.deck_manager.life_sparkline()]
                 return '{}\n{}'.format(buf, '\n'.join(buttons))
 
             def link_handler(url):
@@ -105,27 +309,47 @@ def setup_overview(lifedrain):
         return default_bottom_bar_draw(*args, **kwargs)
 
     default_bottom_bar_draw = BottomBar.draw
-    BottomBar.draw = bottom_bar_draw
+    BottomBar.draw = lifedrain.profiler.wrap('BottomBar.draw', bottom_bar_draw)
 
 
 def setup_review(lifedrain):
     """Setup hooks triggered while reviewing."""
-    gui_hooks.reviewer_did_show_question.append(
-        lambda card: lifedrain.show_question())
-    gui_hooks.reviewer_did_show_answer.append(
-        lambda card: lifedrain.show_answer())
-    gui_hooks.reviewer_did_answer_card.append(
-        lambda *args: lifedrain.status.update({'review_response': args[2]}))
-    gui_hooks.review_did_undo.append(lambda card_id: lifedrain.undo())
+    profile = lifedrain.profiler.wrap
+    emitter = lifedrain.bus.emitter
+    show_question = emitter(SHOW_QUESTION)
+    show_answer = emitter(SHOW_ANSWER)
+    answer_card = emitter(ANSWER_CARD)
+    undo = emitter(UNDO)
+    leech = emitter(LEECH)
+    notes_deleted = emitter(NOTES_DELETED)
+    bury = emitter(BURY)
+    suspend = emitter(SUSPEND)
+
+    gui_hooks.reviewer_did_show_question.append(profile(
+        'reviewer_did_show_question', lambda card: show_question()))
+    gui_hooks.reviewer_did_show_answer.append(profile(
+        'reviewer_did_show_answer', lambda card: show_answer()))
+    gui_hooks.reviewer_did_answer_card.append(profile(
+        'reviewer_did_answer_card', lambda *args: answer_card(args[2])))
+    gui_hooks.review_did_undo.append(profile(
+        'review_did_undo', lambda card_id: undo()))
 
     # Action on cards
-    hooks.card_did_leech.append(
-        lambda *args: lifedrain.status.update({'special_action': True}))
-    hooks.notes_will_be_deleted.append(
-        lambda *args: lifedrain.status.update({'special_action': True}))
+    hooks.card_did_leech.append(profile(
+        'card_did_leech', lambda *args: leech()))
+    hooks.notes_will_be_deleted.append(profile(
+        'notes_will_be_deleted', lambda *args: notes_deleted()))
     Scheduler.buryCards = hooks.wrap(
         Scheduler.buryCards,
-        lambda *args: lifedrain.bury())
+        profile('Scheduler.buryCards', lambda *args: bury()))
     Scheduler.suspendCards = hooks.wrap(
         Scheduler.suspendCards,
-        lambda *args: lifedrain.suspend())
+        profile('Scheduler.suspendCards', lambda *args: suspend()))
+
+
+def setup_visibility(lifedrain):
+    """Suspends the drain while Anki's main window is not visible."""
+    lifedrain.visibility = VisibilityWatcher(
+        mw, qt, lifedrain.profiler.wrap(
+            'window_visibility', lifedrain.window_visibility_changed),
+        lifedrain.window_events)
@@ -3,34 +3,80 @@ Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
 See the LICENCE file in the repository root for full licence text.
 """
 
+import math
+import time
+
 from .defaults import POSITION_OPTIONS, STYLE_OPTIONS, TEXT_FORMAT
+from .window_events import WindowEvents
 
 
 class ProgressBar:
     """Implements a Progress Bar to be used on Anki.
 
     Creates an interface with QProgressBar to make its usage on Anki easier. It
-    also adds a (limited) ability to use decimal values as the current value.
+    is only a view of the life kept by the LifeEngine. The values of the bar
+    are integer milliseconds, so the QProgressBar range needs no conversion.
+
+    The bar is only repainted when the width of its chunk, in pixels, or its
+    text changes, and at most max_fps times per second. While the bar is
+    hidden or the main window is minimized, repaints are postponed until it
+    is shown again.
+
+    Attributes:
+        style_registry: An instance of StyleRegistry.
     """
 
+    style_registry = None
+
     _current_value = 1
-    _dock = {}
+    _custom_style = None
+    _dirty = False
+    _dock = None
+    _dock_index = None
+    _dock_position = None
+    _event_filter = None
+    _frame_interval = 0
+    _last_repaint = 0
     _max_value = 1
     _mw = None
+    _pixel = None
+    _repaint_timer = None
+    _width = None
     _qprogressbar = None
+    _formatter = None
+    _formatters = None
     _qt = None
-    _text_format = ''
+    _style_key = None
+    _styles = None
+    _text = None
+    _window_events = None
 
-    def __init__(self, mw, qt):
+    def __init__(self, mw, qt, window_events=None):
         """Initializes a QProgressBar and keeps main window and PyQt references.
 
         Args:
             mw: Anki's main window.
             qt: The PyQt library.
+            window_events: Optional. The WindowEvents of the main window.
         """
         self._mw = mw
         self._qt = qt
+        if window_events is None:
+            window_events = WindowEvents(mw, qt)
+        self._window_events = window_events
         self._qprogressbar = qt.QProgressBar()
+        self._styles = {}
+        self.style_registry = StyleRegistry(qt)
+        self._formatters = [
+            TextFormatter(text_format['format'])
+            if 'format' in text_format else None
+            for text_format in TEXT_FORMAT
+        ]
+        self._event_filter = _make_repaint_filter(qt, self._on_event)
+        self._qprogressbar.installEventFilter(self._event_filter)
+        for event_type in (qt.QEvent.Show, qt.QEvent.WindowStateChange):
+            window_events.subscribe(
+                event_type, lambda event: self._repaint_postponed())
 
     def set_visible(self, visible):
         """Sets the visibility of the Progress Bar.
@@ -40,66 +86,143 @@ class ProgressBar:
         """
         self._qprogressbar.setVisible(visible)
 
-    def reset_bar(self):
-        """Resets the current value back to the maximum."""
-        self._current_value = self._max_value
-        self._validate_current_value()
-        self._update_text()
+    def set_max_fps(self, max_fps):
+        """Limits how many times per second the bar may be repainted.
+
+        Args:
+            max_fps: The maximum number of repaints per second.
+        """
+        self._frame_interval = 1 / max(max_fps, 1)
 
     def set_max_value(self, max_value):
         """Sets the maximum value for the bar.
 
         Args:
-            max_value: The maximum value of the bar. May have 1 decimal place.
+            max_value: The maximum value of the bar, in milliseconds.
         """
-        self._max_value = max_value * 10
-        if self._max_value <= 0:
-            self._max_value = 1
+        if max_value <= 0:
+            max_value = 1
+        if max_value == self._max_value:
+            return
+        self._max_value = max_value
+        self._pixel = None
         self._qprogressbar.setRange(0, self._max_value)
 
     def set_current_value(self, current_value):
         """Sets the current value for the bar.
 
         Args:
-            current_value: The current value of the bar. Up to 1 decimal place.
+            current_value: The current value of the bar in milliseconds,
+                already validated by the LifeEngine.
         """
-        self._current_value = current_value * 10
-        self._validate_current_value()
-        self._update_text()
+        self._current_value = current_value
+        if self._dirty or (self._pixel == self._pixel_width() and
+                           self._text == self._render_text()):
+            return
+        if not self._is_shown():
+            self._dirty = True
+            return
+
+        delay = self._last_repaint + self._frame_interval - time.monotonic()
+        if delay > 0:
+            self._dirty = True
+            self._start_repaint_timer(math.ceil(delay * 1000))
+        else:
+            self._repaint()
 
-    def inc_current_value(self, increment):
-        """Increments the current value of the bar.
+    def next_change_in(self):
+        """Gets how long the drain takes to visibly change the bar.
 
-        Args:
-            increment: A positive or negative number. Up to 1 decimal place.
-        """
-        self._current_value += increment * 10
-        self._validate_current_value()
-        if self._current_value % 10 == 0 or abs(increment) >= 1:
-            self._update_text()
+        Both the width of the bar (in pixels) and its text are considered.
 
-    def get_current_value(self):
-        """Gets the current value of the bar."""
-        return float(self._current_value) / 10
+        Returns:
+            The time in milliseconds until the bar needs to be repainted.
+        """
+        current_value = self._current_value
+        if current_value <= 0:
+            return 1000
+
+        next_change = 1000
+        width = self._bar_width()
+        if width > 0:
+            # The chunk loses its last pixel when the value goes below the
+            # smallest value that still fills it.
+            pixel = current_value * width // self._max_value
+            pixel_start = -(-pixel * self._max_value // width)
+            next_change = min(next_change, current_value - pixel_start + 1)
+        if self._formatter is not None:
+            next_change = min(next_change,
+                              self._formatter.next_change_in(current_value))
+        return max(next_change, 1)
 
     def set_style(self, options):
         """Sets the styling of the Progress Bar.
 
+        The compiled style of each set of options is memoized, and nothing is
+        done if the style is the same as the one already applied.
+
         Args:
             options: A dictionary with bar styling information.
         """
-        self._qprogressbar.setTextVisible(options['text'] != 0)  # 0 = No text
-        text_format = TEXT_FORMAT[options['text']]
-        if 'format' in text_format:
-            self._text_format = text_format['format']
-            self._qprogressbar.setFormat(text_format['format'])
+        style_key = tuple(sorted(options.items()))
+        if style_key == self._style_key:
+            return
+
+        style = self._styles.get(style_key)
+        if style is None:
+            style = self._compile_style(options)
+            self._styles[style_key] = style
+        self._style_key = style_key
+
+        self._qprogressbar.setTextVisible(style['textVisible'])
+        self._formatter = self._formatters[style['text']]
+        self._text = None
+
+        self._set_custom_style(style['customStyle'])
+        if style['palette'] is not None:
+            self._qprogressbar.setPalette(style['palette'])
+        self._qprogressbar.setStyleSheet(style['styleSheet'])
+
+    def _set_custom_style(self, custom_style):
+        """Changes the QStyle of the Progress Bar, releasing the previous one.
+
+        Args:
+            custom_style: The lowercase name of the style, or 'default'.
+        """
+        previous_style = self._custom_style
+        if custom_style == previous_style:
+            return
+
+        if custom_style != 'default':
+            qstyle = self.style_registry.acquire(custom_style)
+        else:
+            qstyle = self._qt.QApplication.style()
+        self._qprogressbar.setStyle(qstyle)
+        self._custom_style = custom_style
+
+        if previous_style not in (None, 'default'):
+            self.style_registry.release(previous_style)
+
+    def _compile_style(self, options):
+        """Compiles the bar styling options into what is applied on Qt.
 
+        Args:
+            options: A dictionary with bar styling information.
+
+        Returns:
+            A dictionary with the text format, the name of the custom style,
+            its palette and the stylesheet of the Progress Bar.
+        """
         custom_style = STYLE_OPTIONS[options['customStyle']] \
             .replace(' ', '').lower()
-        if custom_style != 'default':
-            qstyle = self._qt.QStyleFactory.create(custom_style)
-            self._qprogressbar.setStyle(qstyle)
+        style = {
+            'textVisible': options['text'] != 0,  # 0 = No text
+            'text': options['text'],
+            'customStyle': custom_style,
+            'palette': None,
+        }
 
+        if custom_style != 'default':
             palette = self._qt.QPalette()
             fg_color = self._qt.QColor(options['fgColor'])
             palette.setColor(self._qt.QPalette.Highlight, fg_color)
@@ -108,13 +231,11 @@ class ProgressBar:
                 bg_color = self._qt.QColor(options['bgColor'])
                 palette.setColor(self._qt.QPalette.Base, bg_color)
                 palette.setColor(self._qt.QPalette.Window, bg_color)
-
-            self._qprogressbar.setPalette(palette)
+            style['palette'] = palette
 
             bar_elem_dict = {'max-height': '{}px'.format(options['height'])}
             bar_elem = self._dict_to_css(bar_elem_dict)
-            self._qprogressbar.setStyleSheet(
-                'QProgressBar {{ {} }}'.format(bar_elem))
+            style['styleSheet'] = 'QProgressBar {{ {} }}'.format(bar_elem)
         else:
             bar_elem_dict = {
                 'text-align': 'center',
@@ -131,76 +252,98 @@ class ProgressBar:
                 'margin': '0px',
                 'border-radius': '{}px'.format(options['borderRadius'])})
 
-            self._qprogressbar.setStyleSheet(
+            style['styleSheet'] = (
                 'QProgressBar {{ {} }}'
                 'QProgressBar::chunk {{ {} }}'.format(bar_elem, bar_chunk))
+        return style
 
     def dock_at(self, position):
         """Docks the bar at the specified position in the Anki window.
 
+        The same dock widget is kept for the whole session, and only moved
+        between the dock areas.
+
         Args:
             position: The position where the Progress Bar will be placed.
         """
-        if 'position' in self._dock and self._dock['position'] == position:
+        if self._dock_position == position:
             return
 
-        self._dock['position'] = position
+        self._dock_position = position
         bar_visible = self._qprogressbar.isVisible()
 
-        if 'widget' in self._dock:
-            self._dock['widget'].close()
-            self._dock['widget'].deleteLater()
-
         position = POSITION_OPTIONS[position]
         if position == 'Top':
             dock_area = self._qt.Qt.TopDockWidgetArea
         elif position == 'Bottom':
             dock_area = self._qt.Qt.BottomDockWidgetArea
 
-        self._dock['widget'] = self._qt.QDockWidget()
-        self._dock['widget'].setWidget(self._qprogressbar)
-        self._dock['widget'].setTitleBarWidget(self._qt.QWidget())
+        if self._dock is None:
+            self._dock_index = DockAreaIndex(self._mw, self._qt,
+                                             self._window_events)
+            self._dock = self._qt.QDockWidget()
+            self._dock.setWidget(self._qprogressbar)
+            self._dock.setTitleBarWidget(self._qt.QWidget())
+        else:
+            self._mw.removeDockWidget(self._dock)
 
-        existing_widgets = [
-            widget for widget in self._mw.findChildren(self._qt.QDockWidget)
-            if self._mw.dockWidgetArea(widget) == dock_area
-        ]
-        if not existing_widgets:
-            self._mw.addDockWidget(dock_area, self._dock['widget'])
+        existing_widget = self._dock_index.first_dock(dock_area, self._dock)
+        if existing_widget is None:
+            self._mw.addDockWidget(dock_area, self._dock)
         else:
             self._mw.setDockNestingEnabled(True)
-            self._mw.splitDockWidget(existing_widgets[0], self._dock['widget'],
+            self._mw.splitDockWidget(existing_widget, self._dock,
                                      self._qt.Qt.Vertical)
+        self._dock.show()
         self._mw.web.setFocus()
         self._qprogressbar.setVisible(bar_visible)
 
-    def _validate_current_value(self):
-        """Asserts that the current value is between [0; max]."""
-        if self._current_value > self._max_value:
-            self._current_value = self._max_value
-        elif self._current_value < 0:
-            self._current_value = 0
+    def _repaint(self):
+        """Shows the current value and text on the QProgressBar."""
+        self._dirty = False
+        self._last_repaint = time.monotonic()
+        self._pixel = self._pixel_width()
         self._qprogressbar.setValue(self._current_value)
-        self._qprogressbar.update()
+        text = self._render_text()
+        if text != self._text:
+            self._text = text
+            self._qprogressbar.setFormat(text)
 
-    def _update_text(self):
-        """Updates the Progress Bar text."""
-        if not self._text_format:
-            return
-        if self._text_format == 'mm:ss':
-            minutes = int(self._current_value / 600)
-            seconds = int((self._current_value / 10) % 60)
-            self._qprogressbar.setFormat('{0:01d}:{1:02d}'.format(
-                minutes, seconds))
+    def _repaint_postponed(self):
+        """Repaints the bar if a repaint was postponed and it is shown."""
+        if self._dirty and self._is_shown():
+            self._repaint()
+
+    def _start_repaint_timer(self, delay):
+        if self._repaint_timer is None:
+            self._repaint_timer = self._mw.progress.timer(
+                delay, self._repaint_postponed, False, False)
         else:
-            current_value = int(self._current_value / 10)
-            if self._current_value % 10 != 0:
-                current_value += 1
-            max_value = int(self._max_value / 10)
-            text = self._text_format.replace('%v', str(current_value)).replace(
-                '%m', str(max_value)).replace(
-                    '%p', str(int(100 * current_value / max_value)))
-            self._qprogressbar.setFormat(text)
+            self._repaint_timer.start(delay)
+
+    def _on_event(self, event_type):
+        """Reacts to the bar being resized or shown."""
+        if event_type == self._qt.QEvent.Resize:
+            self._width = None
+            self._pixel = None
+        self._repaint_postponed()
+
+    def _is_shown(self):
+        return self._qprogressbar.isVisible() and not self._mw.isMinimized()
+
+    def _bar_width(self):
+        if self._width is None:
+            self._width = self._qprogressbar.width()
+        return self._width
+
+    def _pixel_width(self):
+        """Gets the width of the bar's chunk, in pixels."""
+        return self._current_value * self._bar_width() // self._max_value
+
+    def _render_text(self):
+        if self._formatter is None:
+            return None
+        return self._formatter.render(self._current_value, self._max_value)
 
     @staticmethod
     def _dict_to_css(dictionary):
@@ -209,3 +352,230 @@ class ProgressBar:
         for key, value in dictionary.items():
             css += '\n{}: {};'.format(key, value)
         return css
+
+
+class TextFormatter:
+    """Renders the text of the Progress Bar for one of the TEXT_FORMAT.
+
+    The format is compiled once, and the rendered texts are memoized for each
+    number of seconds shown, until the maximum value changes. Values are
+    integer milliseconds.
+    """
+
+    _format = None
+    _max_value = None
+    _render = None
+    _round_up = None
+    _texts = None
+
+    def __init__(self, text_format):
+        """Compiles a format.
+
+        Args:
+            text_format: A format from TEXT_FORMAT, e.g. '%v/%m (%p%)'.
+        """
+        self._texts = {}
+        if text_format == 'mm:ss':
+            self._round_up = False
+            self._render = self._render_time
+        else:
+            self._format = text_format.replace('%v', '{0}').replace(
+                '%m', '{1}').replace('%p', '{2}')
+            self._round_up = True
+            self._render = self._render_format
+
+    def render(self, current_value, max_value):
+        """Gets the text for the current value.
+
+        Args:
+            current_value: The current value of the bar, in milliseconds.
+            max_value: The maximum value of the bar, in milliseconds.
+        """
+        if max_value != self._max_value:
+            self._max_value = max_value
+            self._texts = {}
+
+        if self._round_up:
+            key = -(-current_value // 1000)
+        else:
+            key = current_value // 1000
+        text = self._texts.get(key)
+        if text is None:
+            text = self._render(key, max(max_value // 1000, 1))
+            self._texts[key] = text
+        return text
+
+    def next_change_in(self, current_value):
+        """Gets how long the drain takes to change the text, in milliseconds.
+
+        Args:
+            current_value: The current value of the bar, in milliseconds.
+        """
+        if self._round_up:
+            return (current_value - 1) % 1000 + 1
+        return current_value % 1000 + 1
+
+    @staticmethod
+    def _render_time(seconds, max_value):  # pylint: disable=unused-argument
+        return '{0:01d}:{1:02d}'.format(seconds // 60, seconds % 60)
+
+    def _render_format(self, current_value, max_value):
+        percent = int(100 * current_value / max_value)
+        return self._format.format(current_value, max_value, percent)
+
+
+class StyleRegistry:
+    """Keeps the QStyle instances used by the Progress Bar.
+
+    Each style is created at most once and shared while it is referenced.
+    Styles that are no longer referenced are released.
+    """
+
+    _qt = None
+    _styles = None
+
+    def __init__(self, qt):
+        """Initializes an empty registry.
+
+        Args:
+            qt: The PyQt library.
+        """
+        self._qt = qt
+        self._styles = {}
+
+    def acquire(self, name):
+        """Gets a style, creating it if it doesn't exist yet.
+
+        Args:
+            name: The name of the style, as understood by QStyleFactory.
+
+        Returns:
+            The QStyle instance, or None if the style is not available.
+        """
+        if name not in self._styles:
+            self._styles[name] = [self._qt.QStyleFactory.create(name), 0]
+        entry = self._styles[name]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, name):
+        """Drops a reference to a style, deleting it when no longer used.
+
+        Args:
+            name: The name of the style.
+        """
+        entry = self._styles.get(name)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._styles[name]
+            if entry[0] is not None:
+                entry[0].deleteLater()
+
+    def live_styles(self):
+        """Gets the number of references to each live style."""
+        return {name: entry[1] for name, entry in self._styles.items()}
+
+
+class DockAreaIndex:
+    """Keeps track of the dock widgets that occupy each area of a window.
+
+    The window is only scanned when the index is built. After that, the
+    index is kept up to date by the signals of the dock widgets, and new dock
+    widgets are noticed when the window polishes them. A dock widget is only
+    known to be one once it is polished, since on ChildAdded it may still be
+    under construction.
+    """
+
+    _areas = None
+    _docks = None
+    _mw = None
+    _qt = None
+
+    def __init__(self, mw, qt, window_events=None):
+        """Indexes the dock widgets that already exist in the window.
+
+        Args:
+            mw: Anki's main window.
+            qt: The PyQt library.
+            window_events: Optional. The WindowEvents of the main window.
+        """
+        self._mw = mw
+        self._qt = qt
+        self._areas = {}
+        self._docks = {}
+        self._scan()
+
+        if window_events is None:
+            window_events = WindowEvents(mw, qt)
+        window_events.subscribe(
+            qt.QEvent.ChildPolished,
+            lambda event: self._child_polished(event.child()))
+
+    def first_dock(self, area, ignore=None):
+        """Gets the first dock widget placed at an area.
+
+        Args:
+            area: A Qt.DockWidgetArea.
+            ignore: Optional. A dock widget that should not be returned.
+
+        Returns:
+            A QDockWidget, or None if there are no dock widgets at the area.
+        """
+        for dock in self._areas.get(area, ()):
+            if dock is not ignore:
+                return dock
+        return None
+
+    def _scan(self):
+        """Indexes the dock widgets that are already in the window."""
+        for dock in self._mw.findChildren(self._qt.QDockWidget):
+            self._child_polished(dock)
+
+    def _child_polished(self, child):
+        if (isinstance(child, self._qt.QDockWidget)
+                and child not in self._docks):
+            self._track(child, self._mw.dockWidgetArea(child))
+
+    def _track(self, dock, area):
+        self._docks[dock] = None
+        self._move(dock, area)
+        dock.dockLocationChanged.connect(
+            lambda new_area: self._move(dock, new_area))
+        dock.destroyed.connect(lambda *args: self._forget(dock))
+
+    def _move(self, dock, area):
+        self._remove_from_area(dock)
+        self._docks[dock] = area
+        self._areas.setdefault(area, []).append(dock)
+
+    def _forget(self, dock):
+        self._remove_from_area(dock)
+        self._docks.pop(dock, None)
+
+    def _remove_from_area(self, dock):
+        area = self._docks.get(dock)
+        if area is not None and dock in self._areas.get(area, ()):
+            self._areas[area].remove(dock)
+
+
+def _make_repaint_filter(qt, callback):
+    """Creates an event filter that reports when a bar is resized or shown.
+
+    Args:
+        qt: The PyQt library.
+        callback: Function called with the type of Show and Resize events.
+    """
+    event_types = {qt.QEvent.Show, qt.QEvent.Resize}
+
+    class RepaintFilter(qt.QObject):
+        """Calls the callback on some events, without filtering them."""
+
+        def eventFilter(self, obj, event):  # pylint: disable=invalid-name
+            """Reports the event and lets it through."""
+            if event.type() in event_types:
+                callback(event.type())
+            return False
+
+    return RepaintFilter()
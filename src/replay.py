@@ -0,0 +1,294 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+
+Replays the review log of an Anki collection through the Life Drain rules.
+
+Tells how often, and when, the life bar of each deck would have reached zero
+with the given settings. It runs without Anki, so the collection file is only
+read, never written. It runs from the root of the source checkout, where the
+add-on is the src package. Close Anki first, or copy the collection:
+
+    python -m src.replay ~/.local/share/Anki2/User\\ 1/collection.anki2
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import pathlib
+import sqlite3
+import sys
+import types
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .deck_tree import SEPARATOR, DeckTree
+from .life_engine import seconds_to_ms
+
+FETCH_SIZE = 50000
+ANSWER_AGAIN = 1
+
+# Answers are grouped by deck and sorted by time. Rows with ease 0 are manual
+# reschedules, not answers.
+REVLOG_QUERY = '''
+    SELECT cards.did, revlog.id, revlog.ease, revlog.time
+    FROM revlog JOIN cards ON cards.id = revlog.cid
+    WHERE revlog.ease > 0
+    ORDER BY cards.did, revlog.id
+'''
+
+
+def open_collection(path):
+    """Opens an Anki collection read-only.
+
+    Args:
+        path: The path of the collection.anki2 file.
+
+    Returns:
+        An sqlite3 connection.
+    """
+    uri = pathlib.Path(path).resolve().as_uri() + '?mode=ro'
+    return sqlite3.connect(uri, uri=True)
+
+
+def read_decks(conn):
+    """Reads the decks of a collection.
+
+    Collections before Anki 2.1.28 keep the decks as JSON in the col table,
+    including their Life Drain settings. Newer collections have a decks
+    table whose settings are not readable without Anki, so their decks are
+    replayed with the default settings.
+
+    Args:
+        conn: A connection returned by open_collection.
+
+    Returns:
+        A list of decks, as returned by Anki's deck manager.
+    """
+    (decks_json,) = conn.execute('SELECT decks FROM col').fetchone()
+    if decks_json and decks_json != '{}':
+        return list(json.loads(decks_json).values())
+    return [
+        {'id': deck_id, 'name': name.replace('\x1f', SEPARATOR)}
+        for deck_id, name in conn.execute('SELECT id, name FROM decks')
+    ]
+
+
+def read_revlog(conn):
+    """Streams the answers of the review log, deck by deck.
+
+    Args:
+        conn: A connection returned by open_collection.
+
+    Yields:
+        A tuple with a deck ID and the list of its (revlog_id, ease, time)
+        rows, sorted by the revlog ID, which is the time of the answer in
+        epoch milliseconds. The time is how long the answer took, in
+        milliseconds.
+    """
+    cursor = conn.execute(REVLOG_QUERY)
+    rows = itertools.chain.from_iterable(
+        iter(lambda: cursor.fetchmany(FETCH_SIZE), []))
+    for deck_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+        yield deck_id, [row[1:] for row in group]
+
+
+def replay_deck(conf, answers):
+    """Replays the answers of a deck through the Life Drain rules.
+
+    The life starts full, and drains while each card is being answered. Then
+    the life is recovered, or damaged if the answer was 'Again' and the deck
+    has damage configured, as when the next question is shown.
+
+    Args:
+        conf: A dictionary with the maxLife, recover and damage of the deck.
+        answers: A list of (revlog_id, ease, time) rows.
+
+    Returns:
+        The indexes of the answers after which the life reached zero.
+    """
+    max_life = seconds_to_ms(conf['maxLife'])
+    recover = seconds_to_ms(conf['recover'])
+    damage = None
+    if conf['damage'] is not None:
+        damage = -seconds_to_ms(conf['damage'])
+
+    if numpy is None:
+        drains = [time for _, _, time in answers]
+        deltas = [damage if damage is not None and ease == ANSWER_AGAIN
+                  else recover for _, ease, _ in answers]
+        return walk_loop(max_life, max_life, drains, deltas)[0]
+
+    rows = numpy.array(answers, numpy.int64)
+    eases = rows[:, 1]
+    drains = rows[:, 2]
+    deltas = numpy.full(len(answers), recover, numpy.int64)
+    if damage is not None:
+        deltas[eases == ANSWER_AGAIN] = damage
+    reached_zero, _ = walk(max_life, max_life, drains, deltas)
+    return numpy.flatnonzero(reached_zero).tolist()
+
+
+def replay(conn, overrides=None, deck_name=None):
+    """Replays the review log of a collection.
+
+    Args:
+        conn: A connection returned by open_collection.
+        overrides: Optional. Settings that replace those of every deck.
+        deck_name: Optional. Only replays this deck.
+
+    Yields:
+        A dictionary for each deck with answers, with its name, the number
+        of answers and the epoch milliseconds of each game over.
+    """
+    decks = {deck['id']: deck for deck in read_decks(conn)}
+    fake_mw = types.SimpleNamespace(col=types.SimpleNamespace(
+        decks=types.SimpleNamespace(all=lambda: list(decks.values()))))
+    deck_tree = DeckTree(fake_mw)
+
+    for deck_id, answers in read_revlog(conn):
+        deck = decks.get(deck_id, {'id': deck_id, 'name': str(deck_id)})
+        if deck_name is not None and deck['name'] != deck_name:
+            continue
+        conf = dict(deck_tree.get_conf(deck))
+        conf.update(overrides or {})
+        game_overs = replay_deck(conf, answers)
+        yield {
+            'deck': deck['name'],
+            'answers': len(answers),
+            'gameOvers': [answers[index][0] for index in game_overs],
+        }
+
+
+def main(argv=None):
+    """Runs the replay from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m src.replay',
+        description='Replays the review log of an Anki collection through '
+                    'the Life Drain rules.')
+    parser.add_argument('collection', help='path of collection.anki2')
+    parser.add_argument('--deck', help='only replay this deck')
+    parser.add_argument('--max-life', type=float, dest='maxLife',
+                        help='maximum life of every deck, in seconds')
+    parser.add_argument('--recover', type=float,
+                        help='life recovered per answer, in seconds')
+    parser.add_argument('--damage', type=float,
+                        help='life lost per "Again" answer, in seconds')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='game overs listed per deck (default: 10)')
+    parser.add_argument('--json', action='store_true',
+                        help='print one JSON object per deck, with all of '
+                             'its game overs')
+    args = parser.parse_args(argv)
+
+    overrides = {
+        field: getattr(args, field)
+        for field in ('maxLife', 'recover', 'damage')
+        if getattr(args, field) is not None
+    }
+    conn = open_collection(args.collection)
+    try:
+        for result in replay(conn, overrides, args.deck):
+            if args.json:
+                print(json.dumps(result))
+            else:
+                _print_result(result, args.limit)
+    finally:
+        conn.close()
+    return 0
+
+
+def _print_result(result, limit):
+    """Prints the number of game overs of a deck, and the last ones."""
+    game_overs = result['gameOvers']
+    print('{}: {} answers, {} game overs'.format(
+        result['deck'], result['answers'], len(game_overs)))
+    if len(game_overs) > limit:
+        print('  ...')
+    for timestamp in game_overs[len(game_overs) - limit:]:
+        print('  {:%Y-%m-%d %H:%M:%S}'.format(
+            datetime.datetime.fromtimestamp(timestamp / 1000)))
+
+
+def walk_loop(max_life, life, drains, deltas):
+    """Replays answers through the Life Drain rules, in a plain loop.
+
+    Args:
+        max_life: The maximum life, in milliseconds.
+        life: The life before the first answer, in milliseconds.
+        drains: The time each answer took, in milliseconds.
+        deltas: The life recovered, or lost if negative, after each answer.
+
+    Returns:
+        A tuple with the indexes of the answers after which the life reached
+        zero, and the life after the last answer.
+    """
+    game_overs = []
+    for index, (drain, delta) in enumerate(zip(drains, deltas)):
+        drained = min(max(life - drain, 0), max_life)
+        new_life = min(max(drained + delta, 0), max_life)
+        if (life > 0 and drained == 0) or (drained > 0 and new_life == 0):
+            game_overs.append(index)
+        life = new_life
+    return game_overs, life
+
+
+def walk(max_life, life, drains, deltas):
+    """Replays answers through the Life Drain rules, vectorized with NumPy.
+
+    Each answer changes the life by a function x -> clip(x + shift, low,
+    high), and the composition of two such functions is a function of the
+    same form. So the life after every answer is found with a prefix scan
+    of the compositions, in log2(len(drains)) vectorized steps.
+
+    The answers are along the last axis. The other axes broadcast, so many
+    settings can be replayed at once, with max_life and life of shape
+    (settings, 1) and deltas of shape (settings, answers).
+
+    The arrays keep the integer type of deltas, which must be wide enough
+    for the sum of all shifts.
+
+    Args:
+        max_life: The maximum life, in milliseconds.
+        life: The life before the first answer, in milliseconds.
+        drains: The time each answer took, in milliseconds.
+        deltas: The life recovered, or lost if negative, after each answer.
+
+    Returns:
+        A tuple with a boolean array that is True for the answers after
+        which the life reached zero, and the life after each answer.
+    """
+    shift = deltas - drains
+    low = numpy.clip(deltas, 0, max_life)
+    high = numpy.clip(deltas + max_life, 0, max_life)
+    offset = 1
+    while offset < shift.shape[-1]:
+        later_shift = shift[..., offset:]
+        later_low = low[..., offset:]
+        later_high = high[..., offset:]
+        new_low = low[..., :-offset] + later_shift
+        numpy.maximum(new_low, later_low, out=new_low)
+        numpy.minimum(new_low, later_high, out=new_low)
+        new_high = high[..., :-offset] + later_shift
+        numpy.maximum(new_high, later_low, out=new_high)
+        numpy.minimum(new_high, later_high, out=new_high)
+        later_shift += shift[..., :-offset]
+        later_low[...] = new_low
+        later_high[...] = new_high
+        offset *= 2
+
+    lives = numpy.clip(life + shift, low, high)
+    first = numpy.broadcast_to(life, lives.shape[:-1] + (1,))
+    previous = numpy.concatenate((first, lives[..., :-1]), axis=-1)
+    drained = numpy.clip(previous - drains, 0, max_life)
+    reached_zero = ((previous > 0) & (drained == 0) |
+                    (drained > 0) & (lives == 0))
+    return reached_zero, lives
+
+
+if __name__ == '__main__':
+    sys.exit(main())
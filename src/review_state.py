@@ -0,0 +1,110 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+IDLE = 'idle'
+QUESTION = 'question'
+ANSWER = 'answer'
+
+ANSWER_AGAIN = 1
+
+
+class ReviewStateMachine:
+    """Follows the review of cards to decide when life must be recovered.
+
+    States:
+        idle: No answer is waiting to be rewarded.
+        question: A question is being shown.
+        answer: An answer was shown. Life is recovered, or damage is dealt,
+            when the next question or the overview is shown.
+
+    Besides the state, the machine keeps the current screen, the response of
+    the last answered card, and whether a special action (bury, suspend,
+    leech or note deletion) happened since the last question, which means
+    that the next undo reverts it instead of an answer.
+
+    Attributes:
+        state: One of IDLE, QUESTION or ANSWER.
+        screen: The name of the current screen of Anki.
+        response: The ease of the last answered card.
+        special_action: A flag set by a special action.
+    """
+
+    state = IDLE
+    screen = None
+    response = 0
+    special_action = False
+
+    # The next state for each (state, transition). Transitions not listed
+    # keep the current state.
+    _TRANSITIONS = {
+        (IDLE, 'showQuestion'): QUESTION,
+        (QUESTION, 'showQuestion'): QUESTION,
+        (ANSWER, 'showQuestion'): QUESTION,
+        (IDLE, 'showAnswer'): ANSWER,
+        (QUESTION, 'showAnswer'): ANSWER,
+        (ANSWER, 'screenChange'): IDLE,
+        (QUESTION, 'screenChange'): IDLE,
+        (ANSWER, 'reset'): IDLE,
+        (ANSWER, 'undo'): IDLE,
+    }
+
+    def change_screen(self, screen):
+        """Anki changed to another screen.
+
+        Args:
+            screen: The name of the new screen.
+
+        Returns:
+            True if an answer must be rewarded now.
+        """
+        reward = self.state == ANSWER and screen in ('overview', 'review')
+        self._transition('screenChange')
+        self.screen = screen
+        return reward
+
+    def show_question(self):
+        """A question is shown.
+
+        Returns:
+            None if there is no answer to be rewarded, or the response of the
+            answered card otherwise.
+        """
+        response = self.response if self.state == ANSWER else None
+        self._transition('showQuestion')
+        self.special_action = False
+        return response
+
+    def show_answer(self):
+        """An answer is shown."""
+        self._transition('showAnswer')
+
+    def answer_card(self, ease):
+        """A card was answered with an ease (1 is 'Again')."""
+        self.response = ease
+
+    def reset(self):
+        """The reviewer was reset, so the shown answer is not rewarded."""
+        self._transition('reset')
+
+    def mark_special_action(self):
+        """A card was buried, suspended, marked as leech or deleted."""
+        self.special_action = True
+
+    def undo(self):
+        """Something was undone.
+
+        Returns:
+            True if an answer was undone while reviewing, so the behavior
+            configured for undo must be applied.
+        """
+        undo_answer = self.screen == 'review' and not self.special_action
+        if undo_answer:
+            self._transition('undo')
+        self.special_action = False
+        return undo_answer
+
+    def _transition(self, transition):
+        self.state = self._TRANSITIONS.get((self.state, transition),
+                                           self.state)
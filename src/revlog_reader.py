@@ -0,0 +1,181 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+BATCH_SIZE = 50000
+
+# The upper bound and size of the next batch, read from the index of
+# revlog.id only.
+BATCH_END_QUERY = '''
+    SELECT MAX(id), COUNT(*) FROM (
+        SELECT id FROM revlog WHERE id > ? ORDER BY id LIMIT ?
+    )
+'''
+
+# Rows with ease 0 are manual reschedules, not answers.
+BATCH_QUERY = '''
+    SELECT cards.did, COUNT(*), SUM(revlog.ease = 1), SUM(revlog.time)
+    FROM revlog JOIN cards ON cards.id = revlog.cid
+    WHERE revlog.id > ? AND revlog.id <= ? AND revlog.ease > 0
+    GROUP BY cards.did
+'''
+
+# Reviews not synced yet have usn -1, and a sync gives the reviews it sends
+# or brings a usn at least the one the collection had before it. revlog.usn
+# is indexed, so these only count the rows a sync is about.
+UNSYNCED_QUERY = 'SELECT COUNT(*) FROM revlog WHERE usn = -1 AND id <= ?'
+SYNCED_QUERY = 'SELECT COUNT(*) FROM revlog WHERE usn >= ? AND id <= ?'
+
+
+class RevlogStats:  # pylint: disable=too-few-public-methods
+    """The aggregates of the answers of a deck.
+
+    Attributes:
+        answers: How many times cards of the deck were answered.
+        again: How many of those answers were 'Again'.
+        time: The total time spent answering, in milliseconds.
+    """
+
+    __slots__ = ('answers', 'again', 'time')
+
+    def __init__(self, answers=0, again=0, time=0):
+        self.answers = answers
+        self.again = again
+        self.time = time
+
+
+class RevlogReader:
+    """Keeps per-deck aggregates of the review log up to date.
+
+    The ID of the last revlog row that was read is persisted with the
+    aggregates in the StateStore. So on each update only the new rows are
+    read, with a range query on revlog.id, and summed into the aggregates.
+    The cost is proportional to the number of new reviews, not to the age of
+    the collection.
+
+    The rows are read in batches of BATCH_SIZE. When there are more, the next
+    batch is scheduled instead of read right away, so the first update of a
+    large collection doesn't freeze Anki.
+
+    The IDs of the revlog are the times of the reviews, so a sync may bring
+    reviews made on another device that are older than the last row read.
+    Before a sync, the unsynced rows up to the last row read are counted.
+    After it, the rows up to it that the sync sent or brought are counted.
+    If there are more, the sync brought older reviews, and the aggregates
+    are built again. Both counts use the index of revlog.usn, so they cost
+    as much as the sync, not as the whole review log.
+    """
+
+    _last_id = 0
+    _main_window = None
+    _profile = None
+    _schedule_update = None
+    _state_store = None
+    _stats = None
+    _sync_mark = None
+
+    def __init__(self, mw, state_store, schedule_update=None):
+        """Initializes the reader. Nothing is read until a profile loads.
+
+        Args:
+            mw: Anki's main window.
+            state_store: The StateStore where the aggregates are saved.
+            schedule_update: Optional. A function that schedules a call to
+                update, used when there are more rows to be read. Without
+                it, all rows are read at once.
+        """
+        self._main_window = mw
+        self._state_store = state_store
+        self._schedule_update = schedule_update
+        self._stats = {}
+
+    def load(self, profile):
+        """Restores the aggregates of a profile and reads the new answers.
+
+        Args:
+            profile: The name of Anki's profile.
+        """
+        self._profile = profile
+        last_id, stats = self._state_store.load_revlog(profile)
+        self._last_id = last_id
+        self._sync_mark = None
+        self._stats = {deck_id: RevlogStats(*aggregates)
+                       for deck_id, aggregates in stats.items()}
+        self.update()
+
+    def unload(self):
+        """Forgets the aggregates, when the profile is closed."""
+        self._profile = None
+        self._stats = {}
+        self._sync_mark = None
+
+    def sync_will_start(self):
+        """Counts the unsynced rows up to the last one read."""
+        if self._profile is None:
+            return
+        db = self._main_window.col.db
+        self._sync_mark = (db.scalar('SELECT usn FROM col'), self._last_id,
+                           db.scalar(UNSYNCED_QUERY, self._last_id))
+
+    def sync_finished(self):
+        """Reads the answers brought by a sync.
+
+        If the sync brought rows older than the last one read, the
+        aggregates are built again from the start.
+        """
+        if self._profile is None:
+            return
+        if self._sync_mark is not None:
+            usn, last_id, unsynced_rows = self._sync_mark
+            self._sync_mark = None
+            synced_rows = self._main_window.col.db.scalar(
+                SYNCED_QUERY, usn, last_id)
+            if synced_rows != unsynced_rows:
+                self._state_store.clear_revlog(self._profile)
+                self._last_id = 0
+                self._stats = {}
+        self.update()
+
+    def update(self):
+        """Reads the new answers into the aggregates."""
+        if self._profile is None:
+            return
+        while self._read_batch():
+            if self._schedule_update is not None:
+                self._schedule_update()
+                return
+
+    def get(self, deck_id):
+        """Gets the aggregates of a deck.
+
+        Args:
+            deck_id: The ID of the deck.
+
+        Returns:
+            A RevlogStats, with zeros if the deck has no answers.
+        """
+        stats = self._stats.get(deck_id)
+        return stats if stats is not None else RevlogStats()
+
+    def _read_batch(self):
+        """Reads a batch of rows, returning True if it was a full batch."""
+        db = self._main_window.col.db
+        batch_end, batch_rows = db.first(BATCH_END_QUERY, self._last_id,
+                                         BATCH_SIZE)
+        if not batch_rows:
+            return False
+
+        changed = {}
+        for deck_id, answers, again, time in db.all(
+                BATCH_QUERY, self._last_id, batch_end):
+            stats = self._stats.get(deck_id)
+            if stats is None:
+                stats = self._stats[deck_id] = RevlogStats()
+            stats.answers += answers
+            stats.again += again
+            stats.time += time
+            changed[deck_id] = (stats.answers, stats.again, stats.time)
+        self._last_id = batch_end
+        self._state_store.save_revlog(self._profile, self._last_id, changed)
+        return batch_rows == BATCH_SIZE
@@ -5,7 +5,8 @@ See the LICENCE file in the repository root for full licence text.
 
 from operator import itemgetter
 
-from .defaults import POSITION_OPTIONS, STYLE_OPTIONS, TEXT_FORMAT, BEHAVIORS
+from .defaults import (AWAY_POLICIES, BEHAVIORS, POSITION_OPTIONS,
+                       STYLE_OPTIONS, TEXT_FORMAT)
 
 
 class Form:
@@ -134,44 +135,74 @@ class Form:
     def color_select(self, cs_name, label_text, tooltip=None):
         """Creates a color select in the current row of the form.
 
+        The color dialog is only created when the select button is pressed.
+
         Args:
             cs_name: The name of the color select. Not visible by the user.
             label_text: A text that describes what is the color select for.
         """
+        color = [None]
+        color_dialogs = []
 
         def choose_color():
+            if not color_dialogs:
+                color_dialog = self._qt.QColorDialog(select_button)
+                color_dialog.setOption(
+                    self._qt.QColorDialog.DontUseNativeDialog)
+                color_dialogs.append(color_dialog)
+            color_dialog = color_dialogs[0]
+            color_dialog.setCurrentColor(self._qt.QColor(color[0]))
             if not color_dialog.exec_():
                 return
-            color = color_dialog.currentColor().name()
-            css = 'QLabel { background-color: %s; }' % color
+            set_value(color_dialog.currentColor().name())
+
+        def set_value(new_color):
+            color[0] = new_color
+            css = 'QLabel { background-color: %s; }' % new_color
             preview_label.setStyleSheet(css)
 
         label = self._qt.QLabel(label_text)
         select_button = self._qt.QPushButton('Select')
         preview_label = self._qt.QLabel('')
-        color_dialog = self._qt.QColorDialog(select_button)
-        color_dialog.setOption(self._qt.QColorDialog.DontUseNativeDialog)
         select_button.pressed.connect(choose_color)
         if tooltip is not None:
             label.setToolTip(tooltip)
             select_button.setToolTip(tooltip)
             preview_label.setToolTip(tooltip)
 
-        def set_value(color):
-            css = 'QLabel { background-color: %s; }' % color
-            color_dialog.setCurrentColor(self._qt.QColor(color))
-            preview_label.setStyleSheet(css)
-
-        color_dialog.get_value = lambda: color_dialog.currentColor().name()
-        color_dialog.set_value = set_value
+        select_button.get_value = lambda: color[0]
+        select_button.set_value = set_value
 
         setattr(self.widget, '%sPreview' % cs_name, preview_label)
-        setattr(self.widget, '%sDialog' % cs_name, color_dialog)
+        setattr(self.widget, '%sSelect' % cs_name, select_button)
         self._layout.addWidget(label, self._row, 0)
         self._layout.addWidget(select_button, self._row, 2)
         self._layout.addWidget(preview_label, self._row, 3)
         self._row += 1
 
+    def button(self, b_name, label_text, button_text, tooltip=None):
+        """Creates a push button in the current row of the form.
+
+        The label next to the button is meant to show the outcome of pressing
+        it, and can be changed later.
+
+        Args:
+            b_name: The name of the button. Not visible by the user.
+            label_text: The initial text of the label.
+            button_text: The text shown on the button.
+        """
+        label = self._qt.QLabel(label_text)
+        label.setWordWrap(True)
+        button = self._qt.QPushButton(button_text, self.widget)
+        if tooltip is not None:
+            button.setToolTip(tooltip)
+
+        setattr(self.widget, '%sLabel' % b_name, label)
+        setattr(self.widget, b_name, button)
+        self._layout.addWidget(label, self._row, 0, 1, 2)
+        self._layout.addWidget(button, self._row, 2, 1, 2)
+        self._row += 1
+
     def fill_space(self):
         """Creates a spacer that will vertically fill all the free space."""
         spacer = self._qt.QSpacerItem(1, 1, self._qt.QSizePolicy.Minimum,
@@ -185,11 +216,27 @@ class Form:
         self._row += 1
 
 
+_DIALOGS = {}
+
+
 def global_settings(aqt, config):
-    """Opens a dialog with the Global Settings."""
+    """Opens a dialog with the Global Settings.
+
+    The dialog is built the first time it is opened. On the next times, it is
+    only filled again with the current configuration.
+    """
+    dialog = _DIALOGS.get('global')
+    if dialog is None:
+        dialog = _DIALOGS['global'] = _global_settings_dialog(aqt)
+    dialog.config = config
+    dialog.load_data(config.get())
+    dialog.exec()
+
+
+def _global_settings_dialog(aqt):
 
     def save():
-        config.set({
+        dialog.config.set({
             'enable': basic_tab.enableAddon.get_value(),
             'stopOnAnswer': basic_tab.stopOnAnswer.get_value(),
             'globalSettingsShortcut': basic_tab.globalShortcut.get_value(),
@@ -199,24 +246,29 @@ def global_settings(aqt, config):
             'behavUndo': basic_tab.behavUndo.get_value(),
             'behavBury': basic_tab.behavBury.get_value(),
             'behavSuspend': basic_tab.behavSuspend.get_value(),
+            'profileHooks': basic_tab.profileHooks.get_value(),
             'barPosition': bar_style_tab.positionList.get_value(),
             'barHeight': bar_style_tab.heightInput.get_value(),
             'barBorderRadius': bar_style_tab.borderRadiusInput.get_value(),
             'barText': bar_style_tab.textList.get_value(),
             'barStyle': bar_style_tab.styleList.get_value(),
-            'barFgColor': bar_style_tab.fgColorDialog.get_value(),
-            'barTextColor': bar_style_tab.textColorDialog.get_value(),
+            'barFgColor': bar_style_tab.fgColorSelect.get_value(),
+            'barTextColor': bar_style_tab.textColorSelect.get_value(),
             'enableBgColor': bar_style_tab.enableBgColor.get_value(),
-            'barBgColor': bar_style_tab.bgColorDialog.get_value(),
+            'barBgColor': bar_style_tab.bgColorSelect.get_value(),
+            'barMaxFps': bar_style_tab.maxFpsInput.get_value(),
         })
         return dialog.accept()
 
-    conf = config.get()
+    def load_data(conf):
+        basic_tab.load_data(conf)
+        bar_style_tab.load_data(conf)
+
     dialog = aqt.QDialog()
     dialog.setWindowTitle('Life Drain Global Settings')
 
-    basic_tab = _global_basic_tab(aqt, conf)
-    bar_style_tab = _global_bar_style_tab(aqt, conf)
+    basic_tab = _global_basic_tab(aqt)
+    bar_style_tab = _global_bar_style_tab(aqt)
 
     tab_widget = aqt.QTabWidget()
     tab_widget.addTab(basic_tab, 'Basic')
@@ -231,11 +283,12 @@ def global_settings(aqt, config):
     outer_form.add_widget(tab_widget)
     outer_form.add_widget(button_box)
 
-    dialog.setMinimumSize(400, 310)
-    dialog.exec()
+    dialog.setMinimumSize(400, 340)
+    dialog.load_data = load_data
+    return dialog
 
 
-def _global_basic_tab(aqt, conf):
+def _global_basic_tab(aqt):
 
     def generate_form():
         tab = Form(aqt)
@@ -262,6 +315,10 @@ Invalid shortcuts, or already used shortcuts won't work.'''
                        'Shortcut for pausing.' + shortcut_tooltip)
         tab.text_field('recoverShortcut', 'Recover', None,
                        'Shortcut for recovering.' + shortcut_tooltip)
+        tab.label('<b>Troubleshooting</b>')
+        tab.check_box('profileHooks', 'Profile hook latency', '''Measure how \
+long Life Drain takes on each Anki hook.
+See the report at Tools > Life Drain Hook Profile.''')
         tab.fill_space()
         return tab.widget
 
@@ -275,13 +332,14 @@ Invalid shortcuts, or already used shortcuts won't work.'''
         widget.deckShortcut.set_value(conf['deckSettingsShortcut'])
         widget.pauseShortcut.set_value(conf['pauseShortcut'])
         widget.recoverShortcut.set_value(conf['recoverShortcut'])
+        widget.profileHooks.set_value(conf['profileHooks'])
 
     tab = generate_form()
-    load_data(tab, conf)
+    tab.load_data = lambda conf: load_data(tab, conf)
     return tab
 
 
-def _global_bar_style_tab(aqt, conf):
+def _global_bar_style_tab(aqt):
 
     def generate_form():
         tab = Form(aqt)
@@ -303,6 +361,9 @@ life bar (not all options may work on your platform).''')
 If checked, you can choose a background color on the next field.''')
         tab.color_select('bgColor', 'Background color',
                          "Color of the life bar's background.")
+        tab.spin_box('maxFpsInput', 'Max repaints per second', [1, 60], '''\
+How many times per second the life bar may be redrawn at most.
+Lower values use less CPU.''')
         tab.fill_space()
         return tab.widget
 
@@ -312,40 +373,101 @@ If checked, you can choose a background color on the next field.''')
         widget.borderRadiusInput.set_value(conf['barBorderRadius'])
         widget.textList.set_value(conf['barText'])
         widget.styleList.set_value(conf['barStyle'])
-        widget.fgColorDialog.set_value(conf['barFgColor'])
-        widget.textColorDialog.set_value(conf['barTextColor'])
+        widget.fgColorSelect.set_value(conf['barFgColor'])
+        widget.textColorSelect.set_value(conf['barTextColor'])
         widget.enableBgColor.set_value(conf['enableBgColor'])
-        widget.bgColorDialog.set_value(conf['barBgColor'])
+        widget.bgColorSelect.set_value(conf['barBgColor'])
+        widget.maxFpsInput.set_value(conf['barMaxFps'])
 
     tab = generate_form()
-    load_data(tab, conf)
+    tab.load_data = lambda conf: load_data(tab, conf)
     return tab
 
 
-def deck_settings(aqt, config, deck_manager):
-    """Opens a dialog with the Deck Settings."""
+def deck_settings(aqt, config, deck_manager, suggest=None, stats=None):
+    """Opens a dialog with the Deck Settings.
+
+    The dialog is built the first time it is opened. On the next times, it is
+    only filled again with the configuration of the current deck.
+
+    Args:
+        aqt: The PyQt library.
+        config: An instance of DeckConf.
+        deck_manager: An instance of DeckManager.
+        suggest: Optional. A function that suggests settings for a deck ID
+            in the background, then calls its second argument with the
+            suggestion of SettingsAdvisor.suggest.
+        stats: Optional. The RevlogStats of the deck, shown beside the
+            suggest button.
+    """
+    dialog = _DIALOGS.get('deck')
+    if dialog is None:
+        dialog = _DIALOGS['deck'] = _deck_settings_dialog(aqt)
+    dialog.config = config
+    dialog.deck_manager = deck_manager
+    dialog.suggest = suggest
+    dialog.stats = stats
+    conf = dict(config.get(), currentValue=deck_manager.get_current_life())
+    dialog.load_data(conf)
+    dialog.exec()
+
+
+def _deck_settings_dialog(aqt):
 
     def save():
-        conf = config.get()
+        conf = dict(dialog.config.get())
         enable_damage = damage_tab.enableDamageInput.isChecked()
         damage_value = damage_tab.damageInput.value()
         conf.update({
             'maxLife': basic_tab.maxLifeInput.value(),
             'recover': basic_tab.recoverInput.value(),
+            'awayPolicy': basic_tab.awayPolicyList.get_value(),
             'damage': damage_value if enable_damage else None,
             'currentValue': basic_tab.currentValueInput.value()
         })
 
-        deck_manager.set_deck_conf(conf)
-        config.set(conf)
+        dialog.deck_manager.set_deck_conf(conf)
+        dialog.config.set(conf)
         return dialog.accept()
 
-    conf = config.get()
+    def suggest():
+        deck_id = dialog.deck_id
+        basic_tab.suggestButton.setEnabled(False)
+        basic_tab.suggestButtonLabel.setText('Replaying the reviews...')
+        dialog.suggest(deck_id, lambda suggestion: show_suggestion(
+            deck_id, suggestion))
+
+    def show_suggestion(deck_id, suggestion):
+        basic_tab.suggestButton.setEnabled(True)
+        if deck_id != dialog.deck_id or not dialog.isVisible():
+            return
+        if suggestion is None:
+            basic_tab.suggestButtonLabel.setText('No reviews to learn from.')
+            return
+        conf = dict(suggestion,
+                    currentValue=basic_tab.currentValueInput.value(),
+                    awayPolicy=basic_tab.awayPolicyList.get_value())
+        basic_tab.load_data(conf)
+        damage_tab.load_data(conf)
+        rate = suggestion['rate']
+        basic_tab.suggestButtonLabel.setText(
+            'Game over every {:.0f} answers.'.format(1 / rate) if rate
+            else 'No game over in the recent reviews.')
+
+    def load_data(conf):
+        dialog.setWindowTitle('Life Drain options for {}'.format(conf['name']))
+        dialog.deck_id = conf['id']
+        basic_tab.load_data(conf)
+        damage_tab.load_data(conf)
+        basic_tab.suggestButton.setVisible(dialog.suggest is not None)
+        basic_tab.suggestButton.setEnabled(True)
+        basic_tab.suggestButtonLabel.setText(_stats_text(dialog.stats))
+
     dialog = aqt.QDialog()
-    dialog.setWindowTitle('Life Drain options for {}'.format(conf['name']))
 
-    basic_tab = _deck_basic_tab(aqt, conf, deck_manager.get_current_life())
-    damage_tab = _deck_damage_tab(aqt, conf)
+    basic_tab = _deck_basic_tab(aqt)
+    damage_tab = _deck_damage_tab(aqt)
+    basic_tab.suggestButton.clicked.connect(suggest)
 
     tab_widget = aqt.QTabWidget()
     tab_widget.addTab(basic_tab, 'Basic')
@@ -361,10 +483,20 @@ def deck_settings(aqt, config, deck_manager):
     outer_form.add_widget(button_box)
 
     dialog.setMinimumSize(300, 210)
-    dialog.exec()
+    dialog.load_data = load_data
+    return dialog
 
 
-def _deck_basic_tab(aqt, conf, life):
+def _stats_text(stats):
+    """Describes the answers of a deck, or returns '' if there are none."""
+    if stats is None or not stats.answers:
+        return ''
+    return '{} answers, {:.0%} again, {:.0f} s each.'.format(
+        stats.answers, stats.again / stats.answers,
+        stats.time / stats.answers / 1000)
+
+
+def _deck_basic_tab(aqt):
 
     def generate_form():
         tab = Form(aqt)
@@ -374,20 +506,26 @@ def _deck_basic_tab(aqt, conf, life):
     that is recovered after answering a card.''')
         tab.spin_box('currentValueInput', 'Current life', [0, 10000],
                      'Current life, in seconds.')
+        tab.combo_box('awayPolicyList', 'While away', AWAY_POLICIES, '''What \
+happens to the life while Anki is minimized or hidden during a review.''')
+        tab.button('suggestButton', '', 'Suggest', '''Suggests the maximum \
+life, recover and damage from your recent reviews of this deck, for about \
+one game over every 100 answers.''')
         tab.fill_space()
         return tab.widget
 
     def load_data(widget, conf):
         widget.maxLifeInput.set_value(conf['maxLife'])
         widget.recoverInput.set_value(conf['recover'])
-        widget.currentValueInput.set_value(life)
+        widget.currentValueInput.set_value(conf['currentValue'])
+        widget.awayPolicyList.set_value(conf['awayPolicy'])
 
     tab = generate_form()
-    load_data(tab, conf)
+    tab.load_data = lambda conf: load_data(tab, conf)
     return tab
 
 
-def _deck_damage_tab(aqt, conf):
+def _deck_damage_tab(aqt):
 
     def generate_form():
         tab = Form(aqt)
@@ -396,20 +534,20 @@ def _deck_damage_tab(aqt, conf):
         tab.spin_box('damageInput', 'Damage', [-1000, 1000],
                      "Damage value to be dealt when answering with 'Again'.")
         tab.fill_space()
+        tab.widget.enableDamageInput.stateChanged.connect(update_damageinput)
         return tab.widget
 
-    def load_data(widget, conf):
-        def update_damageinput():
-            damage_enabled = widget.enableDamageInput.isChecked()
-            widget.damageInput.setEnabled(damage_enabled)
-            widget.damageInput.setValue(5)
+    def update_damageinput():
+        damage_enabled = tab.enableDamageInput.isChecked()
+        tab.damageInput.setEnabled(damage_enabled)
+        tab.damageInput.setValue(5)
 
+    def load_data(widget, conf):
         damage = conf['damage']
         widget.enableDamageInput.set_value(damage is not None)
-        widget.enableDamageInput.stateChanged.connect(update_damageinput)
         widget.damageInput.set_value(damage if damage is not None else 5)
         widget.damageInput.setEnabled(conf['damage'] is not None)
 
     tab = generate_form()
-    load_data(tab, conf)
+    tab.load_data = lambda conf: load_data(tab, conf)
     return tab
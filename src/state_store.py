@@ -0,0 +1,185 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import os
+import sqlite3
+import time
+
+SCHEMA_VERSION = 2
+
+
+class StateStore:
+    """Persists the current life of each deck between Anki sessions.
+
+    It also keeps the aggregates of the review log of each profile, with the
+    ID of the last revlog row folded into them, for the RevlogReader.
+
+    The state is kept in a small SQLite database, separated from Anki's
+    collection so that saving it never marks the collection as modified.
+    Writes are only kept in memory until they are flushed in a single
+    transaction, so they can be done on every change of life.
+
+    The life is stored in integer milliseconds. The version of the schema is
+    kept in PRAGMA user_version, and older databases are migrated when they
+    are opened.
+    """
+
+    _conn = None
+    _path = None
+    _pending = None
+    _schedule_flush = None
+
+    def __init__(self, path, schedule_flush=None):
+        """Initializes the store. The database is only opened when needed.
+
+        Args:
+            path: The path of the SQLite database file.
+            schedule_flush: Optional. A function called when there are new
+                pending writes, so that a flush can be scheduled.
+        """
+        self._path = path
+        self._pending = {}
+        self._schedule_flush = schedule_flush
+
+    def load(self, profile):
+        """Reads the saved life of all decks of a profile.
+
+        Args:
+            profile: The name of Anki's profile.
+
+        Returns:
+            A dictionary with the current life of each deck ID.
+        """
+        rows = self._connection().execute(
+            'SELECT deck_id, life FROM deck_state WHERE profile = ?',
+            (profile,))
+        lives = dict(rows)
+        for (pending_profile, deck_id), life in self._pending.items():
+            if pending_profile == profile:
+                lives[deck_id] = life
+        return lives
+
+    def save(self, profile, deck_id, life):
+        """Saves the current life of a deck on the next flush.
+
+        Args:
+            profile: The name of Anki's profile.
+            deck_id: The ID of the deck.
+            life: The current life of the deck, in milliseconds.
+        """
+        if not self._pending and self._schedule_flush is not None:
+            self._schedule_flush()
+        self._pending[(profile, deck_id)] = life
+
+    def load_revlog(self, profile):
+        """Reads the review log aggregates of a profile.
+
+        Args:
+            profile: The name of Anki's profile.
+
+        Returns:
+            A tuple with the ID of the last revlog row that was folded into
+            the aggregates, and a dictionary with the (answers, again, time)
+            of each deck ID.
+        """
+        conn = self._connection()
+        mark = conn.execute(
+            'SELECT last_id FROM revlog_mark WHERE profile = ?',
+            (profile,)).fetchone()
+        rows = conn.execute(
+            'SELECT deck_id, answers, again, time FROM revlog_stats '
+            'WHERE profile = ?', (profile,))
+        stats = {deck_id: tuple(aggregates) for deck_id, *aggregates in rows}
+        return (mark[0] if mark else 0), stats
+
+    def save_revlog(self, profile, last_id, stats):
+        """Saves review log aggregates right away, in a single transaction.
+
+        Args:
+            profile: The name of Anki's profile.
+            last_id: The ID of the last revlog row folded into the stats.
+            stats: A dictionary with the (answers, again, time) of the deck
+                IDs whose aggregates changed.
+        """
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO revlog_mark (profile, last_id) '
+                'VALUES (?, ?)', (profile, last_id))
+            conn.executemany(
+                'INSERT OR REPLACE INTO revlog_stats '
+                '(profile, deck_id, answers, again, time) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(profile, deck_id) + tuple(aggregates)
+                 for deck_id, aggregates in stats.items()])
+
+    def clear_revlog(self, profile):
+        """Deletes the review log aggregates of a profile."""
+        with self._connection() as conn:
+            conn.execute('DELETE FROM revlog_mark WHERE profile = ?',
+                         (profile,))
+            conn.execute('DELETE FROM revlog_stats WHERE profile = ?',
+                         (profile,))
+
+    def flush(self):
+        """Writes all pending changes in a single transaction."""
+        if not self._pending:
+            return
+        modified = int(time.time())
+        rows = [(profile, deck_id, life, modified)
+                for (profile, deck_id), life in self._pending.items()]
+        self._pending = {}
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO deck_state '
+                '(profile, deck_id, life, modified) VALUES (?, ?, ?, ?)',
+                rows)
+
+    def close(self):
+        """Flushes the pending changes and closes the database."""
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connection(self):
+        """Opens the database, creating it if it doesn't exist yet."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._conn = sqlite3.connect(self._path)
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+            self._migrate()
+        return self._conn
+
+    def _migrate(self):
+        """Creates the tables, or updates them to the current schema."""
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+        with self._conn:
+            self._conn.execute('BEGIN')
+            if version < 1:
+                self._conn.execute(
+                    'CREATE TABLE deck_state ('
+                    'profile TEXT NOT NULL, '
+                    'deck_id INTEGER NOT NULL, '
+                    'life INTEGER NOT NULL, '
+                    'modified INTEGER NOT NULL, '
+                    'PRIMARY KEY (profile, deck_id))')
+            if version < 2:
+                self._conn.execute(
+                    'CREATE TABLE revlog_mark ('
+                    'profile TEXT PRIMARY KEY, '
+                    'last_id INTEGER NOT NULL)')
+                self._conn.execute(
+                    'CREATE TABLE revlog_stats ('
+                    'profile TEXT NOT NULL, '
+                    'deck_id INTEGER NOT NULL, '
+                    'answers INTEGER NOT NULL, '
+                    'again INTEGER NOT NULL, '
+                    'time INTEGER NOT NULL, '
+                    'PRIMARY KEY (profile, deck_id))')
+            self._conn.execute(
+                'PRAGMA user_version = {}'.format(SCHEMA_VERSION))
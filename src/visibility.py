@@ -0,0 +1,66 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from .window_events import WindowEvents
+
+
+class VisibilityWatcher:
+    """Tells when Anki's main window stops or starts being visible.
+
+    The main window is considered not visible while it is minimized or
+    hidden, while the application is hidden or suspended by the system, and
+    while a modal dialog covers it. The window state is followed through the
+    events of the window and the application signals, so no polling is
+    needed.
+    """
+
+    _app = None
+    _callback = None
+    _hidden_states = None
+    _mw = None
+    _visible = True
+
+    def __init__(self, mw, qt, callback, window_events=None):
+        """Starts watching the main window.
+
+        Args:
+            mw: Anki's main window.
+            qt: The PyQt library.
+            callback: Function called with a flag indicating if the main
+                window is visible, whenever that changes.
+            window_events: Optional. The WindowEvents of the main window.
+        """
+        self._mw = mw
+        self._callback = callback
+        self._app = qt.QApplication.instance()
+        self._hidden_states = {qt.Qt.ApplicationHidden,
+                               qt.Qt.ApplicationSuspended}
+
+        qt.qconnect(self._app.applicationStateChanged,
+                    lambda *args: self.update())
+        qt.qconnect(self._app.focusWindowChanged,
+                    lambda *args: self.update())
+        if window_events is None:
+            window_events = WindowEvents(mw, qt)
+        for event_type in (qt.QEvent.Show, qt.QEvent.Hide,
+                           qt.QEvent.WindowStateChange):
+            window_events.subscribe(event_type, lambda event: self.update())
+        self._visible = self._check()
+
+    def is_visible(self):
+        """Checks if the main window was visible when last checked."""
+        return self._visible
+
+    def update(self):
+        """Checks the visibility, calling the callback if it changed."""
+        visible = self._check()
+        if visible != self._visible:
+            self._visible = visible
+            self._callback(visible)
+
+    def _check(self):
+        return (self._mw.isVisible() and not self._mw.isMinimized() and
+                self._app.applicationState() not in self._hidden_states and
+                self._app.activeModalWidget() is None)
@@ -0,0 +1,60 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+
+class WindowEvents:
+    """Tells the parts of Life Drain about the events of Anki's main window.
+
+    A single event filter is installed on the window and shared by the whole
+    add-on, since a Python event filter runs for every event the window
+    receives. It only looks up the listeners of the type of each event, and
+    always lets the event through.
+    """
+
+    _event_filter = None
+    _listeners = None
+
+    def __init__(self, mw, qt):
+        """Installs the event filter on the main window.
+
+        Args:
+            mw: Anki's main window, which also keeps the filter alive.
+            qt: The PyQt library.
+        """
+        self._listeners = {}
+        self._event_filter = _make_dispatch_filter(qt, self._listeners, mw)
+        mw.installEventFilter(self._event_filter)
+
+    def subscribe(self, event_type, callback):
+        """Registers a function to be called on events of a type.
+
+        Args:
+            event_type: A QEvent.Type, e.g. QEvent.Show.
+            callback: Function called with the event.
+        """
+        self._listeners.setdefault(event_type, []).append(callback)
+
+
+def _make_dispatch_filter(qt, listeners, parent):
+    """Creates an event filter that calls the listeners of each event type.
+
+    Args:
+        qt: The PyQt library.
+        listeners: A dictionary with the list of callbacks of each event type.
+        parent: The Qt parent of the filter, which keeps it alive.
+    """
+
+    class DispatchFilter(qt.QObject):
+        """Calls the listeners of an event, without filtering it."""
+
+        def eventFilter(self, obj, event):  # pylint: disable=invalid-name
+            """Reports the event and lets it through."""
+            callbacks = listeners.get(event.type())
+            if callbacks is not None:
+                for callback in callbacks:
+                    callback(event)
+            return False
+
+    return DispatchFilter(parent)
@@ -0,0 +1,105 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+from tests.test_replay import make_collection
+
+
+class FakeDB:
+    """Gives an sqlite3 connection the interface of Anki's database."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = 0
+
+    def all(self, sql, *args):
+        self.queries += 1
+        return self.conn.execute(sql, args).fetchall()
+
+    def first(self, sql, *args):
+        self.queries += 1
+        return self.conn.execute(sql, args).fetchone()
+
+    def scalar(self, sql, *args):
+        row = self.first(sql, *args)
+        return row[0] if row else None
+
+
+class TestSettingsAdvisor(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from lifedrain import advisor, replay
+        self.advisor_module = advisor
+        self.replay = replay
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'collection.anki2')
+
+        rng = random.Random(0)
+        self.answers = [(1, 1000 + index, rng.choice([1, 3, 3, 4]),
+                         rng.randint(1000, 40000)) for index in range(300)]
+        make_collection(self.path, [], self.answers)
+        self.conn = sqlite3.connect(self.path)
+        self.addCleanup(self.conn.close)
+        self.db = FakeDB(self.conn)
+        main_window = mock.MagicMock()
+        main_window.col.db = self.db
+        self.advisor = advisor.SettingsAdvisor(main_window)
+
+    def brute_force(self, answers, target_rate):
+        rows = [answer[1:] for answer in answers]
+        best = None
+        for max_life, recover, damage in self.advisor._settings:
+            conf = {'maxLife': max_life, 'recover': recover,
+                    'damage': damage}
+            rate = len(self.replay.replay_deck(conf, rows)) / len(rows)
+            if best is None or abs(rate - target_rate) < best[0]:
+                best = (abs(rate - target_rate), dict(conf, rate=rate))
+        return best[1]
+
+    def test_suggest(self):
+        for target_rate in [0, 0.01, 0.05, 0.2]:
+            self.assertEqual(self.advisor.suggest(1, target_rate),
+                             self.brute_force(self.answers, target_rate))
+
+    def test_suggest_without_numpy(self):
+        expected = self.advisor.suggest(1, 0.05)
+        with mock.patch.object(self.advisor_module, 'numpy', None):
+            advisor = self.advisor_module.SettingsAdvisor(mock.MagicMock())
+            advisor._main_window.col.db = self.db
+            self.assertEqual(advisor.suggest(1, 0.05), expected)
+
+    def test_new_reviews_are_replayed_incrementally(self):
+        self.advisor.suggest(1, 0.05)
+        new_answers = [(1, 2000 + index, 1, 30000) for index in range(50)]
+        for card_id, (_, revlog_id, ease, time) in enumerate(new_answers):
+            self.conn.execute('INSERT INTO cards VALUES (?, 1)',
+                              (1000 + card_id,))
+            self.conn.execute('INSERT INTO revlog (id, cid, ease, time) '
+                              'VALUES (?, ?, ?, ?)',
+                              (revlog_id, 1000 + card_id, ease, time))
+
+        with mock.patch.object(self.advisor, '_replay',
+                               wraps=self.advisor._replay) as replay:
+            suggestion = self.advisor.suggest(1, 0.05)
+        self.assertEqual(len(replay.call_args[0][1]), len(new_answers))
+        self.assertEqual(suggestion,
+                         self.brute_force(self.answers + new_answers, 0.05))
+
+    def test_suggestion_is_cached(self):
+        suggestion = self.advisor.suggest(1)
+        with mock.patch.object(self.advisor, '_replay') as replay:
+            self.assertEqual(self.advisor.suggest(1), suggestion)
+        replay.assert_not_called()
+
+    def test_deck_without_reviews(self):
+        self.assertIsNone(self.advisor.suggest(2))
@@ -134,6 +134,20 @@ class TestGlobalConf(LifedrainTestCase):
         self.assertEqual(main_window.col.conf, expected_conf)
         main_window.col.setMod.assert_called_once_with()
 
+    def test_get_cached(self):
+        main_window = mock.MagicMock()
+        main_window.col.conf = {'lifedrain': {'barHeight': 20}}
+
+        global_conf = self.lifedrain.config.GlobalConf(main_window)
+        conf = global_conf.get()
+        main_window.col.conf = {'lifedrain': {'barHeight': 30}}
+
+        self.assertIs(global_conf.get(), conf)
+        self.assertEqual(global_conf.get()['barHeight'], 20)
+
+        global_conf.invalidate()
+        self.assertEqual(global_conf.get()['barHeight'], 30)
+
 
 class TestDeckConf(LifedrainTestCase):
 
@@ -152,7 +166,8 @@ class TestDeckConf(LifedrainTestCase):
             'name': 'My Deck',
             'maxLife': DEFAULTS['maxLife'],
             'recover': DEFAULTS['recover'],
-            'damage': DEFAULTS['damage']}
+            'damage': DEFAULTS['damage'],
+            'awayPolicy': DEFAULTS['awayPolicy']}
         self.assertEqual(conf, expected_conf)
 
     def test_get_custom(self):
@@ -173,7 +188,8 @@ class TestDeckConf(LifedrainTestCase):
             'name': 'My Deck',
             'maxLife': 200,
             'recover': 15,
-            'damage': 10}
+            'damage': 10,
+            'awayPolicy': self.lifedrain.defaults.DEFAULTS['awayPolicy']}
         self.assertEqual(conf, expected_conf)
 
     def test_set_first_time(self):
@@ -217,3 +233,29 @@ class TestDeckConf(LifedrainTestCase):
             'name': 'My Deck',
             'lifedrain': conf}
         main_window.col.decks.save.assert_called_with(expected_conf)
+
+    def test_get_cached(self):
+        main_window = mock.MagicMock()
+        main_window.col.decks.current.return_value = {
+            'id': 123,
+            'name': 'My Deck'}
+
+        deck_conf = self.lifedrain.config.DeckConf(main_window)
+        deck_conf.get()
+        deck_conf.get()
+        main_window.col.decks.current.assert_called_once_with()
+
+    def test_set_invalidates(self):
+        main_window = mock.MagicMock()
+        main_window.col.decks.current.return_value = {
+            'id': 123,
+            'name': 'My Deck'}
+
+        deck_conf = self.lifedrain.config.DeckConf(main_window)
+        deck_conf.get()
+        deck_conf.set({
+            'maxLife': 200,
+            'recover': 15,
+            'damage': 10})
+
+        self.assertEqual(deck_conf.get()['maxLife'], 200)
@@ -0,0 +1,90 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import functools
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestDeckManager(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.deck_manager_module = self.lifedrain.deck_manager
+        self.deck_id = 1
+        self.deck_conf = mock.Mock()
+        self.deck_conf.get.side_effect = lambda: {
+            'id': self.deck_id, 'maxLife': 100, 'recover': 5, 'damage': None}
+        self.deck_conf.get_deck.side_effect = lambda deck_id: {
+            'id': deck_id, 'maxLife': 100, 'recover': 5, 'damage': None}
+        self.state_store = mock.Mock()
+        self.state_store.load.return_value = {1: 40000, 2: 60000}
+
+    def make_deck_manager(self, state_store=None, capacity=256):
+        engine = functools.partial(self.lifedrain.life_engine.LifeEngine,
+                                   capacity=capacity)
+        with mock.patch.object(self.deck_manager_module, 'LifeEngine',
+                               engine):
+            deck_manager = self.deck_manager_module.DeckManager(
+                mock.MagicMock(), mock.MagicMock(), mock.Mock(),
+                self.deck_conf, state_store)
+        deck_manager.load_state('User 1')
+        return deck_manager
+
+    def show_deck(self, deck_manager, deck_id):
+        self.deck_id = deck_id
+        return deck_manager.get_current_life()
+
+    def test_saved_lives_read_once(self):
+        deck_manager = self.make_deck_manager(self.state_store)
+        self.assertEqual(self.show_deck(deck_manager, 1), 40)
+        self.assertEqual(self.show_deck(deck_manager, 2), 60)
+        self.assertEqual(self.show_deck(deck_manager, 3), 100)
+        self.state_store.load.assert_called_once_with('User 1')
+
+    def test_evicted_life_restored(self):
+        deck_manager = self.make_deck_manager(self.state_store, capacity=1)
+        self.show_deck(deck_manager, 1)
+        deck_manager.engine.change_life(1, -10000)
+        self.show_deck(deck_manager, 2)
+        self.state_store.save.assert_called_with('User 1', 1, 30000)
+        self.assertEqual(self.show_deck(deck_manager, 1), 30)
+        self.state_store.load.assert_called_once_with('User 1')
+
+    def test_saved_lives_capacity_without_store(self):
+        deck_manager = self.make_deck_manager(capacity=1)
+        with mock.patch.object(self.deck_manager_module,
+                               'SAVED_LIVES_CAPACITY', 2):
+            for deck_id in (1, 2, 3, 4):
+                self.show_deck(deck_manager, deck_id)
+                deck_manager.engine.change_life(deck_id, -deck_id * 1000)
+            self.show_deck(deck_manager, 5)
+            self.assertEqual(self.show_deck(deck_manager, 1), 100)
+            self.assertEqual(self.show_deck(deck_manager, 4), 96)
+
+    def test_change_lives_of_evicted_deck(self):
+        recover = self.lifedrain.event_journal.EVENT_RECOVER
+        deck_manager = self.make_deck_manager(self.state_store, capacity=2)
+        for deck_id in (1, 4, 3):
+            self.show_deck(deck_manager, deck_id)
+        deck_manager.change_lives([(1, recover, -5000), (2, recover, 1000)])
+        self.assertEqual(deck_manager.engine.get_life(2), 61000)
+        self.assertEqual(self.show_deck(deck_manager, 1), 35)
+
+    def test_current_deck_not_evicted(self):
+        recover = self.lifedrain.event_journal.EVENT_RECOVER
+        deck_manager = self.make_deck_manager(capacity=2)
+        self.show_deck(deck_manager, 1)
+        deck_manager.change_lives([(deck_id, recover, -1000)
+                                   for deck_id in range(2, 10)])
+        self.assertTrue(deck_manager.engine.has_deck(1))
+        deck_manager.recover_life(value=-10)
+        self.assertEqual(deck_manager.get_current_life(), 90)
+
+    def test_recover_life_without_deck(self):
+        deck_manager = self.make_deck_manager()
+        deck_manager.recover_life()
+        self.assertFalse(deck_manager.engine.has_deck(None))
@@ -0,0 +1,155 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestDeckTree(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.decks = [
+            {'id': 1, 'name': 'Languages',
+             'lifedrain': {'maxLife': 300, 'recover': 10, 'damage': None,
+                           'awayPolicy': 0}},
+            {'id': 2, 'name': 'Languages::Japanese'},
+            {'id': 3, 'name': 'Languages::Japanese::Kanji',
+             'lifedrain': {'maxLife': 60, 'recover': 2, 'damage': 5,
+                           'awayPolicy': 0}},
+            {'id': 4, 'name': 'Languages::Japanese::Kanji::N5'},
+            {'id': 5, 'name': 'Math'},
+        ]
+        self.main_window = mock.MagicMock()
+        self.main_window.col.decks.all.return_value = self.decks
+        self.deck_tree = self.lifedrain.deck_tree.DeckTree(self.main_window)
+
+    def test_inherit_from_parent(self):
+        conf = self.deck_tree.get_conf(self.decks[1])
+        self.assertEqual(conf, {'maxLife': 300, 'recover': 10, 'damage': None,
+                                'awayPolicy': 0})
+
+    def test_inherit_from_nearest_ancestor(self):
+        conf = self.deck_tree.get_conf(self.decks[3])
+        self.assertEqual(conf, {'maxLife': 60, 'recover': 2, 'damage': 5,
+                                'awayPolicy': 0})
+
+    def test_default(self):
+        DEFAULTS = self.lifedrain.defaults.DEFAULTS
+        conf = self.deck_tree.get_conf(self.decks[4])
+        self.assertEqual(conf['maxLife'], DEFAULTS['maxLife'])
+
+    def test_index_built_once(self):
+        for deck in self.decks:
+            self.deck_tree.get_conf(deck)
+        self.deck_tree.get_conf(self.decks[3])
+        self.main_window.col.decks.all.assert_called_once_with()
+
+    def test_update_deck(self):
+        self.deck_tree.get_conf(self.decks[1])
+        self.decks[0]['lifedrain'] = {'maxLife': 100}
+        self.deck_tree.update_deck(self.decks[0])
+
+        conf = self.deck_tree.get_conf(self.decks[1])
+        self.assertEqual(conf['maxLife'], 100)
+        self.main_window.col.decks.all.assert_called_once_with()
+
+    def test_invalidate(self):
+        self.deck_tree.get_conf(self.decks[1])
+        self.decks[1]['name'] = 'Math::Japanese'
+        self.deck_tree.invalidate()
+
+        DEFAULTS = self.lifedrain.defaults.DEFAULTS
+        conf = self.deck_tree.get_conf(self.decks[1])
+        self.assertEqual(conf['maxLife'], DEFAULTS['maxLife'])
+
+    def test_knows(self):
+        self.assertTrue(self.deck_tree.knows('Physics'))
+        self.deck_tree.get_conf(self.decks[0])
+        self.assertTrue(self.deck_tree.knows('Languages::Japanese'))
+        self.assertFalse(self.deck_tree.knows('Physics'))
+
+    def test_knows_ignores_case(self):
+        self.deck_tree.get_conf(self.decks[0])
+        self.assertTrue(self.deck_tree.knows('languages::JAPANESE'))
+
+    def test_add(self):
+        self.deck_tree.get_conf(self.decks[0])
+        self.deck_tree.add('Languages::French::Verbs')
+        self.assertTrue(self.deck_tree.knows('Languages::French'))
+        conf = self.deck_tree.get_conf({'id': 7,
+                                        'name': 'Languages::French::Verbs'})
+        self.assertEqual(conf['maxLife'], 300)
+        self.main_window.col.decks.all.assert_called_once_with()
+
+    def test_rename_moves_subdecks(self):
+        self.deck_tree.get_conf(self.decks[3])
+        self.deck_tree.rename('Languages::Japanese', 'Math::Japanese')
+        self.assertFalse(self.deck_tree.knows('Languages::Japanese::Kanji'))
+        self.assertTrue(self.deck_tree.knows('Math::Japanese::Kanji::N5'))
+
+        DEFAULTS = self.lifedrain.defaults.DEFAULTS
+        conf = self.deck_tree.get_conf({'id': 2, 'name': 'Math::Japanese'})
+        self.assertEqual(conf['maxLife'], DEFAULTS['maxLife'])
+        conf = self.deck_tree.get_conf({'id': 4,
+                                        'name': 'Math::Japanese::Kanji::N5'})
+        self.assertEqual(conf['maxLife'], 60)
+        self.main_window.col.decks.all.assert_called_once_with()
+
+    def test_remove_subdecks(self):
+        self.deck_tree.get_conf(self.decks[3])
+        self.deck_tree.remove('Languages::Japanese')
+        self.assertTrue(self.deck_tree.knows('Languages'))
+        self.assertFalse(self.deck_tree.knows('Languages::Japanese'))
+        self.assertFalse(self.deck_tree.knows('Languages::Japanese::Kanji'))
+        self.main_window.col.decks.all.assert_called_once_with()
+
+
+class TestDeckConf(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.decks = [{'id': 1, 'name': 'Math'}]
+        self.main_window = mock.MagicMock()
+        decks = self.main_window.col.decks
+        decks.all.side_effect = lambda: self.decks
+        decks.current.side_effect = lambda: self.decks[-1]
+        decks.get.side_effect = lambda deck_id, default=True: next(
+            (deck for deck in self.decks if deck['id'] == deck_id), None)
+        self.deck_conf = self.lifedrain.config.DeckConf(self.main_window)
+        self.deck_conf.get()
+
+    def test_looked_up_existing_deck(self):
+        self.deck_conf.deck_looked_up('math', 1)
+        self.deck_conf.get()
+        self.main_window.col.decks.get.assert_not_called()
+
+    def test_looked_up_new_deck(self):
+        self.decks.append({'id': 2, 'name': 'Math::Algebra'})
+        self.deck_conf.deck_looked_up('Math::Algebra', 2)
+        self.assertEqual(self.deck_conf.get()['name'], 'Math::Algebra')
+        self.main_window.col.decks.all.assert_called_once_with()
+
+    def test_renamed_deck(self):
+        self.decks[0]['lifedrain'] = {'maxLife': 30}
+        self.decks.append({'id': 2, 'name': 'Math::Algebra'})
+        self.deck_conf.invalidate_tree()
+        self.deck_conf.get()
+        self.decks[0]['name'] = 'Science'
+        self.decks[1]['name'] = 'Science::Algebra'
+        self.deck_conf.deck_renamed('Math', 1)
+        conf = self.deck_conf.get()
+        self.assertEqual(conf['name'], 'Science::Algebra')
+        self.assertEqual(conf['maxLife'], 30)
+        self.assertEqual(self.main_window.col.decks.all.call_count, 2)
+
+    def test_deleted_deck(self):
+        self.decks.append({'id': 2, 'name': 'Math::Algebra'})
+        self.deck_conf.get()
+        del self.decks[1]
+        self.deck_conf.deck_renamed('Math::Algebra', 2)
+        self.assertEqual(self.deck_conf.get()['name'], 'Math')
+        self.main_window.col.decks.all.assert_called_once_with()
@@ -0,0 +1,33 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestEventBus(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.event_bus = self.lifedrain.event_bus
+        self.bus = self.event_bus.EventBus()
+        self.calls = []
+
+    def test_emitter_calls_handlers_in_order(self):
+        emit = self.bus.emitter(self.event_bus.SCREEN_CHANGE)
+        self.bus.subscribe(self.event_bus.SCREEN_CHANGE,
+                           lambda state: self.calls.append(('a', state)))
+        self.bus.subscribe(self.event_bus.SCREEN_CHANGE,
+                           lambda state: self.calls.append(('b', state)))
+        emit('review')
+        self.assertEqual(self.calls, [('a', 'review'), ('b', 'review')])
+
+    def test_events_are_independent(self):
+        self.bus.subscribe(self.event_bus.BURY,
+                           lambda: self.calls.append('bury'))
+        self.bus.emit(self.event_bus.SUSPEND)
+        self.bus.emitter(self.event_bus.UNDO)()
+        self.assertEqual(self.calls, [])
+        self.bus.emit(self.event_bus.BURY)
+        self.assertEqual(self.calls, ['bury'])
@@ -0,0 +1,53 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import os
+import tempfile
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestEventJournal(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'journal.bin')
+        self.journal_module = self.lifedrain.event_journal
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_flush_and_read(self):
+        journal = self.journal_module.EventJournal(self.path, clock=lambda: 1)
+        journal.record(self.journal_module.EVENT_DRAIN, 123, -500)
+        journal.record(self.journal_module.EVENT_GAME_OVER, 123)
+        journal.flush()
+
+        events = list(self.journal_module.read_journal(self.path))
+        self.assertEqual(events, [
+            (1, 123, 'drain', -0.5),
+            (1, 123, 'gameOver', 0)])
+        self.assertEqual(len(journal), 0)
+
+    def test_ring_buffer_drops_oldest(self):
+        journal = self.journal_module.EventJournal(self.path, capacity=4)
+        for delta in range(6):
+            journal.record(self.journal_module.EVENT_RECOVER, 123,
+                           delta * 1000)
+        journal.flush()
+
+        deltas = [event[3] for event in
+                  self.journal_module.read_journal(self.path)]
+        self.assertEqual(deltas, [2, 3, 4, 5])
+        self.assertEqual(journal.dropped, 2)
+
+    def test_rotate(self):
+        journal = self.journal_module.EventJournal(self.path, max_bytes=1)
+        journal.record(self.journal_module.EVENT_RECOVER, 123, 5)
+        journal.flush()
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(os.path.exists(self.path + '.1'))
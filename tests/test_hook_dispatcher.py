@@ -0,0 +1,130 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class FakeTimer:
+
+    def __init__(self, func):
+        self.func = func
+        self.started = 1
+
+    def start(self, delay):
+        self.started += 1
+
+    def fire(self):
+        self.started -= 1
+        self.func()
+
+
+class TestHookDispatcher(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hook_dispatcher = self.lifedrain.hook_dispatcher
+        self.listeners = {}
+        patcher = mock.patch.object(self.hook_dispatcher.hooks, '_hooks',
+                                    self.listeners, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = 0
+        self.timer = None
+        self.dispatcher = self.hook_dispatcher.HookDispatcher(
+            self.make_timer, clock=lambda: self.now)
+        self.calls = []
+
+    def make_timer(self, delay, func, repeat):
+        self.timer = FakeTimer(func)
+        return self.timer
+
+    def listen(self, hook, duration=0):
+        def listener(*args):
+            self.calls.append((hook,) + args)
+            self.now += duration
+        self.listeners.setdefault(hook, []).append(listener)
+        return listener
+
+    def test_deferred_until_timer(self):
+        self.listen('LifeDrain.gameOver')
+        self.dispatcher.emit('LifeDrain.gameOver')
+        self.assertEqual(self.calls, [])
+        self.timer.fire()
+        self.assertEqual(self.calls, [('LifeDrain.gameOver',)])
+
+    def test_without_listeners(self):
+        self.dispatcher.emit('LifeDrain.gameOver')
+        self.assertIsNone(self.timer)
+
+    def test_without_timer(self):
+        self.listen('LifeDrain.deckSwitched')
+        dispatcher = self.hook_dispatcher.HookDispatcher()
+        dispatcher.emit('LifeDrain.deckSwitched', 2)
+        self.assertEqual(self.calls, [('LifeDrain.deckSwitched', 2)])
+
+    def test_coalesce(self):
+        self.listen('LifeDrain.lifeChanged')
+        for life in (30, 29, 28):
+            self.dispatcher.emit('LifeDrain.lifeChanged', 1, life, key=1)
+        self.dispatcher.emit('LifeDrain.lifeChanged', 2, 10, key=2)
+        self.dispatcher.emit('LifeDrain.lifeChanged', 1, 27, key=1)
+        self.assertEqual(self.timer.started, 1)
+        self.timer.fire()
+        self.assertEqual(self.calls, [('LifeDrain.lifeChanged', 1, 27),
+                                      ('LifeDrain.lifeChanged', 2, 10)])
+
+    def test_turn_budget(self):
+        budget = self.hook_dispatcher.TURN_BUDGET
+        self.listen('LifeDrain.lifeChanged', duration=budget / 2)
+        for deck_id in range(5):
+            self.dispatcher.emit('LifeDrain.lifeChanged', deck_id, 0,
+                                 key=deck_id)
+        self.timer.fire()
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.timer.started, 1)
+        self.timer.fire()
+        self.assertEqual(len(self.calls), 5)
+        self.assertEqual(self.timer.started, 0)
+
+    def test_slow_listener_report(self):
+        budget = self.hook_dispatcher.LISTENER_BUDGET
+        self.listen('LifeDrain.gameOver', duration=budget * 2)
+        self.listen('LifeDrain.deckSwitched')
+        self.assertIn('No listener', self.dispatcher.report())
+        self.dispatcher.emit('LifeDrain.gameOver')
+        self.dispatcher.emit('LifeDrain.deckSwitched', 1)
+        self.timer.fire()
+        report = self.dispatcher.report().splitlines()
+        self.assertEqual(len(report), 2)
+        self.assertIn('LifeDrain.gameOver', report[1])
+        self.assertIn('listener', report[1])
+
+    def test_failing_listener_removed(self):
+        def failing():
+            raise ValueError
+        self.listeners['LifeDrain.gameOver'] = [failing]
+        self.dispatcher.emit('LifeDrain.gameOver')
+        with self.assertRaises(ValueError):
+            self.timer.fire()
+        self.assertEqual(self.listeners['LifeDrain.gameOver'], [])
+
+    def test_failing_listener_keeps_queue(self):
+        def failing():
+            raise ValueError
+        self.listeners['LifeDrain.gameOver'] = [failing]
+        self.listen('LifeDrain.deckSwitched')
+        self.dispatcher.emit('LifeDrain.gameOver')
+        self.dispatcher.emit('LifeDrain.deckSwitched', 3)
+        with self.assertRaises(ValueError):
+            self.timer.fire()
+        self.assertEqual(self.timer.started, 1)
+        self.timer.fire()
+        self.assertEqual(self.calls, [('LifeDrain.deckSwitched', 3)])
+        self.dispatcher.emit('LifeDrain.deckSwitched', 4)
+        self.assertEqual(self.timer.started, 1)
+        self.timer.fire()
+        self.assertEqual(self.calls[-1], ('LifeDrain.deckSwitched', 4))
@@ -0,0 +1,87 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestHookStats(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stats = self.lifedrain.hook_profiler.HookStats('hook')
+
+    def test_percentile(self):
+        for _ in range(98):
+            self.stats.add(3.5e-6)
+        self.stats.add(100.5e-6)
+        self.stats.add(1e-3)
+        self.assertEqual(self.stats.percentile(0.5), 4e-6)
+        self.assertEqual(self.stats.percentile(0.98), 4e-6)
+        self.assertEqual(self.stats.percentile(0.99), 128e-6)
+        self.assertEqual(self.stats.percentile(1), 1e-3)
+
+    def test_percentile_capped_by_maximum(self):
+        self.stats.add(5e-3)
+        self.assertEqual(self.stats.percentile(0.5), 5e-3)
+
+    def test_percentile_empty(self):
+        self.assertEqual(self.stats.percentile(0.99), 0)
+
+    def test_reset(self):
+        self.stats.add(1e-3)
+        self.stats.reset()
+        self.assertEqual((self.stats.count, self.stats.total,
+                          self.stats.maximum), (0, 0, 0))
+        self.assertEqual(self.stats.percentile(0.5), 0)
+
+
+class TestHookProfiler(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0
+        self.clock = mock.Mock(side_effect=lambda: self.now)
+        self.profiler = self.lifedrain.hook_profiler.HookProfiler(
+            self.clock, slowest_size=2)
+
+    def make_callback(self, duration):
+        def callback(value):
+            self.now += duration
+            return value
+        return callback
+
+    def test_disabled_does_not_measure(self):
+        wrapped = self.profiler.wrap('hook', self.make_callback(0.01))
+        self.assertEqual(wrapped(5), 5)
+        self.clock.assert_not_called()
+        self.assertIn('No calls were measured yet.', self.profiler.report())
+
+    def test_report(self):
+        self.profiler.enabled = True
+        fast = self.profiler.wrap('fast', self.make_callback(0.0005))
+        slow = self.profiler.wrap('slow', self.make_callback(0.002))
+        for _ in range(3):
+            self.assertEqual(fast(1), 1)
+        slow(1)
+
+        lines = self.profiler.report().splitlines()
+        self.assertTrue(lines[1].startswith('slow '))
+        self.assertIn(' 1 ', lines[1])
+        self.assertTrue(lines[2].startswith('fast '))
+        self.assertIn(' 3 ', lines[2])
+        slowest = lines[lines.index('Slowest calls') + 1:]
+        self.assertEqual(len(slowest), 2)
+        self.assertTrue(slowest[0].startswith('slow '))
+        self.assertIn('2.0 ms', slowest[0])
+
+    def test_reset(self):
+        self.profiler.enabled = True
+        self.profiler.wrap('hook', self.make_callback(0.001))(1)
+        self.profiler.reset()
+        report = self.profiler.report()
+        self.assertIn('No calls were measured yet.', report)
+        self.assertTrue(report.endswith('Slowest calls'))
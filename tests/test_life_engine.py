@@ -0,0 +1,141 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestLifeEngine(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = 0
+        self.engine = self.lifedrain.life_engine.LifeEngine(lambda: self.now)
+        self.engine.add_deck(123, 100, 5, 10)
+
+    def test_add_deck_full_life(self):
+        self.assertEqual(self.engine.get_life(123), 100)
+        self.assertEqual(self.engine.get_max_life(123), 100)
+
+    def test_recover_clamped(self):
+        self.engine.recover(123)
+        self.assertEqual(self.engine.get_life(123), 100)
+
+        self.engine.recover(123, increment=False, value=150)
+        self.assertEqual(self.engine.get_life(123), 0)
+
+    def test_damage(self):
+        self.engine.recover(123, damage=True)
+        self.assertEqual(self.engine.get_life(123), 90)
+
+    def test_drain_elapsed_time(self):
+        self.engine.start_drain(123)
+        self.now = 30
+        self.assertEqual(self.engine.get_life(123), 70)
+
+        self.engine.stop_drain(123)
+        self.now = 60
+        self.assertEqual(self.engine.get_life(123), 70)
+
+    def test_change_listener(self):
+        callback = mock.Mock()
+        self.engine.subscribe('change', callback)
+
+        self.engine.recover(123)
+        callback.assert_not_called()
+
+        self.engine.change_life(123, -20)
+        callback.assert_called_once_with(123, 80)
+
+    def test_game_over_once(self):
+        callback = mock.Mock()
+        self.engine.subscribe('gameOver', callback)
+
+        self.engine.change_life(123, -100)
+        self.engine.change_life(123, -10)
+        callback.assert_called_once_with(123)
+
+        self.engine.recover(123)
+        self.engine.change_life(123, -10)
+        self.assertEqual(callback.call_count, 2)
+
+    def test_evict_least_recently_used(self):
+        callback = mock.Mock()
+        engine = self.lifedrain.life_engine.LifeEngine(lambda: self.now,
+                                                       capacity=2)
+        engine.subscribe('evict', callback)
+        engine.add_deck(1, 100, 5, 10)
+        engine.add_deck(2, 100, 5, 10)
+        engine.change_life(1, -30)
+        engine.get_life(1)
+        engine.add_deck(3, 100, 5, 10)
+
+        callback.assert_called_once_with(2, 100)
+        self.assertTrue(engine.has_deck(1))
+        self.assertFalse(engine.has_deck(2))
+
+    def test_pinned_deck_not_evicted(self):
+        engine = self.lifedrain.life_engine.LifeEngine(lambda: self.now,
+                                                       capacity=256)
+        engine.add_deck(1, 100, 5, 10)
+        engine.pin(1)
+        for deck_id in range(2, 302):
+            engine.add_deck(deck_id, 100, 5, 10)
+        engine.recover(1, False)
+        self.assertEqual(engine.get_life(1), 95)
+        self.assertFalse(engine.has_deck(2))
+
+    def test_change_life_marks_recently_used(self):
+        callback = mock.Mock()
+        engine = self.lifedrain.life_engine.LifeEngine(lambda: self.now,
+                                                       capacity=2)
+        engine.subscribe('evict', callback)
+        engine.add_deck(1, 100, 5, 10)
+        engine.add_deck(2, 100, 5, 10)
+        engine.change_life(1, -30)
+        engine.add_deck(3, 100, 5, 10)
+        callback.assert_called_once_with(2, 100)
+
+    def test_change_lives_notifies_once(self):
+        callback = mock.Mock()
+        self.engine.add_deck(456, 100, 5, 10)
+        self.engine.subscribe('change', callback)
+        self.engine.start_drain(123)
+        self.now = 10
+
+        recover = self.lifedrain.event_journal.EVENT_RECOVER
+        self.engine.change_lives([
+            (123, recover, -5), (456, recover, -20), (123, recover, 3),
+            (789, recover, 50)])
+        self.assertEqual(callback.call_args_list, [
+            mock.call(123, 88), mock.call(456, 80)])
+
+    def test_change_lives_drain_game_over(self):
+        callback = mock.Mock()
+        self.engine.subscribe('gameOver', callback)
+        self.engine.start_drain(123)
+        self.now = 150
+
+        recover = self.lifedrain.event_journal.EVENT_RECOVER
+        self.engine.change_lives([(123, recover, 5)])
+        callback.assert_called_once_with(123)
+        self.assertEqual(self.engine.get_life(123), 5)
+
+    def test_milliseconds_conversion(self):
+        life_engine = self.lifedrain.life_engine
+        self.assertEqual(life_engine.seconds_to_ms(0.1), 100)
+        self.assertEqual(life_engine.seconds_to_ms(120), 120000)
+        self.assertEqual(life_engine.ms_to_seconds(119001), 120)
+        self.assertEqual(life_engine.ms_to_seconds(0), 0)
+
+    def test_drain_without_drift(self):
+        self.engine.add_deck(456, 10000, 5000, None)
+        self.engine.start_drain(456)
+        for _ in range(1000):
+            self.now += 100
+            self.engine.apply_drain(456)
+        self.assertEqual(self.engine.get_life(456), 0)
+        self.assertIsInstance(self.engine.get_life(456), int)
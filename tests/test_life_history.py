@@ -0,0 +1,60 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestLifeHistory(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.life_history = self.lifedrain.life_history
+        self.now = 0
+        self.history = self.life_history.LifeHistory(clock=lambda: self.now)
+
+    def record(self, time, life):
+        self.now = time
+        self.history.record(1, life)
+
+    def buckets(self):
+        mins, maxs = self.history.buckets(1)
+        return list(mins), list(maxs)
+
+    def test_min_max_per_bucket(self):
+        self.record(0, 5000)
+        self.record(300, 4700)
+        self.record(600, 6000)
+        self.record(1200, 5800)
+        self.assertEqual(self.buckets(), ([4700, 5800], [6000, 6000]))
+
+    def test_gap_keeps_last_life(self):
+        self.record(0, 5000)
+        self.record(3500, 4000)
+        self.assertEqual(self.buckets(),
+                         ([5000, 5000, 5000, 4000], [5000, 5000, 5000, 5000]))
+
+    def test_bounded_size(self):
+        buckets = self.life_history.BUCKETS
+        for second in range(8 * 3600):
+            self.record(second * 1000, 60000 - second % 60000)
+        mins, maxs = self.history.buckets(1)
+        self.assertLessEqual(len(mins), buckets)
+        self.assertGreater(len(mins), buckets // 2)
+        self.assertEqual(len(mins), len(maxs))
+        self.assertEqual(min(mins), 60000 - 8 * 3600 + 1)
+        self.assertEqual(max(maxs), 60000)
+
+    def test_sparkline(self):
+        self.assertEqual(self.history.sparkline(1, 10000), '')
+        self.record(0, 10000)
+        self.record(1000, 0)
+        svg = self.history.sparkline(1, 10000, width=100, height=21)
+        self.assertIn('points="0.0,0.5 100.0,0.5 100.0,20.5 0.0,0.5"', svg)
+        self.assertIn('points="0.0,0.5 100.0,10.5"', svg)
+
+    def test_forget(self):
+        self.record(0, 5000)
+        self.history.forget(1)
+        self.assertEqual(self.buckets(), ([], []))
@@ -0,0 +1,169 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class FakeDecks:
+
+    def __init__(self, decks):
+        self.decks = {deck['id']: deck for deck in decks}
+        self.selected = decks[0]['id']
+
+    def current(self):
+        return self.decks[self.selected]
+
+    def get(self, deck_id, default=True):
+        return self.decks.get(deck_id)
+
+    def all(self):
+        return list(self.decks.values())
+
+
+class TestLifedrain(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        conf = {'maxLife': 100, 'recover': 5, 'damage': None,
+                'awayPolicy': 0}
+        self.main_window = mock.MagicMock()
+        self.main_window.col.conf = {}
+        self.main_window.col.decks = FakeDecks([
+            {'id': 1, 'name': 'One', 'lifedrain': conf},
+            {'id': 2, 'name': 'Two', 'lifedrain': conf},
+        ])
+        self.timers = {}
+        self.addon = self.lifedrain.lifedrain.Lifedrain(
+            self.make_timer, self.main_window, mock.MagicMock())
+        self.deck_manager = self.addon.deck_manager
+        self.deck_manager.get_current_life()
+        self.life_changes = mock.Mock()
+        self.deck_manager.engine.subscribe('change', self.life_changes)
+        self.now = 0
+        self.deck_manager.engine._clock = lambda: self.now
+
+    def make_timer(self, delay, func, repeat):
+        timer = mock.Mock()
+        timer.func = func
+        timer.isActive.return_value = True
+        self.timers.setdefault(delay, []).append(timer)
+        return timer
+
+    def fire_recover_timer(self):
+        (timer,) = self.timers[0]
+        timer.func()
+
+    def test_queue_recover_coalesced(self):
+        for _ in range(3):
+            self.addon.queue_recover(increment=False, value=10)
+        self.life_changes.assert_not_called()
+
+        self.fire_recover_timer()
+        self.life_changes.assert_called_once_with(1, 70000)
+
+        self.addon.queue_recover(value=5)
+        self.assertEqual(len(self.timers[0]), 1)
+        self.timers[0][0].start.assert_called_once_with(0)
+
+    def test_recover_batch_coalesced(self):
+        self.addon.recover_batch([-10, (1, -20), 5])
+        self.addon.recover_batch([(1, -5)])
+        self.fire_recover_timer()
+        self.life_changes.assert_called_once_with(1, 70000)
+
+    def test_recover_batch_deck_not_shown(self):
+        self.addon.recover_batch([(2, -30), (3, -30)])
+        self.fire_recover_timer()
+        self.assertEqual(self.deck_manager.engine.get_life(2), 70000)
+        self.assertFalse(self.deck_manager.engine.has_deck(3))
+
+    def away(self, policy, seconds):
+        """Drains for 10 seconds, then hides the window for some seconds."""
+        away_policies = self.lifedrain.defaults.AWAY_POLICIES
+        self.main_window.col.decks.decks[1]['lifedrain'] = dict(
+            self.main_window.col.decks.decks[1]['lifedrain'],
+            awayPolicy=away_policies.index(policy))
+        self.addon.invalidate_config()
+        self.addon._toggle_drain(True)
+        (drain_timer,) = self.timers[1000]
+        self.now += 10000
+
+        self.addon.window_visibility_changed(False)
+        drain_timer.stop.assert_called_once_with()
+        drain_timer.isActive.return_value = False
+        self.now += seconds * 1000
+        self.addon.window_visibility_changed(True)
+        self.assertEqual(drain_timer.start.call_count, 2)
+        self.now += 1000
+        return self.deck_manager.engine.get_life(1)
+
+    def test_away_freeze_life(self):
+        self.assertEqual(self.away('Freeze life', 30), 89000)
+
+    def test_away_drain_time(self):
+        self.assertEqual(self.away('Drain the time away', 30), 59000)
+
+    def started_away(self, policy):
+        """Starts the drain while away, and comes back after 30 seconds."""
+        away_policies = self.lifedrain.defaults.AWAY_POLICIES
+        self.main_window.col.decks.decks[1]['lifedrain'] = dict(
+            self.main_window.col.decks.decks[1]['lifedrain'],
+            awayPolicy=away_policies.index(policy))
+        self.addon.invalidate_config()
+        self.addon.visibility = mock.Mock()
+        self.addon.visibility.is_visible.return_value = False
+        self.addon._toggle_drain(True)
+        (drain_timer,) = self.timers[1000]
+        drain_timer.start.assert_not_called()
+        drain_timer.isActive.return_value = False
+
+        self.now += 30000
+        self.addon.window_visibility_changed(True)
+        drain_timer.start.assert_called_once()
+        return self.deck_manager.engine.get_life(1)
+
+    def test_started_away_freeze_life(self):
+        self.assertEqual(self.started_away('Freeze life'), 100000)
+
+    def test_started_away_drain_time(self):
+        self.assertEqual(self.started_away('Drain the time away'), 70000)
+
+    def test_visible_without_drain(self):
+        self.addon.window_visibility_changed(False)
+        self.addon.window_visibility_changed(True)
+        self.assertNotIn(1000, self.timers)
+
+    def test_suggest_deck_settings_in_background(self):
+        def run_in_background(task, on_done):
+            future = mock.Mock()
+            future.result.return_value = task()
+            on_done(future)
+
+        taskman = self.main_window.taskman
+        taskman.run_in_background.side_effect = run_in_background
+        self.addon._advisor = mock.Mock()
+        self.addon._advisor.suggest.return_value = {'rate': 0.01}
+        on_done = mock.Mock()
+
+        self.addon.suggest_deck_settings(1, on_done)
+        self.addon._advisor.suggest.assert_called_once_with(1)
+        on_done.assert_called_once_with({'rate': 0.01})
+
+    def test_suggest_deck_settings_failed(self):
+        def run_in_background(task, on_done):
+            future = mock.Mock()
+            future.result.side_effect = RuntimeError('Collection closed')
+            on_done(future)
+
+        taskman = self.main_window.taskman
+        taskman.run_in_background.side_effect = run_in_background
+        self.addon._advisor = mock.Mock()
+        on_done = mock.Mock()
+
+        with self.assertRaises(RuntimeError):
+            self.addon.suggest_deck_settings(1, on_done)
+        on_done.assert_called_once_with(None)
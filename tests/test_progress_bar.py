@@ -0,0 +1,255 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestProgressBar(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.qt = mock.MagicMock()
+        self.main_window = mock.MagicMock()
+        self.main_window.isMinimized.return_value = False
+        self.qprogressbar = self.qt.QProgressBar.return_value
+        self.qprogressbar.width.return_value = 100
+        self.qprogressbar.isVisible.return_value = True
+        self.window_events = mock.Mock()
+
+        self.progress_bar = self.lifedrain.progress_bar.ProgressBar(
+            self.main_window, self.qt, self.window_events)
+        self.progress_bar.set_max_value(1000)
+
+    def test_repaint_on_pixel_change(self):
+        self.progress_bar.set_current_value(995)
+        self.progress_bar.set_current_value(991)
+        self.progress_bar.set_current_value(985)
+        self.assertEqual(self.qprogressbar.setValue.call_args_list, [
+            mock.call(995), mock.call(985)])
+
+    def test_postpone_while_minimized(self):
+        self.main_window.isMinimized.return_value = True
+        self.progress_bar.set_current_value(500)
+        self.qprogressbar.setValue.assert_not_called()
+
+        self.main_window.isMinimized.return_value = False
+        (window_state_changed,) = [
+            call[0][1] for call in self.window_events.subscribe.call_args_list
+            if call[0][0] == self.qt.QEvent.WindowStateChange]
+        window_state_changed(mock.Mock())
+        self.qprogressbar.setValue.assert_called_once_with(500)
+        self.main_window.installEventFilter.assert_not_called()
+
+    def test_next_change_in(self):
+        self.progress_bar.set_current_value(995)
+        self.assertEqual(self.progress_bar.next_change_in(), 6)
+
+    def test_next_change_in_pixel_boundaries(self):
+        self.qprogressbar.width.return_value = 70
+        self.progress_bar.set_max_value(3000)
+
+        def pixel(value):
+            self.progress_bar.set_current_value(value)
+            return self.progress_bar._pixel_width()
+
+        for value in range(1, 3001):
+            self.progress_bar.set_current_value(value)
+            next_change = self.progress_bar.next_change_in()
+            if next_change == 1000:
+                continue
+            self.assertEqual(pixel(value - next_change + 1), pixel(value))
+            self.assertNotEqual(pixel(value - next_change), pixel(value))
+
+
+class FakeSignal:
+
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def emit(self, *args):
+        for callback in self.callbacks:
+            callback(*args)
+
+
+class FakeQObject:
+
+    def __init__(self, parent=None):
+        self.qt_parent = parent
+
+
+class FakeDockWidget:
+
+    def __init__(self):
+        self.dockLocationChanged = FakeSignal()
+        self.destroyed = FakeSignal()
+
+
+class TestDockAreaIndex(LifedrainTestCase):
+
+    LEFT = 1
+    RIGHT = 2
+
+    def setUp(self):
+        super().setUp()
+        self.qt = mock.MagicMock()
+        self.qt.QObject = FakeQObject
+        self.qt.QDockWidget = FakeDockWidget
+        self.areas = {}
+        self.children = []
+        self.main_window = mock.MagicMock()
+        self.main_window.findChildren.side_effect = \
+            lambda cls: list(self.children)
+        self.main_window.dockWidgetArea.side_effect = self.areas.get
+
+    def make_dock(self, area):
+        dock = FakeDockWidget()
+        self.areas[dock] = area
+        self.children.append(dock)
+        return dock
+
+    def make_index(self):
+        index = self.lifedrain.progress_bar.DockAreaIndex(self.main_window,
+                                                          self.qt)
+        self.event_filter = self.main_window.installEventFilter.call_args[0][0]
+        return index
+
+    def polish(self, child):
+        event = mock.Mock()
+        event.type.return_value = self.qt.QEvent.ChildPolished
+        event.child.return_value = child
+        self.event_filter.eventFilter(self.main_window, event)
+
+    def test_existing_docks(self):
+        left = self.make_dock(self.LEFT)
+        index = self.make_index()
+        self.assertIs(index.first_dock(self.LEFT), left)
+        self.assertIsNone(index.first_dock(self.LEFT, ignore=left))
+
+    def test_polished_dock(self):
+        index = self.make_index()
+        self.main_window.findChildren.reset_mock()
+        dock = self.make_dock(self.RIGHT)
+        self.polish(dock)
+        self.polish(mock.Mock())
+        self.assertIs(index.first_dock(self.RIGHT), dock)
+        self.main_window.findChildren.assert_not_called()
+
+    def test_empty_area_not_scanned(self):
+        index = self.make_index()
+        self.main_window.findChildren.reset_mock()
+        self.assertIsNone(index.first_dock(self.LEFT))
+        self.main_window.findChildren.assert_not_called()
+
+    def test_moved_and_destroyed(self):
+        dock = self.make_dock(self.LEFT)
+        index = self.make_index()
+        self.areas[dock] = self.RIGHT
+        dock.dockLocationChanged.emit(self.RIGHT)
+        self.assertIs(index.first_dock(self.RIGHT), dock)
+        self.assertIsNone(index.first_dock(self.LEFT))
+
+        self.children.remove(dock)
+        dock.destroyed.emit()
+        self.assertIsNone(index.first_dock(self.RIGHT))
+
+
+class TestStyleRegistry(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.qt = mock.MagicMock()
+        self.qt.QStyleFactory.create.side_effect = \
+            lambda name: mock.Mock(name=name)
+        self.registry = self.lifedrain.progress_bar.StyleRegistry(self.qt)
+
+    def test_shared_while_referenced(self):
+        style = self.registry.acquire('fusion')
+        self.assertIs(self.registry.acquire('fusion'), style)
+        self.qt.QStyleFactory.create.assert_called_once_with('fusion')
+        self.assertEqual(self.registry.live_styles(), {'fusion': 2})
+
+        self.registry.release('fusion')
+        style.deleteLater.assert_not_called()
+        self.assertEqual(self.registry.live_styles(), {'fusion': 1})
+
+        self.registry.release('fusion')
+        style.deleteLater.assert_called_once_with()
+        self.assertEqual(self.registry.live_styles(), {})
+
+    def test_created_again_after_release(self):
+        style = self.registry.acquire('windows')
+        self.registry.release('windows')
+        self.assertIsNot(self.registry.acquire('windows'), style)
+        self.assertEqual(self.qt.QStyleFactory.create.call_count, 2)
+
+    def test_release_unknown(self):
+        self.registry.release('fusion')
+        self.assertEqual(self.registry.live_styles(), {})
+
+    def test_unavailable_style(self):
+        self.qt.QStyleFactory.create.side_effect = lambda name: None
+        self.assertIsNone(self.registry.acquire('missing'))
+        self.registry.release('missing')
+        self.assertEqual(self.registry.live_styles(), {})
+
+
+class TestTextFormatter(LifedrainTestCase):
+
+    def make_formatter(self, text_format):
+        return self.lifedrain.progress_bar.TextFormatter(text_format)
+
+    def test_render_rounds_up(self):
+        formatter = self.make_formatter('%v/%m (%p%)')
+        self.assertEqual(formatter.render(60000, 60000), '60/60 (100%)')
+        self.assertEqual(formatter.render(30001, 60000), '31/60 (51%)')
+        self.assertEqual(formatter.render(30000, 60000), '30/60 (50%)')
+        self.assertEqual(formatter.render(1, 60000), '1/60 (1%)')
+        self.assertEqual(formatter.render(0, 60000), '0/60 (0%)')
+
+    def test_render_time_rounds_down(self):
+        formatter = self.make_formatter('mm:ss')
+        self.assertEqual(formatter.render(60000, 600000), '1:00')
+        self.assertEqual(formatter.render(59999, 600000), '0:59')
+        self.assertEqual(formatter.render(999, 600000), '0:00')
+
+    def test_render_max_zero(self):
+        formatter = self.make_formatter('%v/%m (%p%)')
+        self.assertEqual(formatter.render(0, 0), '0/1 (0%)')
+
+    def test_render_new_max(self):
+        formatter = self.make_formatter('%v/%m')
+        self.assertEqual(formatter.render(10000, 60000), '10/60')
+        self.assertEqual(formatter.render(10000, 30000), '10/30')
+
+    def test_next_change_in_rounded_up(self):
+        formatter = self.make_formatter('%v')
+        for current_value, expected in ((60000, 1000), (59001, 1),
+                                        (59000, 1000), (1, 1)):
+            next_change = formatter.next_change_in(current_value)
+            self.assertEqual(next_change, expected)
+            self.assertEqual(
+                formatter.render(current_value, 60000),
+                formatter.render(current_value - next_change + 1, 60000))
+            self.assertNotEqual(
+                formatter.render(current_value - next_change + 1, 60000),
+                formatter.render(current_value - next_change, 60000))
+
+    def test_next_change_in_rounded_down(self):
+        formatter = self.make_formatter('mm:ss')
+        for current_value, expected in ((60000, 1), (59999, 1000),
+                                        (59500, 501), (1000, 1)):
+            next_change = formatter.next_change_in(current_value)
+            self.assertEqual(next_change, expected)
+            self.assertEqual(
+                formatter.render(current_value, 600000),
+                formatter.render(current_value - next_change + 1, 600000))
+            self.assertNotEqual(
+                formatter.render(current_value - next_change + 1, 600000),
+                formatter.render(current_value - next_change, 600000))
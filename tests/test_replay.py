@@ -0,0 +1,106 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+def make_collection(path, decks, answers):
+    """Creates a minimal collection with the tables used by the replay.
+
+    Args:
+        path: Where the collection is created.
+        decks: A list of decks, as stored in the col table.
+        answers: A list of (deck_id, revlog_id, ease, time) tuples.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE col (decks TEXT, usn INTEGER DEFAULT 0)')
+    conn.execute('CREATE TABLE cards (id INTEGER PRIMARY KEY, did INTEGER)')
+    conn.execute('CREATE TABLE revlog (id INTEGER PRIMARY KEY, '
+                 'cid INTEGER, ease INTEGER, time INTEGER, '
+                 'usn INTEGER DEFAULT -1)')
+    conn.execute('CREATE INDEX ix_revlog_usn ON revlog (usn)')
+    conn.execute('INSERT INTO col (decks) VALUES (?)', (json.dumps(
+        {str(deck['id']): deck for deck in decks}),))
+    for card_id, (deck_id, revlog_id, ease, time) in enumerate(answers):
+        conn.execute('INSERT INTO cards VALUES (?, ?)', (card_id, deck_id))
+        conn.execute('INSERT INTO revlog (id, cid, ease, time) '
+                     'VALUES (?, ?, ?, ?)',
+                     (revlog_id, card_id, ease, time))
+    conn.commit()
+    conn.close()
+
+
+class TestReplay(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from lifedrain import replay
+        self.replay = replay
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'collection.anki2')
+
+    def test_replay_deck(self):
+        conf = {'maxLife': 10, 'recover': 2, 'damage': 4}
+        answers = [(1, 3, 6000), (2, 1, 3000), (3, 3, 2000), (4, 3, 9000),
+                   (5, 1, 1000)]
+        # Life: 10 -> 4+2 -> 3-4 -> 0 -> 0+2 -> 0 -> 0+2 -> 1-4
+        self.assertEqual(self.replay.replay_deck(conf, answers), [1, 3, 4])
+
+    def test_replay_deck_without_damage(self):
+        conf = {'maxLife': 10, 'recover': 2, 'damage': None}
+        answers = [(1, 1, 9000), (2, 1, 2000), (3, 1, 1000)]
+        self.assertEqual(self.replay.replay_deck(conf, answers), [])
+
+    def test_numpy_matches_loop(self):
+        if self.replay.numpy is None:
+            self.skipTest('NumPy is not installed')
+        rng = random.Random(0)
+        conf = {'maxLife': 60, 'recover': 5, 'damage': 10}
+        answers = [(index, rng.randint(1, 4), rng.randint(0, 15000))
+                   for index in range(20000)]
+        vectorized = self.replay.replay_deck(conf, answers)
+        with mock.patch.object(self.replay, 'numpy', None):
+            looped = self.replay.replay_deck(conf, answers)
+        self.assertEqual(vectorized, looped)
+        self.assertTrue(vectorized)
+
+    def test_replay_collection(self):
+        decks = [
+            {'id': 1, 'name': 'Parent',
+             'lifedrain': {'maxLife': 5, 'recover': 1, 'damage': None}},
+            {'id': 2, 'name': 'Parent::Child'},
+        ]
+        make_collection(self.path, decks, [
+            (2, 1000, 3, 3000), (2, 2000, 3, 4000), (1, 3000, 3, 1000),
+            (2, 4000, 0, 9000)])
+
+        conn = self.replay.open_collection(self.path)
+        self.addCleanup(conn.close)
+        results = list(self.replay.replay(conn))
+        self.assertEqual(results, [
+            {'deck': 'Parent', 'answers': 1, 'gameOvers': []},
+            {'deck': 'Parent::Child', 'answers': 2, 'gameOvers': [2000]},
+        ])
+
+        results = list(self.replay.replay(conn, {'maxLife': 60},
+                                          'Parent::Child'))
+        self.assertEqual(results, [
+            {'deck': 'Parent::Child', 'answers': 2, 'gameOvers': []},
+        ])
+
+    def test_collection_is_read_only(self):
+        make_collection(self.path, [], [])
+        conn = self.replay.open_collection(self.path)
+        self.addCleanup(conn.close)
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute('DELETE FROM revlog')
@@ -0,0 +1,129 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import random
+
+from tests.test_base import LifedrainTestCase
+
+SCREENS = ['deckBrowser', 'overview', 'review']
+EVENTS = ['screenChange', 'showQuestion', 'showAnswer', 'answerCard',
+          'reset', 'undo', 'specialAction']
+
+
+class StatusDict:
+    """The flags that Life Drain kept before the state machine existed."""
+
+    def __init__(self):
+        self.status = {'special_action': False, 'reviewed': False,
+                       'review_response': 0, 'screen': None}
+
+    def change_screen(self, state):
+        recover = self.status['reviewed'] and state in ['overview', 'review']
+        self.status['reviewed'] = False
+        self.status['screen'] = state
+        return recover
+
+    def show_question(self):
+        response = None
+        if self.status['reviewed']:
+            response = self.status['review_response']
+        self.status['reviewed'] = False
+        self.status['special_action'] = False
+        return response
+
+    def show_answer(self):
+        self.status['reviewed'] = True
+
+    def answer_card(self, ease):
+        self.status['review_response'] = ease
+
+    def reset(self):
+        self.status['reviewed'] = False
+
+    def mark_special_action(self):
+        self.status['special_action'] = True
+
+    def undo(self):
+        undo_answer = (self.status['screen'] == 'review' and
+                       not self.status['special_action'])
+        if undo_answer:
+            self.status['reviewed'] = False
+        self.status['special_action'] = False
+        return undo_answer
+
+
+def random_events(seed, count):
+    """Generates a reproducible sequence of (event, args) tuples."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        event = rng.choice(EVENTS)
+        if event == 'screenChange':
+            yield event, (rng.choice(SCREENS),)
+        elif event == 'answerCard':
+            yield event, (rng.randint(1, 4),)
+        else:
+            yield event, ()
+
+
+def drive(target, events):
+    """Feeds a sequence of events, collecting what the target returned."""
+    handlers = {
+        'screenChange': target.change_screen,
+        'showQuestion': target.show_question,
+        'showAnswer': target.show_answer,
+        'answerCard': target.answer_card,
+        'reset': target.reset,
+        'undo': target.undo,
+        'specialAction': target.mark_special_action,
+    }
+    return [handlers[event](*args) for event, args in events]
+
+
+class TestReviewStateMachine(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        review_state = self.lifedrain.review_state
+        self.review_state = review_state
+        self.machine = review_state.ReviewStateMachine()
+
+    def test_answer_recovered_on_next_question(self):
+        self.machine.change_screen('review')
+        self.assertIsNone(self.machine.show_question())
+        self.machine.show_answer()
+        self.machine.answer_card(3)
+        self.assertEqual(self.machine.show_question(), 3)
+        self.assertEqual(self.machine.state, self.review_state.QUESTION)
+
+    def test_answer_recovered_on_overview(self):
+        self.machine.change_screen('review')
+        self.machine.show_question()
+        self.machine.show_answer()
+        self.assertTrue(self.machine.change_screen('overview'))
+        self.assertEqual(self.machine.state, self.review_state.IDLE)
+
+    def test_reset_discards_answer(self):
+        self.machine.show_answer()
+        self.machine.reset()
+        self.assertIsNone(self.machine.show_question())
+
+    def test_undo_after_special_action(self):
+        self.machine.change_screen('review')
+        self.machine.show_answer()
+        self.machine.mark_special_action()
+        self.assertFalse(self.machine.undo())
+        self.assertTrue(self.machine.undo())
+        self.assertIsNone(self.machine.show_question())
+
+    def test_undo_outside_review(self):
+        self.machine.change_screen('overview')
+        self.assertFalse(self.machine.undo())
+
+    def test_matches_status_dict(self):
+        for seed in range(20):
+            events = list(random_events(seed, 5000))
+            machine = self.review_state.ReviewStateMachine()
+            self.assertEqual(drive(machine, events),
+                             drive(StatusDict(), events), seed)
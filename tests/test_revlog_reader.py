@@ -0,0 +1,109 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from tests.test_advisor import FakeDB
+from tests.test_base import LifedrainTestCase
+from tests.test_replay import make_collection
+
+
+class TestRevlogReader(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from lifedrain import revlog_reader
+        self.revlog_reader = revlog_reader
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'collection.anki2')
+        make_collection(path, [], [
+            (1, 1000, 1, 4000), (1, 2000, 3, 2000), (2, 3000, 0, 9000),
+            (2, 4000, 4, 1000)])
+        self.conn = sqlite3.connect(path)
+        self.addCleanup(self.conn.close)
+
+        self.state_store = self.lifedrain.state_store.StateStore(
+            os.path.join(directory.name, 'user_files', 'state.db'))
+        self.addCleanup(self.state_store.close)
+        self.main_window = mock.MagicMock()
+        self.main_window.col.db = FakeDB(self.conn)
+
+    def make_reader(self, schedule_update=None):
+        reader = self.revlog_reader.RevlogReader(
+            self.main_window, self.state_store, schedule_update)
+        reader.load('User 1')
+        return reader
+
+    def add_answer(self, card_id, deck_id, revlog_id, ease, time, usn=-1):
+        self.conn.execute('INSERT INTO cards VALUES (?, ?)',
+                          (card_id, deck_id))
+        self.conn.execute('INSERT INTO revlog VALUES (?, ?, ?, ?, ?)',
+                          (revlog_id, card_id, ease, time, usn))
+
+    def sync(self, *answers):
+        """Sends the unsynced reviews and brings the given ones."""
+        self.conn.execute('UPDATE revlog SET usn = 5 WHERE usn = -1')
+        for answer in answers:
+            self.add_answer(*answer, usn=5)
+        self.conn.execute('UPDATE col SET usn = 6')
+
+    def assert_stats(self, reader, deck_id, answers, again, time):
+        stats = reader.get(deck_id)
+        self.assertEqual((stats.answers, stats.again, stats.time),
+                         (answers, again, time))
+
+    def test_load(self):
+        reader = self.make_reader()
+        self.assert_stats(reader, 1, 2, 1, 6000)
+        self.assert_stats(reader, 2, 1, 0, 1000)
+        self.assert_stats(reader, 3, 0, 0, 0)
+
+    def test_only_new_rows_are_read(self):
+        self.make_reader()
+        self.add_answer(10, 1, 5000, 1, 3000)
+
+        reader = self.make_reader()
+        self.assert_stats(reader, 1, 3, 2, 9000)
+        with mock.patch.object(self.main_window.col.db, 'all') as all_rows:
+            reader.update()
+        all_rows.assert_not_called()
+
+    def test_batches_are_scheduled(self):
+        schedule_update = mock.Mock()
+        with mock.patch.object(self.revlog_reader, 'BATCH_SIZE', 2):
+            reader = self.make_reader(schedule_update)
+            schedule_update.assert_called_once_with()
+            self.assert_stats(reader, 2, 0, 0, 0)
+            reader.update()
+        self.assert_stats(reader, 1, 2, 1, 6000)
+        self.assert_stats(reader, 2, 1, 0, 1000)
+        self.assertEqual(schedule_update.call_count, 2)
+
+    def test_sync_with_older_reviews(self):
+        self.conn.execute('UPDATE col SET usn = 5')
+        reader = self.make_reader()
+        reader.sync_will_start()
+        self.sync((10, 2, 1500, 1, 5000), (11, 2, 6000, 3, 1000))
+        reader.sync_finished()
+        self.assert_stats(reader, 1, 2, 1, 6000)
+        self.assert_stats(reader, 2, 3, 1, 7000)
+
+        reader = self.make_reader()
+        self.assert_stats(reader, 2, 3, 1, 7000)
+
+    def test_sync_with_newer_reviews(self):
+        self.conn.execute('UPDATE col SET usn = 5')
+        reader = self.make_reader()
+        reader.sync_will_start()
+        self.sync((10, 2, 6000, 3, 1000))
+        with mock.patch.object(self.state_store, 'clear_revlog') as clear:
+            reader.sync_finished()
+        clear.assert_not_called()
+        self.assert_stats(reader, 1, 2, 1, 6000)
+        self.assert_stats(reader, 2, 2, 0, 2000)
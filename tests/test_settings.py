@@ -0,0 +1,113 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestSettings(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from lifedrain import settings
+        self.settings = settings
+        settings._DIALOGS.clear()
+        self.addCleanup(settings._DIALOGS.clear)
+        self.aqt = mock.MagicMock()
+        self.dialog = self.aqt.QDialog.return_value
+
+    def test_global_settings_built_once(self):
+        config = mock.Mock()
+        conf = dict(self.lifedrain.defaults.DEFAULTS, enable=True)
+        config.get.return_value = conf
+        self.settings.global_settings(self.aqt, config)
+        conf = dict(conf, enable=False)
+        config.get.return_value = conf
+        self.settings.global_settings(self.aqt, config)
+
+        self.aqt.QDialog.assert_called_once_with()
+        self.assertEqual(self.dialog.exec.call_count, 2)
+        self.aqt.QCheckBox.return_value.setChecked.assert_called_with(False)
+
+    def test_deck_settings_built_once(self):
+        config = mock.Mock()
+        deck_manager = mock.Mock()
+        deck_manager.get_current_life.return_value = 50
+        conf = {'id': 1, 'name': 'One', 'maxLife': 120, 'recover': 5,
+                'damage': None, 'awayPolicy': 0}
+        config.get.return_value = conf
+        self.settings.deck_settings(self.aqt, config, deck_manager)
+        config.get.return_value = dict(conf, id=2, name='Two')
+        self.settings.deck_settings(self.aqt, config, deck_manager)
+
+        self.aqt.QDialog.assert_called_once_with()
+        self.assertEqual(self.dialog.exec.call_count, 2)
+        self.dialog.setWindowTitle.assert_called_with(
+            'Life Drain options for Two')
+        self.assertEqual(self.dialog.deck_id, 2)
+        state_changed = self.aqt.QCheckBox.return_value.stateChanged
+        state_changed.connect.assert_called_once()
+
+    def open_deck_settings(self, deck_id, suggest):
+        config = mock.Mock()
+        deck_manager = mock.Mock()
+        deck_manager.get_current_life.return_value = 50
+        config.get.return_value = {
+            'id': deck_id, 'name': 'Deck', 'maxLife': 120, 'recover': 5,
+            'damage': None, 'awayPolicy': 0}
+        self.settings.deck_settings(self.aqt, config, deck_manager, suggest)
+
+    def test_suggest_in_background(self):
+        suggest = mock.Mock()
+        self.open_deck_settings(1, suggest)
+        button = self.aqt.QPushButton.return_value
+        label = self.aqt.QLabel.return_value
+        click = button.clicked.connect.call_args[0][0]
+
+        click()
+        button.setEnabled.assert_called_with(False)
+        label.setText.assert_called_with('Replaying the reviews...')
+        deck_id, on_done = suggest.call_args[0]
+        self.assertEqual(deck_id, 1)
+
+        on_done({'maxLife': 60, 'recover': 3, 'damage': None, 'rate': 0.05})
+        button.setEnabled.assert_called_with(True)
+        label.setText.assert_called_with('Game over every 20 answers.')
+
+    def test_suggestion_for_previous_deck_ignored(self):
+        suggest = mock.Mock()
+        self.open_deck_settings(1, suggest)
+        button = self.aqt.QPushButton.return_value
+        label = self.aqt.QLabel.return_value
+        button.clicked.connect.call_args[0][0]()
+        on_done = suggest.call_args[0][1]
+
+        self.open_deck_settings(2, suggest)
+        button.setEnabled.assert_called_with(True)
+        button.setEnabled.reset_mock()
+        label.setText.reset_mock()
+        on_done({'maxLife': 60, 'recover': 3, 'damage': None, 'rate': 0.05})
+        button.setEnabled.assert_called_with(True)
+        label.setText.assert_not_called()
+
+    def test_color_dialog_created_on_select(self):
+        form = self.settings.Form(self.aqt)
+        form.color_select('fgColor', 'Foreground color')
+        select = form.widget.fgColorSelect
+        choose_color = select.pressed.connect.call_args[0][0]
+        color_dialog = self.aqt.QColorDialog.return_value
+        color_dialog.exec_.return_value = True
+        color_dialog.currentColor.return_value.name.return_value = '#00ff00'
+
+        select.set_value('#ff0000')
+        self.assertEqual(select.get_value(), '#ff0000')
+        self.aqt.QColorDialog.assert_not_called()
+
+        choose_color()
+        self.aqt.QColor.assert_called_with('#ff0000')
+        self.assertEqual(select.get_value(), '#00ff00')
+        choose_color()
+        self.aqt.QColorDialog.assert_called_once()
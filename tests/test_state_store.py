@@ -0,0 +1,85 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class TestStateStore(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'user_files', 'state.db')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_flush_load(self):
+        store = self.lifedrain.state_store.StateStore(self.path)
+        store.save('User 1', 123, 50)
+        store.save('User 1', 456, 20)
+        store.save('User 2', 123, 10)
+        store.close()
+
+        store = self.lifedrain.state_store.StateStore(self.path)
+        self.assertEqual(store.load('User 1'), {123: 50, 456: 20})
+        self.assertEqual(store.load('User 2'), {123: 10})
+        store.close()
+
+    def test_schedule_flush_once(self):
+        schedule_flush = mock.Mock()
+        store = self.lifedrain.state_store.StateStore(self.path,
+                                                      schedule_flush)
+        store.save('User 1', 123, 50)
+        store.save('User 1', 123, 40)
+        schedule_flush.assert_called_once_with()
+
+        store.flush()
+        store.save('User 1', 123, 30)
+        self.assertEqual(schedule_flush.call_count, 2)
+        store.close()
+
+    def test_load_pending(self):
+        store = self.lifedrain.state_store.StateStore(self.path)
+        store.save('User 1', 123, 50)
+        self.assertEqual(store.load('User 1'), {123: 50})
+        store.close()
+
+    def test_revlog_aggregates(self):
+        store = self.lifedrain.state_store.StateStore(self.path)
+        self.assertEqual(store.load_revlog('User 1'), (0, {}))
+        store.save_revlog('User 1', 500, {1: (5, 1, 9000)})
+        store.save_revlog('User 1', 900, {2: (2, 0, 3000)})
+        store.close()
+
+        store = self.lifedrain.state_store.StateStore(self.path)
+        self.assertEqual(store.load_revlog('User 1'), (
+            900, {1: (5, 1, 9000), 2: (2, 0, 3000)}))
+        store.clear_revlog('User 1')
+        self.assertEqual(store.load_revlog('User 1'), (0, {}))
+        store.close()
+
+    def test_migrate_revlog_tables(self):
+        os.makedirs(os.path.dirname(self.path))
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute(
+                'CREATE TABLE deck_state (profile TEXT NOT NULL, '
+                'deck_id INTEGER NOT NULL, life INTEGER NOT NULL, '
+                'modified INTEGER NOT NULL, PRIMARY KEY (profile, deck_id))')
+            conn.execute(
+                "INSERT INTO deck_state VALUES ('User 1', 123, 50250, 0)")
+            conn.execute('PRAGMA user_version = 1')
+        conn.close()
+
+        store = self.lifedrain.state_store.StateStore(self.path)
+        self.assertEqual(store.load('User 1'), {123: 50250})
+        self.assertEqual(store.load_revlog('User 1'), (0, {}))
+        store.close()
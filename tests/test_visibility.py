@@ -0,0 +1,70 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class FakeQObject:
+
+    def __init__(self, parent=None):
+        self.qt_parent = parent
+
+
+class TestVisibilityWatcher(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.qt = mock.MagicMock()
+        self.qt.QObject = FakeQObject
+        self.app = self.qt.QApplication.instance.return_value
+        self.app.activeModalWidget.return_value = None
+        self.main_window = mock.MagicMock()
+        self.main_window.isVisible.return_value = True
+        self.main_window.isMinimized.return_value = False
+        self.callback = mock.Mock()
+        self.watcher = self.lifedrain.visibility.VisibilityWatcher(
+            self.main_window, self.qt, self.callback)
+
+    def test_minimized(self):
+        self.watcher.update()
+        self.callback.assert_not_called()
+
+        self.main_window.isMinimized.return_value = True
+        self.watcher.update()
+        self.watcher.update()
+        self.callback.assert_called_once_with(False)
+        self.assertFalse(self.watcher.is_visible())
+
+        self.main_window.isMinimized.return_value = False
+        self.watcher.update()
+        self.callback.assert_called_with(True)
+
+    def test_modal(self):
+        self.app.activeModalWidget.return_value = mock.Mock()
+        self.watcher.update()
+        self.callback.assert_called_once_with(False)
+
+    def test_shared_window_events(self):
+        window_events = mock.Mock()
+        self.main_window.installEventFilter.reset_mock()
+        self.lifedrain.visibility.VisibilityWatcher(
+            self.main_window, self.qt, self.callback, window_events)
+        self.main_window.installEventFilter.assert_not_called()
+
+        self.main_window.isMinimized.return_value = True
+        (window_state_changed,) = [
+            call[0][1] for call in window_events.subscribe.call_args_list
+            if call[0][0] == self.qt.QEvent.WindowStateChange]
+        window_state_changed(mock.Mock())
+        self.callback.assert_called_once_with(False)
+
+    def test_hidden_when_created(self):
+        self.main_window.isVisible.return_value = False
+        watcher = self.lifedrain.visibility.VisibilityWatcher(
+            self.main_window, self.qt, self.callback)
+        self.assertFalse(watcher.is_visible())
+        self.callback.assert_not_called()
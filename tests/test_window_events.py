@@ -0,0 +1,49 @@
+"""
+Copyright (c) Yutsuten <https://github.com/Yutsuten>. Licensed under AGPL-3.0.
+See the LICENCE file in the repository root for full licence text.
+"""
+
+from unittest import mock
+
+from tests.test_base import LifedrainTestCase
+
+
+class FakeQObject:
+
+    def __init__(self, parent=None):
+        self.qt_parent = parent
+
+
+class TestWindowEvents(LifedrainTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from lifedrain import window_events
+        self.qt = mock.MagicMock()
+        self.qt.QObject = FakeQObject
+        self.main_window = mock.MagicMock()
+        self.window_events = window_events.WindowEvents(self.main_window,
+                                                        self.qt)
+        (self.event_filter,) = \
+            self.main_window.installEventFilter.call_args[0]
+
+    def send(self, event_type):
+        event = mock.Mock()
+        event.type.return_value = event_type
+        self.assertFalse(
+            self.event_filter.eventFilter(self.main_window, event))
+        return event
+
+    def test_dispatch_by_type(self):
+        show = mock.Mock()
+        hide = mock.Mock()
+        self.window_events.subscribe(self.qt.QEvent.Show, show)
+        self.window_events.subscribe(self.qt.QEvent.Hide, hide)
+
+        event = self.send(self.qt.QEvent.Show)
+        self.send(self.qt.QEvent.Resize)
+        show.assert_called_once_with(event)
+        hide.assert_not_called()
+
+    def test_filter_kept_by_window(self):
+        self.assertIs(self.event_filter.qt_parent, self.main_window)